@@ -0,0 +1,89 @@
+"""
+分支共享前缀基准测试
+深树(每层新增10条消息后派生下一层) 与 宽树(200条消息的根节点派生大量分支) 两种形状:
+分支复制父对话的全部消息(原方式) 与 共享前缀、只保存新增消息 对比内存占用、数据库大小与生成上下文耗时
+
+运行: python pytest/benchmark/bench_branch_prefix.py
+"""
+import sys
+import os
+import tempfile
+import time
+import tracemalloc
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.core.api.llm.model import Message
+from src.core.bridge import DataStorageManager
+from src.core.database import DB
+
+def branch(parent: Message, session: int, shared: bool) -> Message:
+    if shared:
+        return parent.fork(session)
+    child = Message(session)
+    snapshot = parent.snapshot()
+    child.load_context(snapshot["raw"], snapshot["com"], snapshot["pompmts"], parent.get_full_context())
+    return child
+
+def fill(message: Message, count: int, tag: str):
+    for i in range(count):
+        message.add_message("user" if i % 2 == 0 else "assistant", f"{tag} 第{i}条消息,讨论单词的用法与例句。")
+
+def deep_tree(shared: bool, depth: int = 100, per_level: int = 10):
+    nodes = [Message(1, system_prompt="你是一个英语口语陪练")]
+    fill(nodes[0], per_level, "L0")
+    for level in range(1, depth):
+        child = branch(nodes[-1], level + 1, shared)
+        fill(child, per_level, f"L{level}")
+        nodes.append(child)
+    return nodes
+
+def wide_tree(shared: bool, width: int = 500, root_messages: int = 200, per_branch: int = 2):
+    root = Message(1, system_prompt="你是一个英语口语陪练")
+    fill(root, root_messages, "root")
+    nodes = [root]
+    for n in range(width):
+        child = branch(root, n + 2, shared)
+        fill(child, per_branch, f"B{n}")
+        nodes.append(child)
+    return nodes
+
+def measure(build, shared: bool):
+    tracemalloc.start()
+    nodes = build(shared)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for node in nodes:
+        node.get_context()
+    context_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tree.db")
+        db = DB(path)
+        storage = DataStorageManager()
+        storage.set_database(db)
+        for node in nodes:
+            storage.save_message_context(node.session, node)
+        storage.close()
+        storage._db = None
+        db.close()
+        size = os.path.getsize(path) + sum(
+            os.path.getsize(path + suffix) for suffix in ("-wal", "-shm") if os.path.exists(path + suffix)
+        )
+    for node in nodes:
+        node.close()
+    return memory, size, context_time
+
+def main():
+    print(f"{'形状':<6} {'方式':<6} {'内存':>10} {'数据库':>10} {'生成上下文':>12}")
+    for name, build in (("深树", deep_tree), ("宽树", wide_tree)):
+        for shared in (False, True):
+            memory, size, context_time = measure(build, shared)
+            label = "共享" if shared else "复制"
+            print(f"{name:<6} {label:<6} {memory / 2**20:>8.1f}MB {size / 2**20:>8.1f}MB {context_time * 1e3:>10.1f}ms")
+
+if __name__ == "__main__":
+    main()
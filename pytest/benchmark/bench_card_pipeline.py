@@ -0,0 +1,105 @@
+"""
+背诵卡片预取流水线基准测试
+1万条单词的 cet4lx 单词表(已构建干扰项索引), 50个单词共200张卡片的背诵过程:
+滑动回调中同步准备下一张卡片(原实现) 与 后台流水线提前准备 对比取得卡片数据的耗时分位数。
+卡片在用户答题期间(这里模拟为每张卡片间隔20ms)由后台线程准备。
+只测量卡片数据准备(干扰项查询、选项生成),不含控件构建、复用与渲染,
+结果不代表滑动时的帧耗时;帧耗时需要在Kivy中实测。
+200个样本的p99只由最慢的两三次决定,受调度抖动影响很大,因此重复多轮,
+报告各分位数的中位数与最差一轮的p99,以及流水线取卡时数据已准备好的比例。
+取卡后立即向后台线程提交下一张卡片会唤醒后台线程与滑动回调争用GIL,
+即使数据已准备好p99也可能高于同步准备;CardManager改为在下一帧提交,两种方式都列出。
+
+运行: python pytest/benchmark/bench_card_pipeline.py
+"""
+import sys
+import os
+import random
+import statistics
+import tempfile
+import time
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.ui.recite.card_pipeline import CardPipeline
+from src.ui.recite.data_analysis import WordDatabase
+
+CARD_TYPES = ("WordCard", "WordInputCard", "QuizCard", "DictationCard")
+
+def make_prepare(db: WordDatabase):
+    """与 CardManager._prepare_card 相同的数据准备过程"""
+    def prepare(config):
+        card_type, word = config['type'], config['data']
+        params = {'id': word.id, 'word': word.word, 'translation': word.translation}
+        if card_type in ("QuizCard", "DictationCard"):
+            field = 'translation' if card_type == "QuizCard" else 'word'
+            options = [getattr(word, field)] + [getattr(w, field) for w in db.distractors('cet4lx', word.id, 3)]
+            random.shuffle(options)
+            params.update(options=options, correct_index=options.index(getattr(word, field)))
+        return params
+    return prepare
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return pick(0.5), pick(0.95), pick(0.99), ordered[-1]
+
+def session(db: WordDatabase, configs, mode: str, think: float):
+    """mode: sync 回调中同步准备; refill 回调中取卡并立即提交下一张; deferred 回调外(下一帧)提交"""
+    prepare = make_prepare(db)
+    waits = []
+    ready = None
+    queue = None
+    if mode == "sync":
+        pending = list(configs)
+        handler = lambda: prepare(pending.pop(0))
+    else:
+        queue = CardPipeline(prepare, lookahead=4)
+        queue.extend(configs)
+        handler = queue.popleft if mode == "refill" else lambda: queue.popleft(refill=False)
+    for _ in range(len(configs)):
+        time.sleep(think)  # 用户答题
+        start = time.perf_counter()
+        handler()
+        waits.append(time.perf_counter() - start)
+        if mode == "deferred":
+            # CardManager在下一帧(Clock.schedule_once)补足预取,不计入滑动回调
+            queue.refill()
+    if queue is not None:
+        ready = queue.stats()["ready"]
+        queue.close()
+    return waits, ready
+
+def main(rows: int = 10_000, words: int = 50, think: float = 0.02, rounds: int = 5):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = WordDatabase(os.path.join(tmp, "words.db"))
+        db._init_tables()
+        rng = random.Random(0)
+        db.cursor.executemany(
+            "INSERT INTO cet4lx (word, pronunciation, translation) VALUES (?, ?, ?)",
+            [("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 11))) + str(i),
+              None, f"n. 释义{i}") for i in range(rows)]
+        )
+        db.conn.commit()
+        db.build_distractor_index('cet4lx')
+
+        word_list = db.random_query('cet4lx', words)
+        configs = [{'type': card_type, 'data': word} for word in word_list for card_type in CARD_TYPES]
+        random.shuffle(configs)
+
+        print(f"{len(configs)} 张卡片 × {rounds} 轮, 滑动回调中取得卡片数据的耗时(不含控件构建与渲染)")
+        print(f"各分位数为{rounds}轮的中位数; 最差p99为{rounds}轮中最大的p99")
+        print(f"{'方式':<10} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'最差p99':>9} {'已就绪':>7}")
+        for name, mode in (("同步准备", "sync"), ("预取,回调内提交", "refill"), ("预取,下一帧提交", "deferred")):
+            results = [session(db, configs, mode, think) for _ in range(rounds)]
+            stats = [percentiles(waits) for waits, _ in results]
+            medians = [statistics.median(column) for column in zip(*stats)]
+            worst_p99 = max(p99 for _, _, p99, _ in stats)
+            ready = "-" if mode == "sync" else f"{sum(r for _, r in results) / (len(configs) * rounds):.1%}"
+            print(f"{name:<10} " + " ".join(f"{v * 1e3:>7.3f}ms" for v in (*medians, worst_p99))
+                  + f" {ready:>7}")
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+客户端复用基准测试
+本地HTTPS桩服务器上,每次请求新建客户端(旧行为) 与 共享注册表中的客户端 的首字节时间对比
+
+运行: python pytest/benchmark/bench_client_reuse.py
+需要openssl命令生成自签名证书,不可用时退化为HTTP(无TLS握手开销)
+"""
+import sys
+import os
+import json
+import shutil
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import httpx
+from zhipuai import ZhipuAI
+from src.core.api.llm.client_registry import ClientRegistry, PoolConfig
+
+RESPONSE = json.dumps({
+    "id": "bench", "created": 0, "model": "glm-4",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}).encode()
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头与正文一次写出,避免Nagle与延迟确认叠加的40ms等待
+    wbufsize = 64 * 1024
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    scheme = "http"
+    if shutil.which("openssl"):
+        folder = tempfile.mkdtemp()
+        cert, key = os.path.join(folder, "cert.pem"), os.path.join(folder, "key.pem")
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+            check=True, capture_output=True
+        )
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}/api/paas/v4"
+
+def request(client: ZhipuAI) -> float:
+    start = time.perf_counter()
+    client.chat.completions.create(model="glm-4", messages=[{"role": "user", "content": "hi"}])
+    return time.perf_counter() - start
+
+def main(count: int = 200):
+    server, endpoint = start_server()
+    api_key = "bench-key-0123456789"
+
+    # 旧行为: 每个提供者实例各自创建客户端和连接池
+    fresh = []
+    for _ in range(count):
+        http = httpx.Client(verify=False)
+        fresh.append(request(ZhipuAI(api_key=api_key, base_url=endpoint, http_client=http)))
+        http.close()
+
+    # 共享注册表: 相同凭证复用客户端与长连接
+    registry = ClientRegistry(PoolConfig(verify=False))
+    shared = []
+    for _ in range(count):
+        entry = registry.acquire(api_key, endpoint, lambda key, url, http: ZhipuAI(api_key=key, base_url=url, http_client=http))
+        with entry.slot() as client:
+            shared.append(request(client))
+        registry.release(entry)
+    registry.close()
+    server.shutdown()
+
+    print(f"请求数: {count}, 地址: {endpoint}")
+    for name, samples in (("每次新建客户端", fresh), ("共享客户端", shared)):
+        samples.sort()
+        print(f"{name}: p50 {statistics.median(samples) * 1e3:.2f} ms, "
+              f"p99 {samples[int(len(samples) * 0.99) - 1] * 1e3:.2f} ms")
+    print(f"加速比(p50): {statistics.median(fresh) / statistics.median(shared):.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+每日错误单词列表存储基准测试
+一天内答错1万个单词, 每次答错通过increment_today_stats追加一个单词ID:
+JSON数组文本(原实现, 追加时拼接文本) 与 int32数组BLOB(追加时拼接字节) 对比
+追加耗时、读取并解析整天记录的耗时与存储大小
+
+运行: python pytest/benchmark/bench_daily_word_list.py
+"""
+import sys
+import os
+import json
+import random
+import sqlite3
+import tempfile
+import time
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.core.database.daily import DailyStudyOperator
+
+class JsonDailyStudyOperator(DailyStudyOperator):
+    """原实现: word_list为JSON数组文本"""
+    INCREMENT_SET_CLAUSE = ', '.join(
+        [f"{field} = {field} + excluded.{field}" for field in DailyStudyOperator.COUNTER_FIELDS]
+    ) + """, word_list = CASE
+                WHEN excluded.word_list IS NULL THEN word_list
+                WHEN word_list IS NULL OR word_list = '[]' THEN excluded.word_list
+                ELSE substr(word_list, 1, length(word_list) - 1) || ', ' || substr(excluded.word_list, 2)
+            END"""
+
+    def _list_to_str(self, id_list):
+        return json.dumps(id_list) if id_list else None
+
+    def _str_to_list(self, id_str):
+        return json.loads(id_str) if id_str else []
+
+def run(operator_cls, path: str, word_ids, reads: int):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    daily = operator_cls(conn)
+    conn.execute("PRAGMA foreign_keys = OFF")
+
+    start = time.perf_counter()
+    for word_id in word_ids:
+        with conn:
+            daily.increment_today_stats(1, question_count=1, wrong_count=1, wrong_word_id=[word_id])
+    appended = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(reads):
+        record = daily.get_today_stats(1)
+    read = (time.perf_counter() - start) / reads
+    assert record["word_list"] == word_ids
+    size = conn.execute("SELECT length(word_list) FROM daily_study").fetchone()[0]
+    conn.close()
+    return appended, read, size
+
+def main(count: int = 10_000, reads: int = 200):
+    rng = random.Random(0)
+    word_ids = [rng.randrange(1, 200_000) for _ in range(count)]
+    print(f"一天内追加 {count} 个错误单词ID")
+    print(f"{'存储方式':<12} {'逐次追加':>10} {'每次追加':>10} {'读取解析':>10} {'大小':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, operator_cls in (("JSON文本", JsonDailyStudyOperator), ("int32 BLOB", DailyStudyOperator)):
+            appended, read, size = run(operator_cls, os.path.join(tmp, f"{operator_cls.__name__}.db"), word_ids, reads)
+            print(f"{name:<12} {appended:>9.2f}s {appended / count * 1e6:>8.1f}µs {read * 1e3:>8.3f}ms {size / 1024:>8.1f}KB")
+
+if __name__ == "__main__":
+    main()
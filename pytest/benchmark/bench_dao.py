@@ -0,0 +1,36 @@
+"""
+DAO表访问开销基准测试
+对比每次访问都构造操作对象(旧行为)与按连接缓存操作对象的单次开销
+
+运行: python pytest/benchmark/bench_dao.py
+"""
+import sys
+import os
+import sqlite3
+import timeit
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.core.database import DAO
+from src.core.database.user import UserOperator
+
+def main(number: int = 20000):
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    dao = DAO(conn, "user")
+    dao.user.insert({"username": "bench"})
+
+    # 旧行为: 每次访问都构造新的操作对象并查询sqlite_master
+    before = timeit.timeit(lambda: UserOperator(conn), number=number)
+    # 新行为: 命中缓存
+    after = timeit.timeit(lambda: dao.user, number=number)
+
+    print(f"访问次数: {number}")
+    print(f"每次构造: {before / number * 1e6:.2f} us/次")
+    print(f"缓存命中: {after / number * 1e6:.2f} us/次")
+    print(f"加速比:   {before / after:.1f}x")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+读写并发基准测试
+模拟流式响应线程持续写入消息时,主线程读取聊天记录的延迟
+对比默认日志模式(DELETE)与连接池WAL模式
+
+两种模式执行相同次数的读取,写线程按固定间隔提交片段(模拟流式响应的节奏),
+因此两种模式的样本数相同、写入压力相近。等待锁超时(database is locked)的读取
+计为超时,不计入延迟分位数。
+
+运行: python pytest/benchmark/bench_db_concurrency.py
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.core.database import DAO
+from src.core.database.pool import ConnectionPool
+import src.core.database.context  # 注册context表
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def run(
+    journal_mode: str,
+    reads: int = 500,
+    write_interval: float = 0.002,
+    chunk_size: int = 40,
+    busy_timeout: float = 1.0
+):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    pool = ConnectionPool(
+        path, journal_mode=journal_mode, busy_timeout=busy_timeout,
+        synchronous="NORMAL" if journal_mode == "WAL" else "FULL"
+    )
+
+    with pool.write() as conn:
+        context = DAO(conn, "context").context
+        conn.execute("PRAGMA foreign_keys = OFF")
+        context.batch_insert([
+            {"user_id": 1, "content": f"history {i}", "role": "user"} for i in range(5000)
+        ])
+
+    stop = threading.Event()
+    written = [0]
+    write_timeouts = [0]
+
+    def stream_writer():
+        # 每个流式片段单独提交,模拟逐条持久化消息;按固定间隔写入,不独占数据库
+        while not stop.wait(write_interval):
+            try:
+                with pool.write() as conn:
+                    DAO(conn, "context").context.add_chat_record(user_id=1, content="x" * chunk_size, role="ai")
+                written[0] += 1
+            except sqlite3.OperationalError:
+                write_timeouts[0] += 1
+
+    writer = threading.Thread(target=stream_writer, daemon=True)
+    writer.start()
+
+    reader = DAO(pool.reader, "context").context
+    latencies = []
+    timeouts = 0
+    for _ in range(reads):
+        start = time.perf_counter()
+        try:
+            reader.get_records_by_user(1, limit=50)
+        except sqlite3.OperationalError:
+            # 超过busy_timeout仍未取得锁
+            timeouts += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+
+    stop.set()
+    writer.join()
+    pool.close()
+
+    summary = (f"p50 {percentile(latencies, 0.5) * 1e3:.3f} ms, "
+               f"p99 {percentile(latencies, 0.99) * 1e3:.3f} ms, "
+               f"max {max(latencies) * 1e3:.3f} ms") if latencies else "无成功读取"
+    print(f"[{journal_mode}] 读取 {len(latencies)}/{reads} 次 (超时 {timeouts}), "
+          f"写入 {written[0]} 条 (超时 {write_timeouts[0]}) | {summary}")
+
+if __name__ == "__main__":
+    run("DELETE")
+    run("WAL")
@@ -0,0 +1,71 @@
+"""
+相似干扰项索引基准测试
+各1万条单词的 cet4lx / gre 单词表: 离线构建干扰项索引的耗时与索引大小,
+以及每张选择卡/听写卡取3个干扰项的延迟(ORDER BY RANDOM() 原实现 / 随机抽样 / 干扰项索引)
+
+运行: python pytest/benchmark/bench_distractor_index.py
+"""
+import sys
+import os
+import random
+import tempfile
+import time
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.ui.recite.data_analysis import Word, WordDatabase
+
+POS = ("n.", "v.", "adj.", "adv.", "prep.")
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+def make_words(rows: int, seed: int):
+    """生成拼写长度与分布接近真实词表的单词"""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < rows:
+        words.add("".join(rng.choice(LETTERS) for _ in range(rng.randint(4, 11))))
+    return [(word, None, f"{rng.choice(POS)} 释义{i}") for i, word in enumerate(sorted(words))]
+
+def main(rows: int = 10_000, cards: int = 400):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = WordDatabase(os.path.join(tmp, "words.db"))
+        db._init_tables()
+        for seed, table in enumerate(("cet4lx", "gre")):
+            db.cursor.executemany(
+                f"INSERT INTO {table} (word, pronunciation, translation) VALUES (?, ?, ?)",
+                make_words(rows, seed)
+            )
+        db.conn.commit()
+
+        print(f"每个单词表 {rows} 条单词, 每种方式取 {cards} 张卡片的干扰项")
+        for table in ("cet4lx", "gre"):
+            start = time.perf_counter()
+            built = db.build_distractor_index(table)
+            build_time = time.perf_counter() - start
+            db.cursor.execute(
+                "SELECT SUM(LENGTH(neighbours)) FROM distractor_index WHERE table_name=?", (table,)
+            )
+            size = db.cursor.fetchone()[0]
+            print(f"{table}: 构建索引 {built} 个单词 {build_time:.2f} s, 近邻数据 {size / 1024:.0f} KB")
+
+            word_ids = [random.randint(1, rows) for _ in range(cards)]
+
+            def order_by_random(word_id):
+                db.cursor.execute(f"SELECT * FROM {table} ORDER BY RANDOM() LIMIT 3")
+                return [Word.from_row(row) for row in db.cursor.fetchall()]
+
+            for name, query in (
+                ("ORDER BY RANDOM", order_by_random),
+                ("随机抽样", lambda word_id: db.random_query(table, 3, exclude_ids=(word_id,))),
+                ("干扰项索引", lambda word_id: db.distractors(table, word_id, 3)),
+            ):
+                start = time.perf_counter()
+                for word_id in word_ids:
+                    assert len(query(word_id)) == 3
+                elapsed = time.perf_counter() - start
+                print(f"    {name:<16} {elapsed / cards * 1e6:>8.1f}µs/卡片")
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+上下文组装基准测试
+每轮追加一条消息后获取上下文: 逐条重建(旧行为) 与 增量维护的上下文 对比
+
+运行: python pytest/benchmark/bench_message_context.py
+"""
+import sys
+import os
+import time
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.core.api.llm.model.message import Message
+
+def rebuild(manager: Message):
+    # 旧行为: 在锁内为每条系统消息和对话消息构造新字典
+    manager._apply_compression_results()
+    with manager.lock:
+        context = [{"role": msg["role"], "content": msg["content"]} for msg in manager.system_pompmts]
+        for msg in manager.message_queue.values():
+            context.append({"role": msg["role"], "content": msg["content"]})
+    return context
+
+def measure(manager: Message, get_context, rounds: int) -> float:
+    start = time.perf_counter()
+    for i in range(rounds):
+        manager.add_message("user", f"round {i}")
+        get_context()
+    return (time.perf_counter() - start) / rounds
+
+def main(sizes=(1_000, 10_000, 100_000), rounds: int = 50):
+    print(f"{'消息数':>8} {'逐条重建':>12} {'增量维护':>12} {'加速比':>8}")
+    for size in sizes:
+        manager = Message("bench", system_prompt="你是一个英语学习助手")
+        for i in range(size):
+            manager.add_message("user" if i % 2 else "assistant", f"message {i}")
+        assert manager.get_context() == rebuild(manager)
+
+        before = measure(manager, lambda: rebuild(manager), rounds)
+        after = measure(manager, manager.get_context, rounds)
+        manager.close()
+        print(f"{size:>8} {before * 1e3:>10.3f}ms {after * 1e3:>10.3f}ms {before / after:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+响应缓存基准测试
+关闭采样的重复请求: 内存层命中、持久层命中(重启后) 的查找耗时
+
+运行: python pytest/benchmark/bench_response_cache.py
+"""
+import sys
+import os
+import tempfile
+import time
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.core.api.llm.response_cache import ResponseCache
+
+def make_payload(i: int, turns: int = 20) -> dict:
+    messages = [{"role": "system", "content": "你是一个英语单词讲解助手,请给出释义与例句。"}]
+    for t in range(turns):
+        messages.append({"role": "user", "content": f"请解释单词 word{i}-{t} 的用法"})
+        messages.append({"role": "assistant", "content": f"word{i}-{t} 表示……例句: This is word{i}-{t}."})
+    return {"model": "glm-4.5-flash", "messages": messages, "stream": False,
+            "temperature": 0.75, "top_p": 0.9, "max_tokens": 1024, "do_sample": False}
+
+def per_lookup(cache: ResponseCache, payloads, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            assert cache.lookup(payload) is not None
+        best = min(best, time.perf_counter() - start)
+    return best / len(payloads)
+
+def main(count: int = 1000):
+    payloads = [make_payload(i) for i in range(count)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        cache = ResponseCache(path, capacity=count)
+        for i, payload in enumerate(payloads):
+            cache.store(payload, f"回复{i}" * 50)
+        memory = per_lookup(cache, payloads)
+        cache.close()
+
+        # 容量为1的新实例: 几乎每次都从SQLite读取
+        reopened = ResponseCache(path, capacity=1)
+        disk = per_lookup(reopened, payloads, repeat=1)
+        reopened.close()
+
+    print(f"{count} 条请求,每条 {len(payloads[0]['messages'])} 条消息")
+    print(f"内存层命中: {memory * 1e6:8.1f}us/次")
+    print(f"持久层命中: {disk * 1e6:8.1f}us/次")
+
+if __name__ == "__main__":
+    main()
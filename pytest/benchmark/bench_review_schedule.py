@@ -0,0 +1,86 @@
+"""
+间隔重复调度基准测试
+一个学习计划中5万个单词的调度状态(到期时间分布在未来60天内, 另有一个同样规模的学习计划):
+每天开始背诵时取出到期单词并建堆(有无到期时间索引对比), 一次背诵中200次回答的调度与写回耗时
+
+运行: python pytest/benchmark/bench_review_schedule.py
+"""
+import sys
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.core.database import DAO, MigrationRunner
+from src.core.review import Rating, ReviewScheduler, ReviewSession, ReviewState
+from src.core.review.scheduler import DAY
+
+NOW = 1_700_000_000
+
+def open_schedule(path: str, indexed: bool):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    schedule = DAO(conn, "word_schedule").word_schedule
+    if indexed:
+        MigrationRunner(conn).run()
+    # 测试库中没有study_plan表
+    conn.execute("PRAGMA foreign_keys = OFF")
+    return conn, schedule
+
+def populate(schedule, conn, words: int, plans: int):
+    rng = random.Random(0)
+    for plan_id in range(1, plans + 1):
+        schedule.save_states(plan_id, (
+            ReviewState(word_id, NOW + rng.randrange(-2 * DAY, 60 * DAY), rng.uniform(1, 60),
+                        rng.uniform(1, 10), rng.randint(1, 10), rng.randint(0, 3), NOW - 5 * DAY)
+            for word_id in range(1, words + 1)
+        ))
+    conn.commit()
+
+def timed(func, repeat: int = 20):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main(words: int = 50_000, plans: int = 2, answers: int = 200):
+    scheduler = ReviewScheduler()
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"每个学习计划 {words} 个单词, 共 {plans} 个学习计划")
+        for indexed in (False, True):
+            path = os.path.join(tmp, f"schedule_{indexed}.db")
+            conn, schedule = open_schedule(path, indexed)
+            populate(schedule, conn, words, plans)
+
+            elapsed, session = timed(lambda: ReviewSession(scheduler, schedule.get_due(1, NOW)))
+            label = "到期时间索引" if indexed else "无索引(全表扫描)"
+            print(f"{label:<14} 取出到期单词并建堆: {len(session)} 个单词 {elapsed * 1e3:.2f} ms")
+            limited, _ = timed(lambda: ReviewSession(scheduler, schedule.get_due(1, NOW, limit=answers)))
+            print(f"{label:<14} 取出最早到期的{answers}个单词: {limited * 1e3:.2f} ms")
+        counted, _ = timed(lambda: schedule.count_due(1, NOW))
+        print(f"到期数量统计(只读索引): {counted * 1e3:.2f} ms")
+
+        rng = random.Random(1)
+        start = time.perf_counter()
+        for i in range(answers):
+            word_id = session.pop(NOW)
+            if word_id is None:
+                break
+            session.answer(word_id, rng.choice(list(Rating)), NOW + i * 10)
+        answered = time.perf_counter() - start
+        start = time.perf_counter()
+        with conn:
+            schedule.save_states(1, session.changes())
+        saved = time.perf_counter() - start
+        print(f"{answers} 次回答的调度: {answered * 1e3:.2f} ms, 写回 {len(session.changes())} 个状态: {saved * 1e3:.2f} ms")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
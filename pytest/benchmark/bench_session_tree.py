@@ -0,0 +1,85 @@
+"""
+会话树上下文加载基准测试
+1000个节点、每个节点20条消息的对话树: 加载时为每个节点创建上下文(原实现) 与 首次访问时创建(LRU常驻16个) 对比
+每种方式在独立进程中运行,分别统计加载耗时与常驻内存(RSS)增量
+
+运行: python pytest/benchmark/bench_session_tree.py
+"""
+import sys
+import os
+import subprocess
+import tempfile
+import time
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.core.api.llm.model import Message
+from src.core.bridge import DataStorageManager
+from src.core.branchdialogue.context_cache import ContextCache
+from src.core.database import DB
+
+def rss_kib() -> int:
+    """当前进程的常驻内存(KiB)"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+def prepare(path: str, nodes: int, turns: int):
+    db = DB(path)
+    storage = DataStorageManager()
+    storage.set_database(db)
+    for session_id in range(1, nodes + 1):
+        message = Message(session_id, system_prompt="你是一个英语口语陪练")
+        for t in range(turns):
+            message.add_message("user" if t % 2 == 0 else "assistant", f"节点{session_id}的第{t}条消息 " * 4)
+        storage.save_message_context(session_id, message)
+        message.close()
+    storage.close()
+    db.close()
+
+def run(mode: str, path: str, nodes: int, switches: int):
+    db = DB(path)
+    storage = DataStorageManager()
+    storage.set_database(db)
+    base = rss_kib()
+    start = time.perf_counter()
+    if mode == "eager":
+        contexts = {}
+        for session_id in range(1, nodes + 1):
+            message = Message(session_id)
+            message.load_context(**storage.load_message_context(session_id))
+            contexts[session_id] = message
+        get = contexts.__getitem__
+    else:
+        cache = ContextCache(Message, storage.load_message_context, storage.save_message_context, capacity=16)
+        get = cache.get
+    get(1).get_context()
+    loaded = time.perf_counter() - start
+    # 模拟用户在若干分支间切换
+    start = time.perf_counter()
+    for i in range(switches):
+        get(1 + (i * 37) % nodes).get_context()
+    switched = time.perf_counter() - start
+    print(f"{mode} {loaded * 1e3:.1f} {switched * 1e3:.1f} {rss_kib() - base}")
+    storage.close()
+    db.close()
+
+def main(nodes: int = 1000, turns: int = 20, switches: int = 50):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tree.db")
+        prepare(path, nodes, turns)
+        print(f"{nodes} 个节点,每个节点 {turns} 条消息,切换 {switches} 次")
+        print(f"{'方式':<8} {'加载':>10} {'切换':>10} {'RSS增量':>10}")
+        for mode in ("eager", "lazy"):
+            output = subprocess.run(
+                [sys.executable, __file__, mode, path, str(nodes), str(switches)],
+                capture_output=True, text=True, check=True
+            ).stdout.split()
+            _, loaded, switched, rss = output
+            print(f"{mode:<8} {loaded:>8}ms {switched:>8}ms {int(rss) / 1024:>8.1f}MB")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5:
+        run(sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main()
@@ -0,0 +1,56 @@
+"""
+token估算基准测试
+数MB中英混合文本: 逐字符循环(原ZhipuAIProvider.token_count) 与 按编码长度估算 对比
+
+运行: python pytest/benchmark/bench_tokenizer.py
+"""
+import sys
+import os
+import random
+import time
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.core.api.llm.model.tokenizer import EstimateTokenizer
+
+CHINESE = "今天我们学习新的英语单词并复习昨天的内容记忆需要反复练习"
+ENGLISH = "the quick brown fox jumps over the lazy dog vocabulary review "
+
+def make_text(size_mb: float, seed: int = 42) -> str:
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    while size < size_mb * 1024 * 1024:
+        source = CHINESE if rng.random() < 0.5 else ENGLISH
+        start = rng.randrange(len(source))
+        piece = source[start:start + rng.randint(4, 40)]
+        parts.append(piece)
+        size += len(piece.encode("utf-8"))
+    return "".join(parts)
+
+def loop_estimate(text: str) -> int:
+    ch_count = sum(1 for c in text if '一' <= c <= '鿿')
+    en_count = len(text) - ch_count
+    return int(en_count / 4 + ch_count / 2)
+
+def best_of(func, text, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main(sizes=(1, 4, 16)):
+    tokenizer = EstimateTokenizer()
+    print(f"{'大小':>6} {'逐字符循环':>12} {'编码估算':>12} {'加速比':>8}")
+    for size_mb in sizes:
+        text = make_text(size_mb)
+        assert tokenizer.count(text) == loop_estimate(text)
+        before = best_of(loop_estimate, text)
+        after = best_of(tokenizer.count, text)
+        print(f"{size_mb:>4}MB {before * 1e3:>10.2f}ms {after * 1e3:>10.2f}ms {before / after:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
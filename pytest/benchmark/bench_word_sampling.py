@@ -0,0 +1,53 @@
+"""
+随机干扰项抽取基准测试
+各1万条单词的 cet4lx / gre 单词表, 模拟200个单词的背诵(每个单词的选择卡与听写卡各抽取3个干扰项):
+ORDER BY RANDOM() 全表排序(原实现) 与 内存id数组抽样后按主键取回 对比
+
+运行: python pytest/benchmark/bench_word_sampling.py
+"""
+import sys
+import os
+import tempfile
+import time
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.ui.recite.data_analysis import Word, WordDatabase
+
+def prepare(path: str, rows: int) -> WordDatabase:
+    db = WordDatabase(path)
+    db._init_tables()
+    for table in ("cet4lx", "gre"):
+        db.cursor.executemany(
+            f"INSERT INTO {table} (word, pronunciation, translation) VALUES (?, ?, ?)",
+            [(f"{table}_{i}", f"/{table}{i}/", f"n. {table} 第{i}个单词的释义,含若干例句与搭配") for i in range(rows)]
+        )
+    db.conn.commit()
+    return db
+
+def order_by_random(db: WordDatabase, table: str, count: int, exclude_id: int):
+    db.cursor.execute(f"SELECT * FROM {table} ORDER BY RANDOM() LIMIT ?", (count,))
+    return [Word.from_row(row) for row in db.cursor.fetchall()]
+
+def sampled(db: WordDatabase, table: str, count: int, exclude_id: int):
+    return db.random_query(table, count, exclude_ids=(exclude_id,))
+
+def main(rows: int = 10_000, words: int = 200):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = prepare(os.path.join(tmp, "words.db"), rows)
+        queries = words * 2
+        print(f"每个单词表 {rows} 条单词, {words} 个单词共 {queries} 次抽取")
+        print(f"{'单词表':<8} {'方式':<16} {'总耗时':>10} {'每次':>10}")
+        for table in ("cet4lx", "gre"):
+            for name, query in (("ORDER BY RANDOM", order_by_random), ("id数组抽样", sampled)):
+                start = time.perf_counter()
+                for i in range(queries):
+                    result = query(db, table, 3, i % rows + 1)
+                    assert len(result) == 3
+                elapsed = time.perf_counter() - start
+                print(f"{table:<8} {name:<16} {elapsed * 1e3:>8.1f}ms {elapsed / queries * 1e6:>8.1f}µs")
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+单词统计计数基准测试
+10万次单词事件: 逐条increment_stat 与 内存聚合缓冲区批量写入 对比
+
+运行: python pytest/benchmark/bench_word_stats.py
+"""
+import sys
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+# 添加项目根目录到模块查找路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.core.database import DAO
+from src.core.database.stats import STAT_FIELDS
+import src.core.database.stats  # 注册word_stats表
+
+def make_events(count: int, vocabulary: int):
+    rng = random.Random(42)
+    return [(rng.randrange(vocabulary), rng.choice(STAT_FIELDS)) for _ in range(count)]
+
+def open_operator():
+    conn = sqlite3.connect(os.path.join(tempfile.mkdtemp(), "stats.db"))
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn, DAO(conn, "word_stats").word_stats
+
+def main(count: int = 100_000, vocabulary: int = 5_000):
+    events = make_events(count, vocabulary)
+
+    conn, stats = open_operator()
+    start = time.perf_counter()
+    with conn:
+        for word_id, field in events:
+            stats.increment_stat(word_id, field)
+    per_event = time.perf_counter() - start
+    expected = [tuple(r) for r in conn.execute("SELECT word_id, " + ", ".join(STAT_FIELDS) + " FROM word_stats ORDER BY word_id")]
+    conn.close()
+
+    conn, stats = open_operator()
+    buffer = stats.buffer(max_pending=vocabulary, flush_interval=1.0)
+    start = time.perf_counter()
+    for word_id, field in events:
+        buffer.record(word_id, field)
+    buffer.flush()
+    buffered = time.perf_counter() - start
+    actual = [tuple(r) for r in conn.execute("SELECT word_id, " + ", ".join(STAT_FIELDS) + " FROM word_stats ORDER BY word_id")]
+    conn.close()
+
+    assert actual == expected
+    print(f"事件数: {count}, 单词数: {vocabulary}")
+    print(f"逐条UPSERT(单事务): {per_event:.3f} s ({count / per_event:,.0f} 事件/s)")
+    print(f"聚合缓冲区:         {buffered:.3f} s ({count / buffered:,.0f} 事件/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src.core.api.llm import ZhipuAIProvider
+from src.core.api.llm.model import Message
+
+class SSEHandler(BaseHTTPRequestHandler):
+    """按请求中的最后一条消息决定响应: 'slow'时持续缓慢输出,'many'时快速输出200个片段,'401'时返回鉴权错误,
+    'drop'时输出一个片段后中断连接,'bad'时输出无法解析的片段"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(body)
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            self.respond(body)
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def respond(self, body):
+        prompt = body["messages"][-1]["content"]
+        if prompt == "401":
+            data = b'{"error": "invalid key"}'
+            self.send_response(401)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if prompt == "drop":
+            # 声明的长度大于实际发送的内容,客户端读到一半时连接关闭
+            data = b'data: {"choices": [{"index": 0, "delta": {"content": "drop-0 "}}]}\n\n'
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Content-Length", str(len(data) + 1000))
+            self.end_headers()
+            self.wfile.write(data)
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        if prompt == "bad":
+            self.wfile.write(b"data: {not json\n\n")
+            self.wfile.flush()
+            return
+        try:
+            count = {"slow": 1000, "many": 200}.get(prompt, 3)
+            for i in range(count):
+                chunk = {"choices": [{"index": 0, "delta": {"content": f"{prompt}-{i} "}}]}
+                if i == count - 1:
+                    chunk["usage"] = {"total_tokens": 42}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep({"slow": 0.05, "many": 0}.get(prompt, 0.01))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.disconnects += 1
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SSEHandler)
+    server.requests = []
+    server.disconnects = 0
+    server.lock = threading.Lock()
+    server.active = server.max_active = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def make_provider(server):
+    """创建连接到本地服务器的提供者,上下文中只有一条用户消息"""
+    def make(prompt: str):
+        provider = ZhipuAIProvider()
+        provider.initialize(api_key="k" * 20, endpoint=f"http://127.0.0.1:{server.server_address[1]}/api/paas/v4")
+        message = Message("test")
+        message.add_message("user", prompt)
+        provider.set_message(message)
+        return provider, message
+    return make
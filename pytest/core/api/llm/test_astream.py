@@ -0,0 +1,125 @@
+import asyncio
+import time
+import pytest
+from src.core.api.llm.event_loop import EventLoopThread
+from zhipuai.core._errors import (
+    APIAuthenticationError, APIConnectionError, APIResponseValidationError, APITimeoutError
+)
+from src.core.api.llm import ZhipuAIProvider
+from src.core.api.llm.client_registry import ClientRegistry, PoolConfig
+from src.core.api.llm.model import Message
+
+async def collect(provider):
+    try:
+        return [chunk async for chunk in provider.astream()]
+    finally:
+        await provider.aclose()
+
+def test_astream_yields_chunks_and_updates_context(server, make_provider):
+    provider, message = make_provider("hi")
+    finished = []
+    provider.add_stream_finish_callback(lambda role, content: finished.append((role, content)))
+    chunks = asyncio.run(collect(provider))
+    assert chunks == ["hi-0 ", "hi-1 ", "hi-2 "]
+    assert message.get_context()[-1] == {"role": "assistant", "content": "hi-0 hi-1 hi-2 "}
+    assert message.current_context_tokens == 42
+    assert finished == [("assistant", "hi-0 hi-1 hi-2 ")]
+    request = server.requests[0]
+    assert request["stream"] is True and request["messages"] == [{"role": "user", "content": "hi"}]
+    # 共享的参数实例未被修改
+    assert provider.get_params().stream is not True
+
+def test_concurrent_streams_share_one_loop(server, make_provider):
+    streams = [make_provider(f"s{i}") for i in range(3)]
+
+    async def main():
+        return await asyncio.gather(*(collect(provider) for provider, _ in streams))
+
+    results = asyncio.run(main())
+    assert results == [[f"s{i}-{j} " for j in range(3)] for i in range(3)]
+    # 三路请求在同一线程的事件循环中同时进行
+    assert server.max_active == 3
+
+def test_cancel_closes_stream(server, make_provider):
+    provider, message = make_provider("slow")
+    received = []
+
+    async def main():
+        async def consume():
+            async for chunk in provider.astream():
+                received.append(chunk)
+        task = asyncio.create_task(consume())
+        while len(received) < 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await provider.aclose()
+
+    asyncio.run(main())
+    deadline = time.time() + 2
+    while server.disconnects == 0 and time.time() < deadline:
+        time.sleep(0.05)
+    assert server.disconnects == 1
+    # 被取消的响应不写入上下文
+    assert message.get_context() == [{"role": "user", "content": "slow"}]
+
+def test_status_error_mapped(server, make_provider):
+    provider, _ = make_provider("401")
+    errors = []
+    provider.add_error_callback(lambda: errors.append(True))
+    with pytest.warns(UserWarning):
+        with pytest.raises(APIAuthenticationError):
+            asyncio.run(collect(provider))
+    assert errors == [True]
+
+# 网络错误与同步接口一样抛出SDK的异常类型,而不是httpx的异常
+@pytest.mark.parametrize("prompt,error_type", [
+    ("drop", APIConnectionError),
+    ("bad", APIResponseValidationError),
+])
+def test_transport_errors_mapped(server, make_provider, prompt, error_type):
+    provider, message = make_provider(prompt)
+    errors = []
+    provider.add_error_callback(lambda: errors.append(True))
+    with pytest.warns(UserWarning):
+        with pytest.raises(error_type):
+            asyncio.run(collect(provider))
+    assert errors == [True]
+    assert message.get_context() == [{"role": "user", "content": prompt}]
+
+def test_read_timeout_mapped(server):
+    provider = ZhipuAIProvider()
+    provider.initialize(
+        api_key="k" * 20, endpoint=f"http://127.0.0.1:{server.server_address[1]}/api/paas/v4",
+        registry=ClientRegistry(PoolConfig(timeout=0.01, connect_timeout=1.0))
+    )
+    message = Message("test")
+    message.add_message("user", "slow")
+    provider.set_message(message)
+    with pytest.warns(UserWarning):
+        with pytest.raises(APITimeoutError):
+            asyncio.run(collect(provider))
+
+def test_connect_error_mapped(server):
+    # 取得一个没有监听的端口
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    provider = ZhipuAIProvider()
+    provider.initialize(api_key="k" * 20, endpoint=f"http://127.0.0.1:{port}/api/paas/v4")
+    message = Message("test")
+    message.add_message("user", "hi")
+    provider.set_message(message)
+    with pytest.warns(UserWarning):
+        with pytest.raises(APIConnectionError):
+            asyncio.run(collect(provider))
+
+def test_event_loop_thread_runs_streams(server, make_provider):
+    loop_thread = EventLoopThread("test-loop")
+    provider, _ = make_provider("bg")
+    try:
+        assert loop_thread.submit(collect(provider)).result(5) == ["bg-0 ", "bg-1 ", "bg-2 "]
+    finally:
+        loop_thread.stop()
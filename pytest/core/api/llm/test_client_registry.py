@@ -0,0 +1,104 @@
+import asyncio
+import gc
+import threading
+import time
+import pytest
+from src.core.api.llm import ZhipuAIProvider, ProviderGroup
+from src.core.api.llm.client_registry import ClientRegistry, PoolConfig
+
+def factory(api_key, endpoint, http):
+    return object()
+
+def test_same_credentials_share_client():
+    registry = ClientRegistry()
+    a = registry.acquire("key", "http://host/v4/", factory)
+    b = registry.acquire("key", "http://host/v4", factory)
+    c = registry.acquire("other", "http://host/v4", factory)
+    assert a is b and a is not c
+    assert a.refs == 2
+    assert registry.stats() == {"clients": 2, "created": 2, "reused": 1, "evicted": 0}
+    registry.close()
+
+def test_idle_clients_evicted_after_release():
+    registry = ClientRegistry(PoolConfig(idle_timeout=0.05))
+    entry = registry.acquire("key", "http://host", factory)
+    time.sleep(0.1)
+    assert registry.evict_idle() == 0  # 仍被引用
+    registry.release(entry)
+    assert registry.evict_idle() == 0  # 刚释放,未超时
+    time.sleep(0.1)
+    assert registry.evict_idle() == 1
+    assert entry.http.is_closed
+    assert registry.acquire("key", "http://host", factory) is not entry
+    registry.close()
+
+def test_concurrency_limit():
+    registry = ClientRegistry(PoolConfig(max_concurrency=2))
+    entry = registry.acquire("key", "http://host", factory)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def request():
+        with entry.slot():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=request) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) == 2
+    registry.close()
+
+def test_async_concurrency_limit():
+    registry = ClientRegistry(PoolConfig(max_concurrency=2))
+    entry = registry.acquire("key", "http://host", factory)
+    active = 0
+    peak = 0
+
+    async def request():
+        nonlocal active, peak
+        async with entry.async_slot() as client:
+            assert client is entry.async_client()
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    async def main():
+        await asyncio.gather(*(request() for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak == 2
+    registry.close()
+
+def test_providers_share_and_release_client():
+    registry = ClientRegistry()
+    first = ZhipuAIProvider()
+    second = ZhipuAIProvider()
+    first.initialize(api_key="k" * 20, endpoint="http://127.0.0.1:1/v4", registry=registry)
+    second.initialize(api_key="k" * 20, endpoint="http://127.0.0.1:1/v4", registry=registry)
+    assert first._client is second._client
+    entry = first._client_entry
+    assert entry.refs == 2
+    first.close()
+    assert entry.refs == 1
+    del second
+    gc.collect()
+    assert entry.refs == 0
+    registry.close()
+
+def test_group_providers_reuse_shared_client():
+    group = ProviderGroup()
+    group.load_from_data([{"type": "zhipu", "voucher": {"api_key": "g" * 20, "endpoint": "http://127.0.0.1:1/v4"}, "params": {}}])
+    a = group.create_provider("zhipu")
+    b = group.create_provider("zhipu")
+    assert a._client is b._client
+    a.close()
+    b.close()
@@ -0,0 +1,122 @@
+import threading
+import time
+from src.core.api.llm.model import Message, FunctionTokenizer
+from src.core.api.llm.model.compression import CompressionExecutor
+
+def make_message(session, executor, callback, max_context_tokens=100):
+    return Message(
+        session, max_context_tokens=max_context_tokens, keep_recent=1,
+        tokenizer=FunctionTokenizer(len, per_message_tokens=0),
+        compression_callback=callback, executor=executor,
+    )
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def test_messages_share_bounded_pool():
+    before = threading.active_count()
+    executor = CompressionExecutor(max_workers=2)
+    managers = [make_message(f"s{i}", executor, lambda msgs: "s") for i in range(200)]
+    assert threading.active_count() == before
+    for manager in managers:
+        for _ in range(6):
+            manager.add_message("user", "x" * 30)
+        manager.get_context()
+    for manager in managers:
+        assert manager.wait_for_compression(5.0)
+    stats = executor.stats()
+    assert stats["peak_threads"] <= 2
+    assert stats["completed"] == stats["submitted"] == 200
+    assert all(m.get_context()[0]["content"] == "s" for m in managers)
+
+def test_active_session_first():
+    executor = CompressionExecutor(max_workers=1)
+    release = threading.Event()
+    order = []
+
+    def blocking(msgs):
+        release.wait(5)
+        return "s"
+
+    def record(name):
+        return lambda msgs: order.append(name) or "s"
+
+    blocker = make_message("blocker", executor, blocking)
+    others = {name: make_message(name, executor, record(name)) for name in ("a", "b", "c")}
+    for manager in [blocker, *others.values()]:
+        for _ in range(6):
+            manager.add_message("user", "x" * 30)
+    blocker.get_context()
+    assert wait_until(lambda: executor.stats()["queue_depth"] == 0)
+    for name in ("a", "b", "c"):
+        others[name].get_context()
+    executor.set_active("c")
+    release.set()
+    for manager in others.values():
+        assert manager.wait_for_compression(5.0)
+    assert order == ["c", "a", "b"]
+
+def test_queued_tasks_of_same_context_merged():
+    executor = CompressionExecutor(max_workers=1)
+    release = threading.Event()
+    batches = []
+
+    blocker = make_message("blocker", executor, lambda msgs: release.wait(5) and "s")
+    for _ in range(6):
+        blocker.add_message("user", "x" * 30)
+    blocker.get_context()
+
+    manager = make_message("m", executor, lambda msgs: batches.append([m["content"] for m in msgs]) or "s")
+    for i in range(4):
+        manager.add_message("user", f"{i}" * 60)
+        manager.add_message("user", f"{i}" * 60)
+        manager.get_context()
+    assert manager.pending_compressions == 4
+    release.set()
+    assert manager.wait_for_compression(5.0)
+    # 排队中的四个任务合并为一次压缩调用,每条消息只被压缩一次
+    assert len(batches) == 1
+    assert batches[0] == [f"{i}" * 60 for i in range(3) for _ in range(2)] + ["3" * 60]
+    context = manager.get_context()
+    assert [m["content"] for m in context] == ["s", "3" * 60]
+    assert executor.stats()["batches"] == 2
+
+def test_idle_workers_exit():
+    executor = CompressionExecutor(max_workers=2, idle_timeout=0.05)
+    manager = make_message("s", executor, lambda msgs: "s")
+    for _ in range(6):
+        manager.add_message("user", "x" * 30)
+    manager.get_context()
+    assert manager.wait_for_compression(5.0)
+    assert wait_until(lambda: executor.stats()["threads"] == 0)
+    # 有新任务时重新创建线程
+    for _ in range(6):
+        manager.add_message("user", "y" * 30)
+    manager.get_context()
+    assert manager.wait_for_compression(5.0)
+    stats = executor.stats()
+    assert stats["completed"] == 2 and stats["max_latency"] >= stats["avg_latency"] > 0
+
+def test_close_cancels_queued_tasks():
+    executor = CompressionExecutor(max_workers=1)
+    release = threading.Event()
+    blocker = make_message("blocker", executor, lambda msgs: release.wait(5) and "s")
+    for _ in range(6):
+        blocker.add_message("user", "x" * 30)
+    blocker.get_context()
+
+    called = []
+    manager = make_message("m", executor, lambda msgs: called.append(msgs) or "s")
+    for _ in range(6):
+        manager.add_message("user", "x" * 30)
+    manager.get_context()
+    manager.close()
+    assert manager.pending_compressions == 0
+    release.set()
+    assert blocker.wait_for_compression(5.0)
+    assert not called
@@ -0,0 +1,71 @@
+import pytest
+from src.core.api.llm.model.message import Message, CompressionResult
+
+def rebuild(manager: Message):
+    """旧实现: 每次由系统消息与队列重建上下文"""
+    return [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in list(manager.system_pompmts) + manager.get_full_context()
+    ]
+
+@pytest.fixture
+def manager():
+    manager = Message("test", system_prompt="sys")
+    yield manager
+    manager.close()
+
+def test_context_tracks_append_and_remove(manager):
+    ids = [manager.add_message("user", f"m{i}") for i in range(5)]
+    assert manager.get_context() == rebuild(manager)
+    manager.remove_message(ids[2])
+    manager.add_system_pompmt("sys2")
+    assert manager.get_context() == rebuild(manager)
+    assert [m["content"] for m in manager.get_context()] == ["sys", "sys2", "m0", "m1", "m3", "m4"]
+
+def test_unchanged_context_is_reused(manager):
+    manager.add_message("user", "a")
+    assert manager.get_context() is manager.get_context()
+
+def test_returned_context_is_snapshot(manager):
+    manager.add_message("user", "a")
+    snapshot = manager.get_context()
+    manager.add_message("assistant", "b")
+    assert [m["content"] for m in snapshot] == ["sys", "a"]
+    assert [m["content"] for m in manager.get_context()] == ["sys", "a", "b"]
+
+def test_compression_result_applied(manager):
+    ids = [manager.add_message("user", f"m{i}") for i in range(4)]
+    compressed = {"id": 1, "role": "user", "content": "summary", "is_compressed": True, "source_ids": ids[:2]}
+    manager.compression_results.append(CompressionResult(ids[:2], compressed))
+    assert [m["content"] for m in manager.get_context()] == ["sys", "summary", "m2", "m3"]
+    assert manager.get_context() == rebuild(manager)
+
+def test_excess_without_callback_drops_oldest(manager):
+    for i in range(10):
+        manager.add_message("user", f"m{i}")
+    before = manager.estimated_context_tokens
+    # 实际token数是上限的两倍,按比例换算后只保留约一半
+    removed = manager.process_token_excess(manager.max_context_tokens * 2)
+    assert [m["content"] for m in removed] == [f"m{i}" for i in range(len(removed))]
+    assert manager.estimated_context_tokens <= before // 2
+    assert manager.get_context() == rebuild(manager)
+    manager.clear_context(keep_system=False)
+    assert manager.get_context() == []
+
+def test_snapshot_round_trip(manager):
+    manager.add_message("user", "hello")
+    manager.add_message("assistant", "world")
+    manager.add_message("user", "summary", is_compressed=True, source_ids=[1])
+    snapshot = manager.snapshot()
+
+    restored = Message("test")
+    try:
+        restored.load_context(**snapshot)
+        assert restored.get_context() == manager.get_context()
+        assert restored.estimated_context_tokens == manager.estimated_context_tokens
+        assert restored.get_message(1, is_compressed=True)["content"] == "summary"
+        # 恢复后继续分配ID,不与已有消息冲突
+        new_id = restored.add_message("user", "next")
+        assert new_id == manager.add_message("user", "next")
+    finally:
+        restored.close()
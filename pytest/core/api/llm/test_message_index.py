@@ -0,0 +1,122 @@
+import threading
+import pytest
+from src.core.api.llm.model.message import Message, CompressionResult
+from src.core.api.llm.model.message_queue import MessageQueue
+
+@pytest.fixture
+def manager():
+    manager = Message("test")
+    yield manager
+    manager.close()
+
+def contents(manager: Message):
+    return [m["content"] for m in manager.get_full_context()]
+
+def test_lookup_and_remove_by_id(manager):
+    ids = [manager.add_message("user", f"m{i}") for i in range(100)]
+    assert manager.get_message(ids[50])["content"] == "m50"
+    assert manager.remove_message(ids[50])["content"] == "m50"
+    assert manager.get_message(ids[50]) is None
+    assert manager.remove_message(ids[50]) is None
+    assert manager.get_queue_size() == 99
+    assert [m["content"] for m in manager.get_context()] == contents(manager)
+
+def test_raw_and_compressed_ids_do_not_collide(manager):
+    raw_id = manager.add_message("user", "raw")
+    compressed_id = manager.add_message("user", "summary", is_compressed=True, source_ids=[raw_id])
+    assert raw_id == compressed_id == 1
+    assert manager.get_message(1)["content"] == "raw"
+    assert manager.get_message(1, is_compressed=True)["content"] == "summary"
+    assert manager.get_original_messages(compressed_id) == [manager.get_message(raw_id)]
+    manager.remove_message(1, is_compressed=True)
+    assert contents(manager) == ["raw"]
+
+def test_compression_replaces_span_at_front(manager):
+    ids = [manager.add_message("user", f"m{i}") for i in range(6)]
+    compressed = {"id": 1, "role": "user", "content": "summary", "is_compressed": True, "source_ids": ids[:3]}
+    manager.compression_results.append(CompressionResult(ids[:3], compressed, [(False, i) for i in ids[:3]]))
+    assert [m["content"] for m in manager.get_context()] == ["summary", "m3", "m4", "m5"]
+
+def test_compression_inserts_at_middle(manager):
+    ids = [manager.add_message("user", f"m{i}") for i in range(5)]
+    compressed = {"id": 1, "role": "user", "content": "summary", "is_compressed": True, "source_ids": ids[1:3]}
+    manager.compression_results.append(CompressionResult(ids[1:3], compressed))
+    manager.get_context()
+    assert contents(manager) == ["m0", "summary", "m3", "m4"]
+
+def test_compression_splices_without_rebuilding_queue(manager):
+    ids = [manager.add_message("user", f"m{i}") for i in range(6)]
+    queue = manager.message_queue
+    manager.remove_message(ids[2])  # 被压缩的第一条消息已被删除: 插入到下一条处
+    compressed = {"id": 1, "role": "user", "content": "summary", "is_compressed": True, "source_ids": ids[2:4]}
+    manager.compression_results.append(CompressionResult(ids[2:4], compressed, [(False, i) for i in ids[2:4]]))
+    manager.get_context()
+    assert manager.message_queue is queue
+    assert contents(manager) == ["m0", "m1", "summary", "m4", "m5"]
+
+def test_compression_of_removed_span_is_discarded(manager):
+    ids = [manager.add_message("user", f"m{i}") for i in range(3)]
+    manager.remove_message(ids[0])
+    compressed = {"id": 1, "role": "user", "content": "summary", "is_compressed": True, "source_ids": ids[:1]}
+    manager.compression_results.append(CompressionResult(ids[:1], compressed))
+    assert [m["content"] for m in manager.get_context()] == ["m1", "m2"]
+
+def test_message_queue_links():
+    queue = MessageQueue([("a", 1), ("c", 3)])
+    queue.insert_before("c", "b", 2)
+    queue.appendleft("z", 0)
+    queue["a"] = 10  # 已有的键只替换值
+    assert list(queue.items()) == [("z", 0), ("a", 10), ("b", 2), ("c", 3)]
+    del queue["b"]
+    assert list(queue) == ["z", "a", "c"] and queue.first_key() == "z"
+    assert queue.pop("missing", None) is None
+    with pytest.raises(KeyError):
+        queue.insert_before("missing", "d", 4)
+    queue.clear()
+    assert queue == {} and queue.first_key() is None
+
+def test_failed_compression_drops_span(manager):
+    ids = [manager.add_message("user", f"m{i}") for i in range(3)]
+    manager.compression_results.append(CompressionResult(ids[:2], None))
+    assert [m["content"] for m in manager.get_context()] == ["m2"]
+
+def test_concurrent_append_and_compression():
+    compressed_batches = []
+
+    def compress(messages):
+        compressed_batches.append([m["content"] for m in messages])
+        return "summary"
+
+    manager = Message("test", compression_callback=compress)
+    try:
+        writers = 4
+        per_writer = 250
+
+        def append(n):
+            for i in range(per_writer):
+                manager.add_message("user", f"w{n}-{i}")
+                if i % 50 == 0:
+                    manager.handle_token_excess(1.0)
+                    manager.get_context()
+
+        threads = [threading.Thread(target=append, args=(n,)) for n in range(writers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert manager.wait_for_compression(5.0)
+        context = manager.get_context()
+
+        # 每条消息要么仍在队列中,要么已被某次压缩吸收
+        # 压缩消息也可能被再次压缩
+        compressed = {c for batch in compressed_batches for c in batch if c != "summary"}
+        remaining = [m["content"] for m in manager.get_full_context() if not m["is_compressed"]]
+        assert len(remaining) == len(set(remaining))
+        expected = {f"w{n}-{i}" for n in range(writers) for i in range(per_writer)}
+        assert set(remaining) | compressed == expected
+        assert not set(remaining) & compressed
+        # 增量维护的上下文与队列一致
+        assert [m["content"] for m in context] == [m["content"] for m in manager.get_full_context()]
+        assert 0 < context.count({"role": "user", "content": "summary"}) <= len(compressed_batches)
+    finally:
+        manager.close()
@@ -0,0 +1,135 @@
+import random
+import pytest
+from src.core.api.llm.model import Message, FunctionTokenizer
+from src.core.api.llm.model.packer import ContextPacker, TokenIndex
+
+def cost(tokens, selected):
+    return sum(tokens[i] for i in selected)
+
+def test_everything_fits():
+    plan = ContextPacker().pack(10, [5, 5, 5], [False] * 3, 100)
+    assert plan.selected == [0, 1, 2] and plan.dropped == [] and plan.tokens == 25
+
+def test_pins_summaries_and_fills_recent():
+    tokens = [20, 50, 10, 50, 10, 10, 10, 10]
+    summaries = [True, False, True, False, False, False, False, False]
+    plan = ContextPacker(keep_recent=2).pack(5, tokens, summaries, 100)
+    # 系统5 + 摘要30 + 最近 10*4 = 75,再加下标3的50会超出
+    assert plan.selected == [0, 2, 4, 5, 6, 7]
+    assert plan.dropped == [1, 3]
+    assert plan.cut == 4
+    assert plan.tokens == 75
+
+def test_drops_oldest_summaries_when_tail_is_tight():
+    tokens = [40, 40, 10, 30, 30]
+    summaries = [True, True, False, False, False]
+    plan = ContextPacker(keep_recent=2).pack(0, tokens, summaries, 100)
+    assert plan.selected == [1, 3, 4]
+    assert plan.tokens == 100
+
+def test_shrinks_tail_but_keeps_last_message():
+    plan = ContextPacker(keep_recent=3).pack(0, [50, 50, 50], [False] * 3, 60)
+    assert plan.selected == [2]
+    plan = ContextPacker(keep_recent=3).pack(0, [50, 50, 500], [False] * 3, 60)
+    assert plan.selected == [2]
+
+@pytest.mark.parametrize("seed", range(50))
+def test_matches_linear_search(seed):
+    rng = random.Random(seed)
+    n = rng.randint(0, 40)
+    tokens = [rng.randint(1, 50) for _ in range(n)]
+    summaries = [rng.random() < 0.2 for _ in range(n)]
+    budget = rng.randint(0, 800)
+    keep_recent = rng.randint(1, 6)
+    plan = ContextPacker(keep_recent).pack(7, tokens, summaries, budget)
+
+    assert plan.tokens == 7 + cost(tokens, plan.selected)
+    assert sorted(plan.selected + plan.dropped) == list(range(n))
+    if n:
+        assert n - 1 in plan.selected
+    tail_start = max(0, n - keep_recent)
+    # 尾部之前能放下时: cut 为满足预算的最小位置
+    for cut in range(tail_start + 1):
+        selected = [i for i in range(cut) if summaries[i]] + list(range(cut, n))
+        if 7 + cost(tokens, selected) <= budget:
+            assert plan.cut == cut and plan.selected == selected
+            break
+
+@pytest.mark.parametrize("seed", range(20))
+def test_token_index_matches_pack(seed):
+    rng = random.Random(seed)
+    index = TokenIndex(capacity=4)
+    order = []  # [键, token数, 是否摘要, 是否暂停]
+    next_key = 0
+    for _ in range(300):
+        op = rng.random()
+        if op < 0.5 or not order:
+            entry = [next_key, rng.randint(1, 50), rng.random() < 0.2, False]
+            index.append(entry[0], entry[1], entry[2])
+            order.append(entry)
+            next_key += 1
+        elif op < 0.7:
+            entry = order.pop(rng.randrange(len(order)))
+            index.remove(entry[0])
+        elif op < 0.8:
+            # 摘要替换一段连续消息,沿用第一条的槽位
+            start = rng.randrange(len(order))
+            span = order[start:start + rng.randint(1, 3)]
+            summary = [next_key, rng.randint(1, 50), True, False]
+            next_key += 1
+            index.replace(span[0][0], summary[0], summary[1], True)
+            for entry in span[1:]:
+                index.remove(entry[0])
+            order[start:start + len(span)] = [summary]
+        else:
+            entry = rng.choice(order)
+            if entry[3]:
+                index.resume(entry[0], entry[1], entry[2])
+            else:
+                index.suspend(entry[0])
+            entry[3] = not entry[3]
+
+        active = [e for e in order if not e[3]]
+        assert index.count == len(active)
+        assert index.tokens == sum(e[1] for e in active)
+        packer = ContextPacker(keep_recent=rng.randint(1, 4))
+        budget = rng.randint(0, index.tokens + 50)
+        cut = packer.cut(3, index, budget)
+        plan = packer.pack(3, [e[1] for e in active], [e[2] for e in active], budget)
+        if cut is None:
+            continue
+        if cut == 0:
+            assert plan.dropped == []
+            continue
+        dropped = [i for i, e in enumerate(active) if index.slot(e[0]) < cut and not e[2]]
+        assert dropped == plan.dropped
+
+def test_context_stays_within_budget_while_compressing():
+    import threading
+    release = threading.Event()
+
+    def slow_compress(messages):
+        release.wait(5)
+        return "s"
+
+    manager = Message(
+        "test", max_context_tokens=100, keep_recent=2,
+        tokenizer=FunctionTokenizer(len, per_message_tokens=0),
+        compression_callback=slow_compress,
+    )
+    try:
+        for i in range(10):
+            manager.add_message("user", "x" * 20)
+        # 压缩完成前只发送预算内的最近消息
+        context = manager.get_context()
+        assert sum(len(m["content"]) for m in context) <= 100
+        assert len(context) == 5
+        assert manager.get_queue_size() == 10
+        release.set()
+        assert manager.wait_for_compression(5.0)
+        context = manager.get_context()
+        # 压缩时预留30%预算: 保留最近3条
+        assert [m["content"] for m in context] == ["s"] + ["x" * 20] * 3
+        assert manager.pending_compressions == 0
+    finally:
+        manager.close()
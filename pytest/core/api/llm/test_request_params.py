@@ -0,0 +1,67 @@
+import inspect
+from src.core.api.llm import zhipu
+from src.core.api.llm.model import ZhipuChatParams
+
+def test_payload_omits_server_defaults():
+    params = ZhipuChatParams(messages=[{"role": "user", "content": "hi"}])
+    assert set(params.payload()) == {"model", "messages", "stream", "temperature", "top_p", "max_tokens"}
+
+def test_payload_keeps_non_default_fields():
+    params = ZhipuChatParams(do_sample=False, stop=["\n"], user_id="user-123")
+    params.set_response_format("json")
+    payload = params.payload()
+    assert payload["do_sample"] is False
+    assert payload["stop"] == ["\n"]
+    assert payload["user_id"] == "user-123"
+    assert payload["response_format"] == {"type": "json_object"}
+    assert "request_id" not in payload and "tools" not in payload
+
+def test_payload_returns_fresh_dict():
+    params = ZhipuChatParams()
+    params.payload()["stream"] = True
+    assert params.payload()["stream"] is False
+
+class LegacyCompletions:
+    """不支持 response_format 的旧版SDK"""
+    def create(self, *, model, messages, stream=False, temperature=None, top_p=None, max_tokens=None):
+        return locals()
+
+class KwargsCompletions:
+    def create(self, **kwargs):
+        return kwargs
+
+def test_capabilities_probed_once_per_class(monkeypatch):
+    calls = []
+    signature = inspect.signature
+    monkeypatch.setattr(zhipu.inspect, "signature", lambda f: calls.append(f) or signature(f))
+    monkeypatch.setattr(zhipu, "_create_params", {})
+    for _ in range(3):
+        assert zhipu.supported_create_params(LegacyCompletions()) == frozenset(
+            {"model", "messages", "stream", "temperature", "top_p", "max_tokens"}
+        )
+        assert zhipu.supported_create_params(KwargsCompletions()) is None
+    assert len(calls) == 2
+
+def test_unsupported_params_removed(monkeypatch):
+    monkeypatch.setattr(zhipu, "_create_params", {})
+    provider = zhipu.ZhipuAIProvider()
+    provider._client = type("Client", (), {})()
+    provider._client.chat = type("Chat", (), {})()
+    provider._client.chat.completions = LegacyCompletions()
+    provider._params.set_response_format("json")
+    provider._params.do_sample = False
+    payload = provider._create_payload()
+    assert "response_format" not in payload and "do_sample" not in payload
+    provider._client.chat.completions = KwargsCompletions()
+    assert provider._create_payload()["response_format"] == {"type": "json_object"}
+
+def test_stream_request_body_is_minimal(make_provider, server):
+    provider, message = make_provider("hello")
+    provider.stream()
+    provider.join(10)
+    body = server.requests[0]
+    # SDK自身会附带 response_format、thinking 两个空值字段
+    for key in ("request_id", "user_id", "tools", "tool_choice", "stop", "do_sample"):
+        assert key not in body
+    assert body["stream"] is True
+    provider.close()
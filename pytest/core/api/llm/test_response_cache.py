@@ -0,0 +1,111 @@
+import asyncio
+import time
+from src.core.api.llm.response_cache import ResponseCache
+
+def payload(content="hello", **extra):
+    data = {"model": "glm-4.5-flash", "messages": [{"role": "user", "content": content}],
+            "stream": False, "temperature": 0.75, "top_p": 0.9, "max_tokens": 1024, "do_sample": False}
+    data.update(extra)
+    return data
+
+def test_key_ignores_volatile_fields():
+    assert ResponseCache.make_key(payload()) == ResponseCache.make_key(payload(stream=True, request_id="r1"))
+    assert ResponseCache.make_key(payload()) != ResponseCache.make_key(payload("other"))
+    assert ResponseCache.make_key(payload()) != ResponseCache.make_key(payload(temperature=0.5))
+
+def test_sampling_requests_bypass():
+    cache = ResponseCache()
+    sampled = payload()
+    del sampled["do_sample"]
+    cache.store(sampled, "reply")
+    assert cache.lookup(sampled) is None
+    assert cache.stats()["bypassed"] == 1 and cache.stats()["entries"] == 0
+
+def test_memory_lru():
+    cache = ResponseCache(capacity=2)
+    cache.store(payload("a"), "A")
+    cache.store(payload("b"), "B")
+    assert cache.lookup(payload("a")) == "A"
+    cache.store(payload("c"), "C")
+    assert cache.lookup(payload("b")) is None
+    assert cache.lookup(payload("a")) == "A"
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+def test_ttl_expiry():
+    cache = ResponseCache(ttl=0.05)
+    cache.store(payload(), "reply")
+    assert cache.lookup(payload()) == "reply"
+    time.sleep(0.1)
+    assert cache.lookup(payload()) is None
+
+def test_persistent_tier(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path)
+    cache.store(payload(), "持久化的回复")
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert reopened.lookup(payload()) == "持久化的回复"
+    assert reopened.lookup(payload()) == "持久化的回复"
+    assert reopened.stats()["disk_hits"] == 1 and reopened.stats()["hits"] == 1
+    reopened.close()
+
+def test_persistent_size_cap(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), capacity=1, max_bytes=250)
+    for i in range(5):
+        cache.store(payload(str(i)), str(i) * 100)
+        time.sleep(0.01)
+    rows = cache._pool.reader.execute("SELECT COUNT(*), SUM(size) FROM response_cache").fetchone()
+    assert rows[0] == 2 and rows[1] <= 250
+    assert cache.lookup(payload("4")) == "4" * 100
+    assert cache.lookup(payload("0")) is None
+    cache.close()
+
+def test_provider_uses_cache(make_provider, server):
+    provider, message = make_provider("hello")
+    provider.response_cache = ResponseCache()
+    provider.update_parameters(do_sample=False)
+    chunks = []
+    provider.add_stream_callback(chunks.append)
+    provider.stream()
+    provider.join(10)
+    first = message.get_full_context()[-1]["content"]
+
+    message.remove_message(message.get_full_context()[-1]["id"])
+    provider.stream()
+    provider.join(10)
+    assert len(server.requests) == 1
+    assert message.get_full_context()[-1]["content"] == first
+    assert "".join(chunks) == first * 2
+    provider.close()
+
+def test_provider_skips_cache_when_sampling(make_provider, server):
+    provider, message = make_provider("hello")
+    provider.response_cache = ResponseCache()
+    for _ in range(2):
+        provider.stream()
+        provider.join(10)
+        message.remove_message(message.get_full_context()[-1]["id"])
+    assert len(server.requests) == 2
+    provider.close()
+
+def test_cache_hit_after_context_detached(make_provider, server):
+    provider, message = make_provider("hello")
+    provider.response_cache = ResponseCache()
+    provider.update_parameters(do_sample=False)
+
+    async def consume(detach: bool):
+        chunks = []
+        async for chunk in provider.astream():
+            chunks.append(chunk)
+            if detach:
+                # 响应尚未写入上下文时上下文被移除
+                provider._context_manager = None
+        return chunks
+
+    first = "".join(asyncio.run(consume(False)))
+    message.remove_message(message.get_full_context()[-1]["id"])
+    assert asyncio.run(consume(True)) == [first]
+    assert len(server.requests) == 1
+    assert message.get_full_context()[-1]["content"] == "hello"
+    provider.close()
@@ -0,0 +1,128 @@
+import pytest
+from src.core.api.llm.model import Message, FunctionTokenizer
+
+def contents(manager):
+    return [m["content"] for m in manager.get_context()]
+
+@pytest.fixture
+def parent():
+    manager = Message("parent", system_prompt="sys", tokenizer=FunctionTokenizer(len, per_message_tokens=0))
+    for i in range(3):
+        manager.add_message("user", f"p{i}")
+    yield manager
+    manager.close()
+
+def test_fork_shares_prefix(parent):
+    child = parent.fork("child")
+    try:
+        assert child.base is parent.base and parent.message_queue == {}
+        assert child.base.messages[0] is parent.base.messages[0]
+        parent.add_message("user", "parent-only")
+        child.add_message("user", "child-only")
+        assert contents(parent) == ["sys", "p0", "p1", "p2", "parent-only"]
+        assert contents(child) == ["sys", "p0", "p1", "p2", "child-only"]
+        # 分支只保存分叉后的消息
+        assert [m["content"] for m in child.message_queue.values()] == ["child-only"]
+        assert child.get_queue_size() == 4
+        assert child.estimated_context_tokens == sum(len(c) for c in contents(child))
+    finally:
+        child.close()
+
+def test_nested_forks_walk_parent_to_child(parent):
+    child = parent.fork("child")
+    child.add_message("user", "c0")
+    grandchild = child.fork("grandchild")
+    grandchild.add_message("user", "g0")
+    try:
+        assert [s.length for s in grandchild.base.chain()] == [3, 4]
+        assert contents(grandchild) == ["sys", "p0", "p1", "p2", "c0", "g0"]
+        assert [m["content"] for m in grandchild.get_full_context()] == ["p0", "p1", "p2", "c0", "g0"]
+        # 分支继续分配的ID不与前缀冲突
+        ids = [m["id"] for m in grandchild.get_full_context()]
+        assert len(ids) == len(set(ids))
+        assert grandchild.get_message(ids[0])["content"] == "p0"
+    finally:
+        child.close()
+        grandchild.close()
+
+def test_removing_prefix_message_copies_on_write(parent):
+    child = parent.fork("child")
+    try:
+        first = child.get_full_context()[0]["id"]
+        assert child.remove_message(first)["content"] == "p0"
+        assert child.base is None
+        assert contents(child) == ["sys", "p1", "p2"]
+        assert contents(parent) == ["sys", "p0", "p1", "p2"]
+        assert child.estimated_context_tokens == sum(len(c) for c in contents(child))
+    finally:
+        child.close()
+
+def test_overflow_in_branch_leaves_parent_intact(parent):
+    child = parent.fork("child")
+    child.max_context_tokens = 10
+    try:
+        for i in range(3):
+            child.add_message("user", f"c{i}")
+        context = contents(child)
+        assert sum(len(c) for c in context) <= 10 and context[-1] == "c2"
+        assert contents(parent) == ["sys", "p0", "p1", "p2"]
+        assert parent.base.length == 3
+    finally:
+        child.close()
+
+def test_set_tokenizer_in_branch_keeps_parent_counts(parent):
+    child = parent.fork("child")
+    try:
+        child.set_tokenizer(FunctionTokenizer(lambda text: 10 * len(text), per_message_tokens=0))
+        assert [m["tokens"] for m in parent.base.messages] == [2, 2, 2]
+        assert parent.estimated_context_tokens == sum(len(c) for c in contents(parent))
+        assert child.estimated_context_tokens == 10 * sum(len(c) for c in contents(child))
+    finally:
+        child.close()
+
+def test_fork_does_not_wait_for_compression():
+    import threading
+    import time
+    started, release = threading.Event(), threading.Event()
+
+    def slow_compress(messages):
+        started.set()
+        release.wait(5)
+        return "s"
+
+    parent = Message(
+        "parent", max_context_tokens=100, keep_recent=2,
+        tokenizer=FunctionTokenizer(len, per_message_tokens=0),
+        compression_callback=slow_compress,
+    )
+    child = None
+    try:
+        for i in range(10):
+            parent.add_message("user", "x" * 20)
+        parent.get_context()
+        assert started.wait(5)
+        begin = time.monotonic()
+        child = parent.fork("child")
+        assert time.monotonic() - begin < 1
+        release.set()
+        assert parent.wait_for_compression(5.0)
+        # 压缩结果只作用于父上下文,分支保留原始消息
+        assert contents(parent)[0] == "s"
+        assert "s" not in contents(child)
+        assert [m["content"] for m in child.get_full_context()] == ["x" * 20] * 10
+        assert all(not m.get("is_compressed") for m in child.get_full_context())
+    finally:
+        release.set()
+        parent.close()
+        if child is not None:
+            child.close()
+
+def test_original_messages_found_in_base(parent):
+    ids = [m["id"] for m in parent.get_full_context()]
+    child = parent.fork("child")
+    try:
+        # 由前缀消息生成的摘要只在分支中
+        child.message_queue[(True, 99)] = {"id": 99, "is_compressed": True, "role": "system", "content": "s", "source_ids": ids[::-1]}
+        assert [m["content"] for m in child.get_original_messages(99)] == ["p2", "p1", "p0"]
+    finally:
+        child.close()
@@ -0,0 +1,95 @@
+import threading
+import time
+import pytest
+from src.core.api.llm.stream_buffer import StreamCoalescer
+
+class Recorder:
+    def __init__(self, delay: float = 0.0):
+        self.frames = []
+        self.delay = delay
+        self.threads = set()
+
+    def __call__(self, frame):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        self.frames.append(frame)
+
+def test_coalesces_by_size():
+    recorder = Recorder()
+    coalescer = StreamCoalescer([recorder], interval=10, max_chars=10)
+    for _ in range(10):
+        coalescer.push("abcd")
+    coalescer.close()
+    assert "".join(recorder.frames) == "abcd" * 10
+    assert recorder.frames[:3] == ["abcdabcdabcd"] * 3
+    stats = coalescer.stats()
+    assert stats["chunks"] == 10 and stats["frames"] == 4
+    assert recorder.threads == {"stream-coalescer"}
+
+def test_coalesces_by_time():
+    recorder = Recorder()
+    coalescer = StreamCoalescer([recorder], interval=0.02, max_chars=1000)
+    coalescer.push("a")
+    coalescer.push("b")
+    time.sleep(0.1)
+    assert recorder.frames == ["ab"]
+    coalescer.push("c")
+    coalescer.close()
+    assert recorder.frames == ["ab", "c"]
+    assert coalescer.stats()["merged"] == 1
+
+def test_slow_consumer_does_not_block_producer():
+    recorder = Recorder(delay=0.05)
+    coalescer = StreamCoalescer([recorder], interval=0.001, max_chars=1, capacity=4)
+    start = time.perf_counter()
+    for i in range(200):
+        coalescer.push(f"{i},")
+    produced = time.perf_counter() - start
+    coalescer.close()
+    assert produced < 0.05
+    assert "".join(recorder.frames) == "".join(f"{i}," for i in range(200))
+    stats = coalescer.stats()
+    assert stats["frames"] == len(recorder.frames) < 200
+    assert stats["max_queue_depth"] <= 4
+    assert stats["merged"] > 0 and stats["dropped"] == 0
+
+def test_drop_on_overflow():
+    release = threading.Event()
+    frames = []
+    coalescer = StreamCoalescer([lambda f: (release.wait(5), frames.append(f))],
+                                interval=10, max_chars=1, capacity=2, drop_on_overflow=True)
+    coalescer.push("0")
+    time.sleep(0.05)  # 第一帧已被取走,回调阻塞中
+    for i in range(1, 6):
+        coalescer.push(str(i))
+    release.set()
+    coalescer.close()
+    assert frames == ["0", "4", "5"]
+    assert coalescer.stats()["dropped"] == 3
+
+def test_callback_error_does_not_stop_delivery():
+    recorder = Recorder()
+
+    def broken(frame):
+        raise ValueError(frame)
+
+    coalescer = StreamCoalescer([broken, recorder], interval=10, max_chars=1)
+    coalescer.push("a")
+    coalescer.push("b")
+    coalescer.close()
+    assert recorder.frames == ["a", "b"]
+    with pytest.raises(RuntimeError):
+        coalescer.push("c")
+
+def test_provider_stream_coalesces_for_slow_callback(make_provider):
+    provider, message = make_provider("many")
+    recorder = Recorder(delay=0.005)
+    provider.add_stream_callback(recorder)
+    provider.stream()
+    provider.join(10)
+    full = "".join(f"many-{i} " for i in range(200))
+    assert "".join(recorder.frames) == full
+    assert message.get_context()[-1]["content"] == full
+    stats = provider.get_stream_stats()
+    assert stats["chunks"] == 200
+    assert stats["frames"] == len(recorder.frames) < 200
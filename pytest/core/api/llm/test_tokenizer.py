@@ -0,0 +1,86 @@
+import pytest
+from src.core.api.llm.model import Message, EstimateTokenizer, FunctionTokenizer
+from src.core.api.llm.model.message import CompressionResult
+
+def loop_estimate(text: str) -> int:
+    """原ZhipuAIProvider.token_count的逐字符实现"""
+    ch_count = sum(1 for c in text if '一' <= c <= '鿿')
+    return int((len(text) - ch_count) / 4 + ch_count / 2)
+
+@pytest.mark.parametrize("text", [
+    "",
+    "hello world",
+    "你好世界",
+    "今天学习了 vocabulary 这个单词, it means 词汇。",
+    "abc" * 1000 + "单词" * 500,
+])
+def test_estimate_matches_loop(text):
+    assert EstimateTokenizer().count(text) == loop_estimate(text)
+
+def recount(manager: Message) -> int:
+    tokenizer = manager.tokenizer
+    return sum(tokenizer.count_message(m) for m in manager.system_pompmts + manager.get_full_context())
+
+@pytest.fixture
+def manager():
+    manager = Message("test", system_prompt="你是一个英语老师")
+    yield manager
+    manager.close()
+
+def test_running_total_tracks_mutations(manager):
+    ids = [manager.add_message("user", f"第{i}条消息 message {i}") for i in range(10)]
+    manager.add_system_pompmt("extra prompt")
+    assert manager.estimated_context_tokens == recount(manager)
+    manager.remove_message(ids[3])
+    compressed = {"id": 1, "role": "user", "content": "摘要 summary", "is_compressed": True, "source_ids": ids[:2]}
+    manager.compression_results.append(CompressionResult(ids[:2], compressed))
+    manager.get_context()
+    assert manager.estimated_context_tokens == recount(manager)
+    manager.clear_context()
+    assert manager.estimated_context_tokens == recount(manager)
+    manager.clear_context(keep_system=False)
+    assert manager.estimated_context_tokens == recount(manager) == 0
+
+def test_pluggable_tokenizer(manager):
+    manager.add_message("user", "one two three")
+    manager.set_tokenizer(FunctionTokenizer(lambda text: len(text.split()), per_message_tokens=0))
+    assert manager.estimated_context_tokens == 1 + 3
+    manager.add_message("user", "four five")
+    assert manager.estimated_context_tokens == 6
+
+def test_trims_before_send_without_callback():
+    manager = Message("test", max_context_tokens=100, tokenizer=FunctionTokenizer(len, per_message_tokens=0))
+    try:
+        for i in range(10):
+            manager.add_message("user", "x" * 30)
+        context = manager.get_context()
+        assert manager.estimated_context_tokens <= 100
+        assert sum(len(m["content"]) for m in context) == manager.estimated_context_tokens
+        # 截断时预留30%预算: 只保留70以内的2条
+        assert len(context) == 2
+        # 之后追加的消息在预留的空间内,不再触发截断
+        manager.add_message("user", "x" * 30)
+        assert manager.get_context() is manager.get_context()
+        assert len(manager.get_context()) == 3
+    finally:
+        manager.close()
+
+def test_compresses_before_send_once():
+    batches = []
+    manager = Message(
+        "test", max_context_tokens=100,
+        tokenizer=FunctionTokenizer(len, per_message_tokens=0),
+        compression_callback=lambda msgs: batches.append(msgs) or "s",
+    )
+    try:
+        for i in range(10):
+            manager.add_message("user", "x" * 30)
+        manager.get_context()
+        manager.get_context()
+        assert manager.wait_for_compression(5.0)
+        context = manager.get_context()
+        assert len(batches) >= 1
+        assert context[0]["content"] == "s"
+        assert manager.estimated_context_tokens == sum(len(m["content"]) for m in context)
+    finally:
+        manager.close()
@@ -0,0 +1,155 @@
+import pytest
+from src.core.api.llm.model import Message
+from src.core.bridge import DataStorageManager
+from src.core.branchdialogue.context_cache import ContextCache
+from src.core.database import DB
+
+class SnapshotStore:
+    def __init__(self):
+        self.snapshots = {}
+        self.loads = 0
+
+    def load(self, session_id):
+        self.loads += 1
+        return self.snapshots.get(session_id)
+
+    def save(self, session_id, message):
+        self.snapshots[session_id] = message.snapshot()
+
+def make_cache(store, capacity=2):
+    created = []
+
+    def factory(session_id):
+        created.append(session_id)
+        return Message(session_id)
+
+    return ContextCache(factory, store.load, store.save, capacity=capacity), created
+
+def test_contexts_created_on_first_access():
+    store = SnapshotStore()
+    cache, created = make_cache(store)
+    assert created == [] and len(cache) == 0
+    first = cache.get(1)
+    assert cache.get(1) is first
+    assert created == [1]
+    assert cache.stats() == {"resident": 1, "hits": 1, "created": 1, "hydrated": 0, "evicted": 0}
+
+def test_lru_eviction_writes_back_and_hydrates():
+    store = SnapshotStore()
+    cache, created = make_cache(store, capacity=2)
+    cache.get(1).add_message("user", "branch one")
+    cache.get(2).add_message("user", "branch two")
+    cache.get(1)  # 1 最近访问,超出容量时淘汰 2
+    cache.get(3)
+    assert 2 not in cache and 1 in cache
+    assert store.snapshots[2]["messages"][0]["content"] == "branch two"
+
+    restored = cache.get(2)
+    assert [m["content"] for m in restored.get_context()] == ["branch two"]
+    assert cache.stats()["hydrated"] == 1 and cache.stats()["evicted"] == 2
+    assert len(cache) == 2
+
+def test_no_eviction_without_persistent_store():
+    store = SnapshotStore()
+    bound = [False]
+    cache = ContextCache(Message, store.load, store.save, capacity=1, persistent=lambda: bound[0])
+    first = cache.get(1)
+    cache.get(2)
+    # 写回的快照只会留在内存中,不淘汰
+    assert 1 in cache and store.snapshots == {}
+    bound[0] = True
+    cache.get(3)
+    assert len(cache) == 1 and 3 in cache
+    assert set(store.snapshots) == {1, 2}
+    assert cache.evict(3) is True
+
+def test_in_use_context_not_evicted():
+    store = SnapshotStore()
+    current = []
+    cache = ContextCache(
+        Message, store.load, store.save, capacity=1,
+        in_use=lambda session_id, message: message in current
+    )
+    first = cache.get(1)
+    current.append(first)
+    second = cache.get(2)
+    # 最久未访问的1仍在使用,刚取得的2也不淘汰,暂时超出容量
+    assert len(cache) == 2
+    assert cache.get(1) is first
+    assert cache.evict(1) is False
+    current[:] = [second]
+    cache.get(3)
+    assert 1 not in cache and cache.get(2) is second
+
+def test_storage_manager_caps_memory_snapshots(monkeypatch):
+    storage = DataStorageManager()
+    assert not storage.has_database
+    monkeypatch.setattr(DataStorageManager, "MAX_CONTEXT_SNAPSHOTS", 2)
+    storage._context_snapshots.clear()
+    for session_id in range(3):
+        message = Message(session_id)
+        storage.save_message_context(session_id, message)
+        message.close()
+    assert list(storage._context_snapshots) == [1, 2]
+    assert storage.load_message_context(0) is None
+    storage._context_snapshots.clear()
+
+def test_flush_and_clear():
+    store = SnapshotStore()
+    cache, _ = make_cache(store, capacity=4)
+    cache.get(1).add_message("user", "a")
+    cache.flush()
+    assert 1 in cache and store.snapshots[1]["messages"][0]["content"] == "a"
+    cache.get(1).add_message("user", "b")
+    cache.clear()
+    assert len(cache) == 0
+    assert [m["content"] for m in store.snapshots[1]["messages"]] == ["a", "b"]
+
+def test_storage_manager_snapshots_in_database(tmp_path):
+    db = DB(str(tmp_path / "chat.db"))
+    storage = DataStorageManager()
+    storage.set_database(db)
+    message = Message(7, system_prompt="sys")
+    try:
+        message.add_message("user", "持久化")
+        storage.save_message_context(7, message)
+        message.add_message("assistant", "覆盖")
+        storage.save_message_context(7, message)
+        snapshot = storage.load_message_context(7)
+        assert [m["content"] for m in snapshot["messages"]] == ["持久化", "覆盖"]
+        assert snapshot["pompmts"][0]["content"] == "sys"
+        assert storage.load_message_context(8) is None
+    finally:
+        message.close()
+        storage.close()
+        storage._db = None
+        db.close()
+
+def test_branches_store_shared_prefix_once(tmp_path):
+    db = DB(str(tmp_path / "chat.db"))
+    storage = DataStorageManager()
+    storage.set_database(db)
+    root = Message(1)
+    try:
+        for i in range(10):
+            root.add_message("user", f"root-{i}")
+        branches = [root.fork(n) for n in range(2, 6)]
+        for n, branch in enumerate(branches, start=2):
+            branch.add_message("user", f"branch-{n}")
+            storage.save_message_context(n, branch)
+        storage.save_message_context(1, root)
+        conn = db.conn
+        assert conn.execute("SELECT count(*) FROM session_segment").fetchone()[0] == 1
+        assert conn.execute("SELECT count(*) FROM session_context").fetchone()[0] == 5
+
+        first, second = storage.load_message_context(2), storage.load_message_context(3)
+        assert first["base"] is second["base"]
+        restored = Message(2)
+        restored.load_context(**first)
+        assert [m["content"] for m in restored.get_context()] == [f"root-{i}" for i in range(10)] + ["branch-2"]
+        restored.close()
+    finally:
+        root.close()
+        storage.close()
+        storage._db = None
+        db.close()
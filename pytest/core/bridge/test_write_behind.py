@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+import pytest
+from src.core.bridge import DataStorageManager, WriteBehindQueue
+from src.core.database import DB
+import src.core.database.context  # 注册context表
+
+class RecordingWriter:
+    def __init__(self, delay: float = 0.0):
+        self.batches = []
+        self.delay = delay
+        self.threads = set()
+
+    def __call__(self, batch):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        self.batches.append(list(batch))
+
+def test_coalesces_into_batches():
+    writer = RecordingWriter()
+    queue = WriteBehindQueue(writer, batch_size=10, flush_interval=10)
+    for i in range(35):
+        queue.put({"i": i})
+    queue.close()
+    assert [len(b) for b in writer.batches] == [10, 10, 10, 5]
+    assert [r["i"] for b in writer.batches for r in b] == list(range(35))
+    assert writer.threads == {"write-behind"}
+
+def test_time_threshold_flush():
+    writer = RecordingWriter()
+    queue = WriteBehindQueue(writer, batch_size=100, flush_interval=0.05)
+    queue.put({"i": 0})
+    time.sleep(0.3)
+    assert writer.batches == [[{"i": 0}]]
+    queue.close()
+
+def test_explicit_flush():
+    writer = RecordingWriter()
+    queue = WriteBehindQueue(writer, batch_size=100, flush_interval=10)
+    queue.put({"i": 0})
+    queue.put({"i": 1})
+    assert queue.flush(timeout=2)
+    assert writer.batches == [[{"i": 0}, {"i": 1}]]
+    queue.close()
+
+def test_close_is_durable_and_final():
+    writer = RecordingWriter(delay=0.01)
+    queue = WriteBehindQueue(writer, batch_size=4, flush_interval=10, max_queue=8)
+    for i in range(50):
+        queue.put({"i": i})
+    queue.close()
+    assert sum(len(b) for b in writer.batches) == 50
+    with pytest.raises(RuntimeError):
+        queue.put({"i": 50})
+
+def test_metrics():
+    writer = RecordingWriter()
+    queue = WriteBehindQueue(writer, batch_size=5, flush_interval=10)
+    for i in range(12):
+        queue.put({"i": i})
+    queue.close()
+    metrics = queue.metrics()
+    assert metrics["enqueued"] == 12
+    assert metrics["flushed"] == 12
+    assert metrics["batches"] == 3
+    assert metrics["queue_depth"] == 0
+    assert metrics["max_queue_depth"] >= 1
+    assert metrics["max_flush_latency"] >= metrics["avg_flush_latency"] >= 0
+
+def test_failed_batch_returned_on_close():
+    def failing(batch):
+        raise ValueError("disk full")
+    queue = WriteBehindQueue(failing, batch_size=2, flush_interval=10, retry_interval=10)
+    queue.put({"i": 0})
+    queue.put({"i": 1})
+    queue.put({"i": 2})
+    # 失败的记录不丢弃,关闭时交还调用方
+    assert queue.close() == [{"i": 0}, {"i": 1}, {"i": 2}]
+    metrics = queue.metrics()
+    assert metrics["failed"] >= 2 and metrics["unwritten"] == 3
+
+def test_failed_batch_retried():
+    writer = RecordingWriter()
+    failures = [2]
+    def flaky(batch):
+        if failures[0]:
+            failures[0] -= 1
+            raise ValueError("database is locked")
+        writer(batch)
+    queue = WriteBehindQueue(flaky, batch_size=2, flush_interval=10, retry_interval=0.01)
+    queue.put({"i": 0})
+    queue.put({"i": 1})
+    deadline = time.monotonic() + 2
+    while not writer.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.batches == [[{"i": 0}, {"i": 1}]]
+    assert queue.close() == []
+    assert queue.metrics()["failed"] == 4
+
+def test_put_racing_close_is_written_or_rejected():
+    writer = RecordingWriter()
+    queue = WriteBehindQueue(writer, batch_size=16, flush_interval=10, max_queue=4)
+    accepted = []
+
+    def producer(base):
+        for i in range(200):
+            try:
+                queue.put({"i": base + i})
+            except RuntimeError:
+                return
+            accepted.append(base + i)
+
+    threads = [threading.Thread(target=producer, args=(n * 1000,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.005)
+    queue.close()
+    for thread in threads:
+        thread.join()
+    # 放入成功的记录都在停止信号之前,全部写入
+    assert sorted(r["i"] for b in writer.batches for r in b) == sorted(accepted)
+
+def test_storage_manager_persists_messages(tmp_path):
+    db = DB(str(tmp_path / "chat.db"))
+    with db.write_dao("context") as dao:
+        dao.context  # 建表
+        dao._conn.execute("PRAGMA foreign_keys = OFF")
+    storage = DataStorageManager()
+    storage.set_database(db, user_id=1, batch_size=8, flush_interval=10)
+    try:
+        for i in range(20):
+            storage.save_message("user" if i % 2 == 0 else "assistant", f"m{i}")
+        storage.close()
+        rows = db.get_dao("context").context.select(order_by="id")
+        assert [r["content"] for r in rows] == [f"m{i}" for i in range(20)]
+        assert rows[1]["role"] == "ai"
+    finally:
+        storage.close()
+        db.close()
+
+def test_storage_manager_buffers_until_bound(tmp_path):
+    db = DB(str(tmp_path / "chat.db"))
+    with db.write_dao("context") as dao:
+        dao.context  # 建表
+        dao._conn.execute("PRAGMA foreign_keys = OFF")
+    storage = DataStorageManager()
+    storage.close()
+    storage.save_message("user", "早于绑定")
+    storage.set_database(db, user_id=1, batch_size=8, flush_interval=10)
+    try:
+        storage.save_message("assistant", "绑定之后")
+        storage.close()
+        rows = db.get_dao("context").context.select(order_by="id")
+        assert [r["content"] for r in rows] == ["早于绑定", "绑定之后"]
+    finally:
+        storage.close()
+        db.close()
+
+def test_storage_manager_caps_pending_messages(monkeypatch):
+    storage = DataStorageManager()
+    storage.close()
+    monkeypatch.setattr(storage, "_pending_messages", deque(maxlen=3))
+    for i in range(5):
+        storage.save_message("user", f"m{i}")
+    assert [content for _, content in storage._pending_messages] == ["m2", "m3", "m4"]
+
+def test_storage_manager_moves_unwritten_to_new_database(tmp_path):
+    storage = DataStorageManager()
+    storage.close()
+    broken = DB(str(tmp_path / "broken.db"))  # 没有context表,写入失败
+    db = DB(str(tmp_path / "chat.db"))
+    with db.write_dao("context") as dao:
+        dao.context  # 建表
+        dao._conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        storage.set_database(broken, user_id=1, flush_interval=10)
+        storage._message_queue.retry_interval = 10
+        storage.save_message("user", "m0")
+        storage.set_database(db, user_id=1, flush_interval=10)
+        assert storage.close() == []
+        assert [r["content"] for r in db.get_dao("context").context.select()] == ["m0"]
+    finally:
+        storage.close()
+        broken.close()
+        db.close()
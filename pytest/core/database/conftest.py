@@ -0,0 +1,35 @@
+import sqlite3
+import pytest
+from src.core.database import DAO
+from src.core.database.registry import OperatorRegistry
+# 导入以完成表操作类注册
+import src.core.database.context
+import src.core.database.daily
+import src.core.database.plan
+import src.core.database.schedule
+import src.core.database.settings
+import src.core.database.stats
+import src.core.database.user
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    # 与连接池中的连接一样登记,操作对象在DAO之间共享
+    OperatorRegistry.track(conn)
+    yield conn
+    OperatorRegistry.release(conn)
+    conn.close()
+
+@pytest.fixture
+def table(conn):
+    """获取表操作对象
+
+    表定义中的外键引用了测试库中不存在的表(users等),
+    建表时开启的外键约束会使插入失败,因此获取操作对象后关闭外键检查
+    """
+    def get(table_name: str):
+        operator = getattr(DAO(conn, table_name), table_name)
+        conn.execute("PRAGMA foreign_keys = OFF")
+        return operator
+    return get
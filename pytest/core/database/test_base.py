@@ -0,0 +1,59 @@
+import sqlite3
+import pytest
+from src.core.database.base import BaseTableOperator
+
+@pytest.fixture
+def context(table):
+    return table("context")
+
+# 相同形状的调用复用同一个SQL字符串
+def test_statement_cached(context):
+    first = context._statement("update", ("content",), "id=?")
+    second = context._statement("update", ("content",), "id=?")
+    assert first is second
+    assert first == "UPDATE context SET content=? WHERE id=?"
+
+def test_statement_cache_keyed_by_table(table, context):
+    settings = table("settings")
+    assert context._statement("delete", (), "id=?") != settings._statement("delete", (), "id=?")
+
+def test_statement_cache_bounded(context, monkeypatch):
+    monkeypatch.setattr(BaseTableOperator, "_statement_cache", {})
+    monkeypatch.setattr(BaseTableOperator, "STATEMENT_CACHE_SIZE", 4)
+    for i in range(10):
+        context._statement("select", ("*",), f"id={i}", None, False, False)
+    assert len(BaseTableOperator._statement_cache) <= 4
+
+def test_crud_roundtrip(context):
+    record_id = context.add_chat_record(user_id=1, content="hello", role="user")
+    assert context.get_record_by_id(record_id)["content"] == "hello"
+    assert context.update_record_by_id(record_id, content="world") == 1
+    assert context.get_record_by_id(record_id)["content"] == "world"
+    assert context.delete_record_by_id(record_id) == 1
+    assert context.get_record_by_id(record_id) is None
+
+def test_batch_insert_column_order_stable(context):
+    rows = [{"user_id": 1, "content": f"m{i}", "role": "user"} for i in range(3)]
+    assert context.batch_insert(rows) == 3
+    assert [r["content"] for r in context.select(order_by="id")] == ["m0", "m1", "m2"]
+
+def test_row_mode(context):
+    for i in range(5):
+        context.add_chat_record(user_id=1, content=f"m{i}", role="user")
+    rows = context.get_records_by_user(1, row_mode="row")
+    assert isinstance(rows[0], sqlite3.Row)
+    assert len(rows) == 5
+    assert isinstance(context.get_records_by_user(1)[0], dict)
+
+def test_limit_offset_parameterized(context):
+    for i in range(5):
+        context.add_chat_record(user_id=1, content=f"m{i}", role="user")
+    rows = context.select(order_by="id", limit=2, offset=1)
+    assert [r["content"] for r in rows] == ["m1", "m2"]
+    assert len(context.get_records_by_user(1, limit=3)) == 3
+
+def test_get_all_settings(table):
+    settings = table("settings")
+    settings.set_setting(1, "theme", "dark")
+    settings.set_setting(1, "font", "mono")
+    assert settings.get_all_settings(1) == {"theme": "dark", "font": "mono"}
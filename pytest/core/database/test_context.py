@@ -0,0 +1,50 @@
+import pytest
+
+@pytest.fixture
+def context(table):
+    context = table("context")
+    # 多条记录共享同一时间戳,验证以id作为键集分页的第二排序键
+    rows = [
+        {"user_id": 1, "content": f"m{i}", "role": "user",
+         "create_time": f"2025-01-01 00:00:{i // 3:02d}"}
+        for i in range(20)
+    ]
+    rows.append({"user_id": 2, "content": "other", "role": "user", "create_time": "2025-01-01 00:00:01"})
+    context.batch_insert(rows)
+    return context
+
+def test_select_iter_batches(context):
+    rows = list(context.select_iter(where_clause="user_id=?", where_params=(1,), order_by="id", batch_size=3))
+    assert [r["content"] for r in rows] == [f"m{i}" for i in range(20)]
+
+def test_select_iter_invalid_batch(context):
+    with pytest.raises(ValueError):
+        next(context.select_iter(batch_size=0))
+
+def test_iter_records_by_user_matches_select(context):
+    expected = [r["id"] for r in context.get_records_by_user(1)]
+    for batch_size in (1, 3, 7, 20, 50):
+        assert [r["id"] for r in context.iter_records_by_user(1, batch_size=batch_size)] == expected
+
+def test_iter_records_ascending(context):
+    ids = [r["id"] for r in context.iter_records_by_user(1, batch_size=4, descending=False)]
+    assert ids == sorted(ids)
+    assert len(ids) == 20
+
+def test_keyset_pages(context):
+    pages = []
+    before = None
+    while True:
+        page = context.get_records_by_user(1, limit=6, before=before)
+        if not page:
+            break
+        pages.extend(page)
+        before = (page[-1]["create_time"], page[-1]["id"])
+    assert [r["id"] for r in pages] == [r["id"] for r in context.get_records_by_user(1)]
+
+def test_iter_records_by_time_range(context):
+    rows = list(context.iter_records_by_time_range(
+        1, "2025-01-01 00:00:01", "2025-01-01 00:00:02", batch_size=2
+    ))
+    assert [r["content"] for r in rows] == [f"m{i}" for i in range(3, 9)]
+    assert rows == context.get_records_by_time_range(1, "2025-01-01 00:00:01", "2025-01-01 00:00:02")
@@ -0,0 +1,76 @@
+import sqlite3
+import pytest
+from src.core.database import DAO
+from src.core.database.registry import OperatorRegistry
+from src.core.database.user import UserOperator
+
+# 同一连接上的同一张表只构造一次操作对象
+def test_operator_cached_per_connection(conn):
+    dao = DAO(conn, "user")
+    assert dao.user is dao.user
+    # 不同的DAO实例共享缓存
+    assert DAO(conn, "user").user is dao.user
+
+def test_operator_not_shared_across_connections(conn):
+    other = sqlite3.connect(":memory:")
+    try:
+        assert DAO(conn, "user").user is not DAO(other, "user").user
+    finally:
+        other.close()
+
+# 未登记的连接只由DAO持有操作对象,不会被注册中心常驻引用
+def test_untracked_connection_not_pinned():
+    conn = sqlite3.connect(":memory:")
+    dao = DAO(conn, "user")
+    assert dao.user is dao.user
+    assert conn not in OperatorRegistry._instances
+    # 其他DAO不共享缓存
+    assert DAO(conn, "user").user is not dao.user
+    conn.close()
+
+def test_release_drops_cached_operators(conn):
+    DAO(conn, "user").user
+    OperatorRegistry.release(conn)
+    assert conn not in OperatorRegistry._instances
+    # 之后访问不再写入共享缓存
+    DAO(conn, "user").user
+    assert conn not in OperatorRegistry._instances
+    OperatorRegistry.track(conn)
+
+def test_invalidate_reaches_dao_local_cache():
+    conn = sqlite3.connect(":memory:")
+    dao = DAO(conn, "user")
+    first = dao.user
+    conn.execute("DROP TABLE user")
+    OperatorRegistry.invalidate()
+    assert dao.user is not first
+    assert dao.user.insert({"username": "after_migration"}) > 0
+    conn.close()
+
+# 表结构校验每个连接只执行一次
+def test_schema_checked_once(conn, monkeypatch):
+    calls = []
+    original = UserOperator._tables_exist
+    def counting(self):
+        calls.append(self)
+        return original(self)
+    monkeypatch.setattr(UserOperator, "_tables_exist", counting)
+
+    dao = DAO(conn, "user")
+    for _ in range(10):
+        dao.user
+    assert len(calls) == 1
+
+# 迁移后使缓存失效,重新校验表结构
+def test_invalidate_rechecks_schema(conn):
+    dao = DAO(conn, "user")
+    first = dao.user
+    conn.execute("DROP TABLE user")
+    dao.invalidate("user")
+    second = dao.user
+    assert second is not first
+    assert second.insert({"username": "after_migration"}) > 0
+
+def test_disallowed_table(conn):
+    with pytest.raises(AttributeError):
+        DAO(conn, "user").context
@@ -0,0 +1,174 @@
+import sqlite3
+import pytest
+from src.core.database import DAO, DB, MigrationRunner
+from src.core.database.daily import pack_word_ids, unpack_word_ids
+from src.core.database.migration import MIGRATIONS, Migration
+from src.core.database.registry import OperatorRegistry
+
+@pytest.fixture
+def migrated(conn):
+    applied = MigrationRunner(conn).run()
+    assert applied == [m.version for m in MIGRATIONS]
+    conn.execute("PRAGMA foreign_keys = OFF")
+    return conn
+
+def captured_sql(conn, call):
+    """执行call并返回其发出的最后一条SELECT(已代入参数)"""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+    return [s for s in statements if s.lstrip().upper().startswith("SELECT")][-1]
+
+def query_plan(conn, sql):
+    return " | ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql))
+
+# 每个热点查询: (表, 调用, 期望使用的索引)
+HOT_QUERIES = [
+    ("context", lambda op: op.get_records_by_user(1, limit=50), "idx_context_user_time"),
+    ("context", lambda op: op.get_records_by_user(1, scenario_id=2, limit=50), "idx_context_user_scenario_time"),
+    ("context", lambda op: op.get_records_by_user(1, limit=50, before=("2025-01-01 00:00:00", 10)), "idx_context_user_time"),
+    ("context", lambda op: op.get_records_by_time_range(1, "2025-01-01", "2025-02-01"), "idx_context_user_time"),
+    ("daily_study", lambda op: op.get_record_by_date("2025-01-01", 1), "sqlite_autoindex_daily_study"),
+    ("plan", lambda op: op.get_current_plan(1), "idx_plan_user_current"),
+    ("word_schedule", lambda op: op.get_due(1, 1_700_000_000, limit=200), "idx_word_schedule_due"),
+]
+
+@pytest.mark.parametrize("table_name,call,index", HOT_QUERIES)
+def test_hot_query_uses_index(migrated, table_name, call, index):
+    operator = getattr(DAO(migrated, table_name), table_name)
+    plan = query_plan(migrated, captured_sql(migrated, lambda: call(operator)))
+    assert index in plan, plan
+    assert f"SCAN {table_name}" not in plan, plan
+    assert "TEMP B-TREE" not in plan, plan
+
+def test_user_version_tracked(migrated):
+    runner = MigrationRunner(migrated)
+    assert runner.current_version == runner.latest_version
+    assert runner.pending() == []
+    assert runner.run() == []
+
+def test_failed_migration_rolls_back(conn):
+    def broken(c):
+        c.execute("CREATE TABLE partial (v INTEGER)")
+        raise sqlite3.OperationalError("boom")
+    runner = MigrationRunner(conn, [Migration(1, "broken", (), broken)])
+    with pytest.raises(sqlite3.OperationalError):
+        runner.run()
+    assert runner.current_version == 0
+    assert conn.execute("SELECT count(*) FROM sqlite_master WHERE name='partial'").fetchone()[0] == 0
+
+# 迁移前版本的daily_study表定义
+LEGACY_DAILY_STUDY = '''
+    CREATE TABLE daily_study (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        study_date DATE UNIQUE DEFAULT CURRENT_DATE,
+        question_count INTEGER DEFAULT 0,
+        correct_count INTEGER DEFAULT 0,
+        wrong_count INTEGER DEFAULT 0,
+        word_list TEXT,
+        usage_time INTEGER DEFAULT 0,
+        study_plan_id INTEGER,
+        review_count INTEGER DEFAULT 0,
+        new_word_count INTEGER DEFAULT 0
+    )'''
+
+def test_legacy_daily_study_rebuilt(conn):
+    conn.execute(LEGACY_DAILY_STUDY)
+    conn.execute("INSERT INTO daily_study (study_date, study_plan_id, question_count, word_list) VALUES ('2025-01-01', 1, 3, '[4]')")
+    conn.commit()
+
+    MigrationRunner(conn).run()
+    conn.execute("PRAGMA foreign_keys = OFF")
+    daily = DAO(conn, "daily_study").daily_study
+    assert daily.get_record_by_date("2025-01-01", 1)["word_list"] == [4]
+    # 同一天的第二个学习计划不再冲突
+    daily.bulk_increment_stats([{"study_plan_id": 2, "question_count": 1, "study_date": "2025-01-01"}])
+    daily.bulk_increment_stats([{"study_plan_id": 1, "question_count": 1, "study_date": "2025-01-01"}])
+    assert daily.get_record_by_date("2025-01-01", 1)["question_count"] == 4
+    assert daily.get_record_by_date("2025-01-01", 2)["question_count"] == 1
+
+def test_db_migrates_baseline_file_on_open(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    legacy = sqlite3.connect(path)
+    legacy.execute(LEGACY_DAILY_STUDY)
+    legacy.execute("INSERT INTO daily_study (study_date, study_plan_id, question_count, word_list) VALUES (date('now', 'localtime'), 1, 3, '[4, 5]')")
+    legacy.commit()
+    legacy.close()
+
+    db = DB(path)
+    try:
+        with db.write_dao("daily_study") as dao:
+            dao._conn.execute("PRAGMA foreign_keys = OFF")
+            record = dao.daily_study.increment_today_stats(1, question_count=1, wrong_word_id=[6])
+            dao.daily_study.increment_today_stats(2, question_count=1)
+        assert record["question_count"] == 4
+        assert record["word_list"] == [4, 5, 6]
+        assert MigrationRunner(db.conn).pending() == []
+    finally:
+        db.close()
+
+def test_daily_word_list_packed(conn):
+    daily = DAO(conn, "daily_study").daily_study
+    conn.execute("PRAGMA foreign_keys = OFF")
+    rows = [("2025-01-01", 1, "[4, 5]"), ("2025-01-02", 1, "[]"), ("2025-01-03", 1, "broken"), ("2025-01-04", 1, None)]
+    conn.executemany("INSERT INTO daily_study (study_date, study_plan_id, word_list) VALUES (?, ?, ?)", rows)
+    conn.commit()
+
+    MigrationRunner(conn).run()
+    conn.execute("PRAGMA foreign_keys = OFF")
+    types = [r[0] for r in conn.execute("SELECT typeof(word_list) FROM daily_study ORDER BY study_date")]
+    assert types == ["blob", "null", "null", "null"]
+    assert [daily.get_record_by_date(date, 1)["word_list"] for date, _, _ in rows] == [[4, 5], [], [], []]
+    # 迁移后的记录按字节追加
+    daily.bulk_increment_stats([{"study_plan_id": 1, "wrong_word_id": [6], "study_date": "2025-01-01"}])
+    assert daily.get_record_by_date("2025-01-01", 1)["word_list"] == [4, 5, 6]
+
+def test_daily_legacy_text_merged_before_increment(conn):
+    daily = DAO(conn, "daily_study").daily_study
+    conn.execute("PRAGMA foreign_keys = OFF")
+    # 未迁移的连接上仍是JSON文本,累加前先转换为BLOB,旧的单词ID不丢失
+    conn.execute("INSERT INTO daily_study (study_date, study_plan_id, word_list) VALUES ('2025-01-01', 1, '[4, 5]')")
+    conn.execute("INSERT INTO daily_study (study_date, study_plan_id, word_list) VALUES (date('now', 'localtime'), 2, '[7]')")
+    daily.bulk_increment_stats([{"study_plan_id": 1, "wrong_word_id": [6], "study_date": "2025-01-01"}])
+    assert conn.execute("SELECT typeof(word_list) FROM daily_study WHERE study_plan_id=1").fetchone()[0] == "blob"
+    assert daily.get_record_by_date("2025-01-01", 1)["word_list"] == [4, 5, 6]
+    assert daily.increment_today_stats(2, wrong_word_id=[8])["word_list"] == [7, 8]
+
+def test_unpack_misaligned_blob():
+    assert unpack_word_ids(pack_word_ids([4, 5]) + b"[4") == [4, 5]
+    assert unpack_word_ids(b"[4") == []
+
+def test_daily_null_plan_rows_merged(conn):
+    DAO(conn, "daily_study").daily_study
+    conn.execute("PRAGMA foreign_keys = OFF")
+    # 旧版本的表上没有表达式索引,未关联计划的记录每次累加都会新增一行
+    conn.execute("DROP INDEX idx_daily_study_date_plan")
+    rows = [("2025-01-01", 1, "[4]"), ("2025-01-01", 2, "[5]"), ("2025-01-01", None, None), ("2025-01-02", 3, "[6]")]
+    conn.executemany("INSERT INTO daily_study (study_date, question_count, word_list) VALUES (?, ?, ?)", rows)
+    conn.commit()
+
+    MigrationRunner(conn).run()
+    conn.execute("PRAGMA foreign_keys = OFF")
+    daily = DAO(conn, "daily_study").daily_study
+    assert conn.execute("SELECT count(*) FROM daily_study").fetchone()[0] == 2
+    record = daily.get_record_by_date("2025-01-01", None)
+    assert record["question_count"] == 3
+    assert record["word_list"] == [4, 5]
+    daily.bulk_increment_stats([{"study_plan_id": None, "question_count": 1, "study_date": "2025-01-01"}])
+    assert daily.get_record_by_date("2025-01-01", None)["question_count"] == 4
+
+def test_migration_invalidates_operator_cache(conn):
+    before = DAO(conn, "context").context
+    MigrationRunner(conn).run()
+    assert DAO(conn, "context").context is not before
+
+# 表操作类注册的表名必须与其建表语句创建的表一致
+@pytest.mark.parametrize("table_name", ["context", "daily_study", "plan", "settings", "word_stats", "user", "word_schedule"])
+def test_registered_name_matches_definition(conn, table_name):
+    getattr(DAO(conn, table_name), table_name)
+    assert conn.execute(
+        "SELECT count(*) FROM sqlite_master WHERE type='table' AND name=?", (table_name,)
+    ).fetchone()[0] == 1
@@ -0,0 +1,77 @@
+import threading
+import pytest
+from src.core.database import DB
+from src.core.database.pool import ConnectionPool
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), cache_size=-2000, mmap_size=1 << 20)
+    yield pool
+    pool.close()
+
+def test_pragmas(pool):
+    conn = pool.reader
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert conn.execute("PRAGMA cache_size").fetchone()[0] == -2000
+
+def test_reader_per_thread(pool):
+    main = pool.reader
+    assert pool.reader is main
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(pool.reader))
+    thread.start()
+    thread.join()
+    assert seen[0] is not main
+    assert pool.writer is not main
+
+def test_dead_thread_readers_pruned(pool):
+    for _ in range(5):
+        thread = threading.Thread(target=lambda: pool.reader)
+        thread.start()
+        thread.join()
+    pool.reader
+    assert pool.stats()["readers"] <= 2
+
+def test_write_commits_and_rolls_back(pool):
+    with pool.write() as conn:
+        conn.execute("CREATE TABLE t (v INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(RuntimeError):
+        with pool.write() as conn:
+            conn.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError
+    assert [tuple(r) for r in pool.reader.execute("SELECT v FROM t")] == [(1,)]
+
+def test_concurrent_writes_serialized(pool):
+    with pool.write() as conn:
+        conn.execute("CREATE TABLE t (v INTEGER)")
+
+    def worker(n):
+        for i in range(50):
+            with pool.write() as conn:
+                conn.execute("INSERT INTO t VALUES (?)", (n * 100 + i,))
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    # 写入进行时主线程读连接不被阻塞
+    pool.reader.execute("SELECT count(*) FROM t").fetchone()
+    for thread in threads:
+        thread.join()
+    assert pool.reader.execute("SELECT count(*) FROM t").fetchone()[0] == 200
+
+def test_closed_pool(pool):
+    pool.reader
+    pool.close()
+    with pytest.raises(Exception):
+        pool.reader
+
+def test_db_write_dao(tmp_path):
+    import src.core.database.user  # 注册user表
+    db = DB(str(tmp_path / "app.db"))
+    try:
+        with db.write_dao("user") as dao:
+            dao.user.insert({"username": "writer"})
+        assert db.get_dao("user").user.get_by_username("writer")["username"] == "writer"
+    finally:
+        db.close()
@@ -0,0 +1,31 @@
+import pytest
+from src.core.review import Rating, ReviewScheduler, ReviewState
+
+NOW = 1_700_000_000
+
+@pytest.fixture
+def schedule(table):
+    return table("word_schedule")
+
+def test_save_and_get_due(schedule, conn):
+    scheduler = ReviewScheduler()
+    states = [ReviewState(i, NOW + (i - 5) * 60, 1.0, 5.0, 1, 0, NOW - 86400) for i in range(10)]
+    assert schedule.save_states(1, states) == 10
+    schedule.save_states(2, states[:3])
+
+    due = schedule.get_due(1, NOW)
+    assert [s.word_id for s in due] == [0, 1, 2, 3, 4, 5]
+    assert due[0] == states[0]
+    assert schedule.count_due(1, NOW) == 6
+    assert [s.word_id for s in schedule.get_due(1, NOW, limit=2)] == [0, 1]
+
+    # 覆盖已有状态
+    updated = scheduler.review(0, Rating.GOOD, due[0], NOW)
+    schedule.save_states(1, [updated])
+    assert schedule.get_states(1, [0, 9, 42]) == {0: updated, 9: states[9]}
+    assert schedule.count_due(1, NOW) == 5
+    assert schedule.count_due(2, NOW) == 3
+
+def test_save_empty(schedule):
+    assert schedule.save_states(1, []) == 0
+    assert schedule.get_states(1, []) == {}
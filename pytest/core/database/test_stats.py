@@ -0,0 +1,96 @@
+import time
+import pytest
+from src.core.database import DB
+from src.core.database.stats import STAT_FIELDS, WordStatsBuffer
+
+@pytest.fixture
+def stats(table):
+    return table("word_stats")
+
+def test_increment_stat_creates_and_accumulates(stats):
+    stats.increment_stat(1, "see_count")
+    stats.increment_stat(1, "see_count", 2)
+    stats.increment_stat(1, "wrong_count")
+    result = stats.get_word_stats(1)
+    assert result["see_count"] == 3
+    assert result["wrong_count"] == 1
+
+def test_increment_stat_invalid_field(stats):
+    with pytest.raises(ValueError):
+        stats.increment_stat(1, "word")
+
+def test_upsert_word(stats):
+    row_id = stats.upsert_word(5, "apple")
+    assert stats.upsert_word(5, "apples") == row_id
+    assert stats.select(where_clause="word_id=?", where_params=(5,))[0]["word"] == "apples"
+
+def test_bulk_increment_covers_all_fields(stats):
+    stats.upsert_word(1, "apple")
+    increments = [(1, field, i + 1) for i, field in enumerate(STAT_FIELDS)]
+    increments += [(2, "correct_count", 1), (2, "correct_count", 1)]
+    assert stats.bulk_increment_stats(increments, words={2: "banana"}) == 2
+    assert stats.get_word_stats(1) == {field: i + 1 for i, field in enumerate(STAT_FIELDS)}
+    assert stats.get_word_stats(2)["correct_count"] == 2
+    words = {r["word_id"]: r["word"] for r in stats.select()}
+    assert words == {1: "apple", 2: "banana"}
+
+def test_buffer_aggregates_until_flush(stats, conn):
+    buffer = stats.buffer(max_pending=1000, flush_interval=3600)
+    for _ in range(10):
+        buffer.record(1, "see_count")
+    buffer.record(2, "listen_count", word="pear")
+    assert buffer.pending == 2
+    assert stats.select() == []
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert buffer.flush() == 2
+    conn.set_trace_callback(None)
+    assert sum(s.startswith("INSERT INTO word_stats") for s in statements) == 2  # executemany逐行追踪
+    assert stats.get_word_stats(1)["see_count"] == 10
+    assert buffer.flushed_events == 11
+
+def test_buffer_flushes_on_size(stats):
+    buffer = stats.buffer(max_pending=3, flush_interval=3600)
+    for word_id in range(3):
+        buffer.record(word_id, "use_count")
+    assert buffer.pending == 0
+    assert len(stats.select()) == 3
+
+def test_buffer_keeps_deltas_on_failure(stats):
+    calls = []
+    def failing(totals, words):
+        calls.append(dict(totals))
+        raise RuntimeError("locked")
+    buffer = WordStatsBuffer(failing, max_pending=100, flush_interval=3600)
+    buffer.record(1, "see_count")
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    buffer.record(1, "see_count")
+    assert buffer.pending == 1
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert calls[-1][1][STAT_FIELDS.index("see_count")] == 2
+
+def test_bulk_increment_leaves_transaction_to_caller(stats, conn):
+    stats.bulk_increment_stats([(1, "see_count", 1)])
+    assert conn.in_transaction
+    conn.rollback()
+    assert stats.select() == []
+
+def test_buffer_timer_flushes_while_idle(tmp_path):
+    db = DB(str(tmp_path / "stats.db"))
+    buffer = WordStatsBuffer.for_database(db, max_pending=1000, flush_interval=0.05)
+    try:
+        buffer.record(1, "see_count", word="apple")
+        deadline = time.monotonic() + 2
+        while buffer.flushed_events < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert buffer.flushed_events == 1
+        assert db.get_dao("word_stats").word_stats.get_word_stats(1)["see_count"] == 1
+        buffer.record(1, "see_count")
+        buffer.close()
+        assert db.get_dao("word_stats").word_stats.get_word_stats(1)["see_count"] == 2
+    finally:
+        buffer.close()
+        db.close()
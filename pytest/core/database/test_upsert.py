@@ -0,0 +1,92 @@
+import threading
+from datetime import datetime
+import pytest
+from src.core.database import DB
+
+@pytest.fixture
+def daily(table):
+    return table("daily_study")
+
+@pytest.fixture
+def settings(table):
+    return table("settings")
+
+def test_increment_creates_then_accumulates(daily):
+    first = daily.increment_today_stats(1, question_count=1, correct_count=1)
+    assert first["question_count"] == 1
+    assert first["word_list"] == []
+
+    second = daily.increment_today_stats(1, question_count=2, wrong_count=1, wrong_word_id=[7, 8])
+    third = daily.increment_today_stats(1, question_count=1, wrong_word_id=[9])
+    assert second["id"] == first["id"] == third["id"]
+    assert third["question_count"] == 4
+    assert third["correct_count"] == 1
+    assert third["wrong_count"] == 1
+    assert third["word_list"] == [7, 8, 9]
+    assert daily.get_today_stats(1) == third
+
+def test_increment_separate_plans(daily):
+    daily.increment_today_stats(1, question_count=1)
+    daily.increment_today_stats(2, question_count=5)
+    assert daily.get_today_stats(1)["question_count"] == 1
+    assert daily.get_today_stats(2)["question_count"] == 5
+
+def test_increment_without_plan(daily, conn):
+    first = daily.increment_today_stats(None, question_count=1, wrong_word_id=[3])
+    second = daily.increment_today_stats(None, question_count=2, wrong_word_id=[4])
+    daily.increment_today_stats(1, question_count=7)
+    assert second["id"] == first["id"]
+    assert second["question_count"] == 3
+    assert second["word_list"] == [3, 4]
+    assert conn.execute("SELECT count(*) FROM daily_study WHERE study_plan_id IS NULL").fetchone()[0] == 1
+    today = datetime.now().strftime('%Y-%m-%d')
+    assert daily.get_record_by_date(today, None) == second
+
+def test_bulk_increment(daily):
+    today = datetime.now().strftime('%Y-%m-%d')
+    daily.bulk_increment_stats([
+        {"study_plan_id": 1, "question_count": 1, "wrong_word_id": [1]},
+        {"study_plan_id": 1, "question_count": 1, "wrong_word_id": [2]},
+        {"study_plan_id": 1, "question_count": 1, "study_date": "2025-01-01"},
+    ])
+    record = daily.get_record_by_date(today, 1)
+    assert record["question_count"] == 2
+    assert record["word_list"] == [1, 2]
+    assert daily.get_record_by_date("2025-01-01", 1)["question_count"] == 1
+
+def test_concurrent_increments_atomic(tmp_path):
+    import src.core.database.daily  # 注册daily_study表
+    db = DB(str(tmp_path / "daily.db"))
+    with db.write_dao("daily_study") as dao:
+        dao.daily_study  # 建表
+        dao._conn.execute("PRAGMA foreign_keys = OFF")
+
+    def worker():
+        for _ in range(50):
+            with db.write_dao("daily_study") as dao:
+                dao.daily_study.increment_today_stats(1, question_count=1)
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert db.get_dao("daily_study").daily_study.get_today_stats(1)["question_count"] == 200
+    finally:
+        db.close()
+
+def test_set_setting_single_statement(settings, conn):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    settings.set_setting(1, "theme", "dark")
+    settings.set_setting(1, "theme", "light")
+    conn.set_trace_callback(None)
+    assert sum(s.startswith("INSERT INTO settings") for s in statements) == 2
+    assert not any(s.startswith(("SELECT", "UPDATE")) for s in statements)
+    assert settings.get_all_settings(1) == {"theme": "light"}
+
+def test_update_multiple_settings(settings):
+    settings.set_setting(1, "theme", "dark")
+    affected = settings.update_multiple_settings(1, {"theme": "light", "font": "mono", "size": "12"})
+    assert affected == 3
+    assert settings.get_all_settings(1) == {"theme": "light", "font": "mono", "size": "12"}
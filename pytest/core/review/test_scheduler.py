@@ -0,0 +1,79 @@
+import pytest
+from src.core.review import Rating, ReviewScheduler, ReviewSession, ReviewState
+from src.core.review.scheduler import DAY
+
+NOW = 1_700_000_000
+
+@pytest.fixture
+def scheduler():
+    return ReviewScheduler()
+
+def test_first_review_by_rating(scheduler):
+    states = {r: scheduler.review(1, r, now=NOW) for r in Rating}
+    assert states[Rating.AGAIN].due == NOW + scheduler.relearn_delay
+    # 评分越高,稳定性越大、难度越低、间隔越长
+    assert states[Rating.HARD].stability < states[Rating.GOOD].stability < states[Rating.EASY].stability
+    assert states[Rating.HARD].difficulty > states[Rating.GOOD].difficulty > states[Rating.EASY].difficulty
+    assert states[Rating.GOOD].due < states[Rating.EASY].due
+    assert all(s.reps == 1 and s.last_review == NOW for s in states.values())
+
+def test_successful_reviews_grow_interval(scheduler):
+    state = scheduler.review(1, Rating.GOOD, now=NOW)
+    intervals = []
+    for _ in range(4):
+        now = state.due
+        state = scheduler.review(1, Rating.GOOD, state, now)
+        intervals.append(state.due - now)
+    assert intervals == sorted(intervals)
+    assert intervals[-1] > 30 * DAY
+    assert state.reps == 5 and state.lapses == 0
+
+def test_lapse_resets_stability(scheduler):
+    state = scheduler.review(1, Rating.EASY, now=NOW)
+    state = scheduler.review(1, Rating.GOOD, state, state.due)
+    lapsed = scheduler.review(1, Rating.AGAIN, state, state.due)
+    assert lapsed.stability < state.stability
+    assert lapsed.difficulty > state.difficulty
+    assert lapsed.lapses == 1
+    assert lapsed.due == state.due + scheduler.relearn_delay
+
+def test_session_orders_by_due_and_relearns():
+    states = [
+        ReviewState(1, NOW - 100, 3.0, 5.0, 2, 0, NOW - 3 * DAY),
+        ReviewState(2, NOW - 300, 3.0, 5.0, 2, 0, NOW - 3 * DAY),
+    ]
+    session = ReviewSession(ReviewScheduler(), states)
+    session.add_new([3, 2], now=NOW)
+    assert len(session) == 3
+    assert [session.pop(NOW) for _ in range(3)] == [2, 1, 3]
+    assert session.pop(NOW) is None
+
+    # 答错的单词在重新学习间隔后回到队列
+    session.answer(2, Rating.AGAIN, NOW)
+    session.answer(1, Rating.GOOD, NOW)
+    session.answer(3, Rating.GOOD, NOW)
+    assert len(session) == 1
+    assert session.pop(NOW) == 2
+    assert {s.word_id for s in session.changes()} == {1, 2, 3}
+    session.commit()
+    assert session.changes() == []
+
+def test_session_requeue_discards_stale_entry():
+    session = ReviewSession(ReviewScheduler(), learn_ahead=0)
+    session.add_new([1], now=NOW)
+    session.answer(1, Rating.AGAIN, NOW)
+    # 旧的堆项已失效,单词只在重新学习到期后出现一次
+    assert session.pop(NOW) is None
+    assert session.pop(NOW + 600) == 1
+    assert session.pop(NOW + 600) is None
+
+def test_session_requeue_keeps_state():
+    session = ReviewSession(ReviewScheduler(), learn_ahead=0)
+    session.add_new([1, 2], now=NOW)
+    assert session.pop(NOW) == 1
+    session.requeue(1, NOW + 60)
+    # 放回的单词排在已到期的单词之后,复习状态不变
+    assert session.pop(NOW) == 2
+    assert session.pop(NOW) is None
+    assert session.pop(NOW + 60) == 1
+    assert session.state(1) is None and session.changes() == []
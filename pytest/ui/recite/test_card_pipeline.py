@@ -0,0 +1,104 @@
+import threading
+import time
+import pytest
+from src.ui.recite.card_pipeline import CardPipeline, CardPool
+
+def test_pipeline_keeps_order_and_prefetches():
+    threads = set()
+    def prepare(config):
+        threads.add(threading.current_thread().name)
+        return {"n": config["n"] * 10}
+
+    pipeline = CardPipeline(prepare, lookahead=3)
+    pipeline.extend({"n": i} for i in range(5))
+    assert len(pipeline) == 5
+    pipeline.append({"n": 5})
+    assert [pipeline.popleft()["n"] for _ in range(6)] == [0, 10, 20, 30, 40, 50]
+    assert not pipeline
+    with pytest.raises(IndexError):
+        pipeline.popleft()
+    # 数据在后台线程中准备
+    assert threading.current_thread().name not in threads
+    pipeline.close()
+
+def test_pipeline_prepares_ahead_of_consumer():
+    def prepare(config):
+        time.sleep(0.01)
+        return config
+
+    pipeline = CardPipeline(prepare, lookahead=4)
+    pipeline.extend({"n": i} for i in range(8))
+    time.sleep(0.1)
+    for _ in range(4):
+        pipeline.popleft()
+    assert pipeline.stats() == {"taken": 4, "ready": 4}
+    pipeline.close()
+
+def test_pipeline_clear_discards_queue():
+    started = threading.Event()
+    release = threading.Event()
+    def prepare(config):
+        started.set()
+        release.wait(1)
+        return config
+
+    pipeline = CardPipeline(prepare, lookahead=2)
+    pipeline.extend({"n": i} for i in range(4))
+    started.wait(1)
+    pipeline.clear()
+    release.set()
+    assert len(pipeline) == 0
+    pipeline.append({"n": 9})
+    assert pipeline.popleft() == {"n": 9}
+    pipeline.close()
+
+def test_pipeline_deferred_refill():
+    submitted = []
+    def prepare(config):
+        submitted.append(config["n"])
+        return config
+
+    pipeline = CardPipeline(prepare, lookahead=2)
+    pipeline.extend({"n": i} for i in range(4))
+    assert pipeline.popleft(refill=False) == {"n": 0}
+    time.sleep(0.05)
+    # 取卡时没有提交下一张卡片,调用refill()后才提交
+    assert submitted == [0, 1]
+    pipeline.refill()
+    assert pipeline.popleft(refill=False) == {"n": 1}
+    # 预取的卡片已取完时仍立即提交,避免下一次取卡一直等待
+    assert pipeline.popleft(refill=False) == {"n": 2}
+    assert pipeline.popleft(refill=False) == {"n": 3}
+    assert not pipeline
+    pipeline.close()
+
+class Card:
+    def __init__(self, **params):
+        self.params = params
+        self.recycled = 0
+
+    def recycle(self, **params):
+        self.params = params
+        self.recycled += 1
+
+class OtherCard(Card):
+    pass
+
+def test_pool_reuses_released_cards_by_type():
+    pool = CardPool(capacity=1)
+    first = pool.acquire(Card, word="a")
+    pool.release(first)
+    pool.release(first)
+    assert pool.stats()["idle"] == 1
+
+    # 不同类型的卡片不会互相复用
+    other = pool.acquire(OtherCard, word="b")
+    assert other is not first
+
+    again = pool.acquire(Card, word="c")
+    assert again is first
+    assert again.params == {"word": "c"} and again.recycled == 1
+
+    pool.release(pool.acquire(Card, word="d"))
+    pool.release(again)
+    assert pool.stats() == {"idle": 1, "created": 3, "reused": 1}
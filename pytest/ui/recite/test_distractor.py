@@ -0,0 +1,83 @@
+import pytest
+from src.ui.recite.data_analysis import WordDatabase
+from src.ui.recite.distractor import build_neighbours, edit_distance, edit_distances, encode, pack, pos_tag, unpack
+
+WORDS = [
+    ("abandon", "v. 放弃"),
+    ("abundant", "adj. 丰富的"),
+    ("abound", "v. 大量存在"),
+    ("absorb", "v. 吸收"),
+    ("apple", "n. 苹果"),
+    ("apply", "v. 申请"),
+    ("ample", "adj. 充足的"),
+    ("nation", "n. 国家"),
+    ("station", "n. 车站"),
+    ("ration", "n. 定量"),
+    ("zebra", "n. 斑马"),
+    ("zenith", "n. 顶点"),
+]
+
+@pytest.fixture
+def word_db(tmp_path):
+    db = WordDatabase(str(tmp_path / "words.db"))
+    db._init_tables()
+    db.cursor.executemany(
+        "INSERT INTO cet4lx (word, pronunciation, translation) VALUES (?, ?, ?)",
+        [(word, None, translation) for word, translation in WORDS]
+    )
+    db.conn.commit()
+    yield db
+    db.close()
+
+def test_helpers():
+    assert pos_tag("adj. 丰富的") == "adj"
+    assert pos_tag("苹果") == ""
+    assert pos_tag(None) == ""
+    assert edit_distance("apple", "apply") == 1
+    assert edit_distance("kitten", "sitting") == 3
+    assert list(unpack(pack([3, 1, 2]))) == [3, 1, 2]
+
+def test_edit_distances_batch_of_mixed_lengths():
+    left = ["", "abc", "kitten", "flaw", "intention", "café"]
+    right = ["abc", "", "sitting", "lawn", "execution", "cafe"]
+    codes, lengths = encode(left + right)
+    n = len(left)
+    distances = edit_distances(codes[:n], lengths[:n], codes[n:], lengths[n:])
+    assert distances.tolist() == [3, 3, 3, 2, 5, 1]
+
+def test_neighbours_prefer_similar_words():
+    words = [(i + 1, word, translation) for i, (word, translation) in enumerate(WORDS)]
+    index = build_neighbours(words, neighbours=3, window=4)
+    ids = {word: i + 1 for i, (word, _) in enumerate(WORDS)}
+    # 只差一个字母且共同前缀最长的单词最相近
+    assert index[ids["apple"]][0] == ids["apply"]
+    assert [ids[w] for w in ("ration", "station")] == list(index[ids["nation"]][:2])
+    # 共享后缀的单词在逆序排序中相邻
+    assert ids["nation"] not in index[ids["nation"]]
+
+def test_distractors_served_from_index(word_db):
+    assert word_db.build_distractor_index('cet4lx', neighbours=4) == len(WORDS)
+    word_db.cursor.execute(
+        "SELECT neighbours FROM distractor_index WHERE table_name='cet4lx' AND word_id=5"
+    )
+    neighbours = set(unpack(word_db.cursor.fetchone()[0]))
+    for _ in range(20):
+        words = word_db.distractors('cet4lx', 5, 3)
+        assert len(words) == 3
+        assert {w.id for w in words} <= neighbours
+        assert 5 not in {w.id for w in words}
+
+def test_distractors_fall_back_to_random_words(tmp_path):
+    db = WordDatabase(str(tmp_path / "plain.db"))
+    db.cursor.execute(
+        "CREATE TABLE cet4lx (id INTEGER PRIMARY KEY, word TEXT, pronunciation TEXT, translation TEXT)"
+    )
+    db.cursor.executemany(
+        "INSERT INTO cet4lx (word, translation) VALUES (?, ?)", WORDS
+    )
+    db.conn.commit()
+    # 没有干扰项索引表时使用随机单词
+    words = db.distractors('cet4lx', 1, 3)
+    assert len(words) == 3
+    assert 1 not in {w.id for w in words}
+    db.close()
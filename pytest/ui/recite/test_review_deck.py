@@ -0,0 +1,65 @@
+import random
+from src.core.review import Rating, ReviewScheduler, ReviewSession, ReviewState
+from src.ui.recite.review_deck import ReviewDeck
+
+NOW = 1_700_000_000
+CARD_TYPES = ("word", "input", "quiz", "dictation")
+
+def make_deck(word_ids, states=()):
+    session = ReviewSession(ReviewScheduler(), states)
+    words = [{"id": word_id} for word_id in word_ids]
+    return ReviewDeck(session, words, CARD_TYPES, learning_step=60, now=NOW, rng=random.Random(0))
+
+def play(deck, fail=(), step=100):
+    """每张卡片用时step秒,fail中的(单词, 卡片类型)第一次出现时答错"""
+    fail = set(fail)
+    now = NOW
+    order = []
+    while (card := deck.pop(now)) is not None:
+        word_id, card_type = card["data"]["id"], card["type"]
+        order.append((now, word_id, card_type))
+        if (word_id, card_type) in fail:
+            fail.discard((word_id, card_type))
+            deck.wrong(word_id, card_type, now)
+        deck.done(word_id, now)
+        now += step
+    return order
+
+def test_word_card_first_then_every_card_once():
+    order = play(make_deck([1, 2, 3]))
+    assert [(w, t) for _, w, t in order[:3]] == [(1, "word"), (2, "word"), (3, "word")]
+    for word_id in (1, 2, 3):
+        assert sorted(t for _, w, t in order if w == word_id) == sorted(CARD_TYPES)
+
+def test_failed_card_returns_in_due_order():
+    # 单词1的第二张卡片(单词卡之后的第一张)答错
+    second = play(make_deck([1, 2, 3, 4, 5]))[5]
+    assert second[1] == 1
+    failed_type = second[2]
+
+    deck = make_deck([1, 2, 3, 4, 5])
+    order = play(deck, fail=[(1, failed_type)])
+    failed_at = order.index(second)
+    retry = next(i for i in range(failed_at + 1, len(order)) if order[i][1:] == (1, failed_type))
+    # 答错时立即评分AGAIN,单词在重新学习间隔后到期
+    due = order[failed_at][0] + ReviewScheduler().relearn_delay
+    assert deck.session.state(1).reps == 2
+    # 按到期时间回到队列: 不会马上重做,也不会排到所有卡片之后
+    assert order[retry][0] >= due
+    assert any(w != 1 for _, w, _ in order[retry + 1:])
+    assert len(order) == 5 * len(CARD_TYPES) + 1
+
+def test_ratings_recorded_when_word_finished():
+    deck = make_deck([1, 2])
+    play(deck, fail=[(2, "word")])
+    changes = {state.word_id: state for state in deck.session.changes()}
+    assert changes[1].reps == 1
+    # 答错一次: AGAIN之后完成时记为HARD
+    assert changes[2].reps == 2
+    assert ReviewDeck.rating(0) == Rating.GOOD and ReviewDeck.rating(1) == Rating.HARD
+    assert len(deck) == 0 and len(deck.session) == 0
+
+def test_review_words_before_new_words():
+    states = [ReviewState(9, NOW - 100, 3.0, 5.0, 2, 0, NOW - 3 * 86400)]
+    order = play(make_deck([1, 9], states))
+    assert order[0][1] == 9
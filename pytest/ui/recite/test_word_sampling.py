@@ -0,0 +1,61 @@
+import threading
+import pytest
+from src.ui.recite.data_analysis import WordDatabase
+
+@pytest.fixture
+def word_db(tmp_path):
+    db = WordDatabase(str(tmp_path / "words.db"))
+    db._init_tables()
+    db.cursor.executemany(
+        "INSERT INTO cet4lx (word, pronunciation, translation) VALUES (?, ?, ?)",
+        [(f"word{i}", None, f"释义{i}") for i in range(200)]
+    )
+    db.conn.commit()
+    yield db
+    db.close()
+
+def test_random_query_returns_distinct_words(word_db):
+    words = word_db.random_query('cet4lx', 10)
+    assert len(words) == 10
+    assert len({w.id for w in words}) == 10
+    assert all(w.translation == f"释义{w.id - 1}" for w in words)
+
+def test_random_query_excludes_correct_answer(word_db):
+    for _ in range(200):
+        words = word_db.random_query('cet4lx', 3, exclude_ids=(7,))
+        assert 7 not in {w.id for w in words}
+
+def test_random_query_small_table(word_db):
+    # 抽取数量接近表大小时仍然不重复且不超过可选数量
+    word_db.cursor.execute("DELETE FROM cet4lx WHERE id > 5")
+    word_db.conn.commit()
+    word_db.refresh_ids('cet4lx')
+    words = word_db.random_query('cet4lx', 10, exclude_ids=(1,))
+    assert sorted(w.id for w in words) == [2, 3, 4, 5]
+
+def test_random_query_reloads_ids_after_delete(word_db):
+    word_db.random_query('cet4lx', 3)
+    word_db.cursor.execute("DELETE FROM cet4lx WHERE id > 20")
+    word_db.conn.commit()
+    # 缓存中的id已失效,取回的行不足时重新加载id数组
+    for _ in range(20):
+        words = word_db.random_query('cet4lx', 3)
+        assert len(words) == 3
+        assert all(w.id <= 20 for w in words)
+
+def test_random_query_invalid_table(word_db):
+    with pytest.raises(ValueError):
+        word_db.random_query('missing', 3)
+
+def test_worker_thread_uses_own_connection(word_db):
+    seen = {}
+    def worker():
+        seen["conn"], seen["cursor"] = word_db.conn, word_db.cursor
+        seen["words"] = word_db.random_query('cet4lx', 3)
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    # 预取线程与界面线程不共享连接和游标
+    assert seen["conn"] is not word_db.conn
+    assert seen["cursor"] is not word_db.cursor
+    assert len(seen["words"]) == 3
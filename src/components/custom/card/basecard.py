@@ -250,6 +250,23 @@ class BaseCard(MDCard):
         self.shake_count -= 1
         anim.start(self)
 
+    def recycle(self, **params):
+        """复用已滑出的卡片: 停止动画、重置滑动状态并绑定新的数据
+
+        子类在此基础上重置各自的答题状态
+        """
+        Animation.cancel_all(self)
+        if self._scheduled_remove:
+            self._scheduled_remove.cancel()
+            self._scheduled_remove = None
+        self._is_animating = False
+        self.is_swiping = False
+        self.swipe_direction = None
+        self.shake_count = 0
+        for key, value in params.items():
+            setattr(self, key, value)
+        Clock.schedule_once(self._update_center)
+
     def get_date(self):
         return {'id':self.id,'word':self.word,'pronunciation':self.pronunciation,'translation':self.translation}
     
@@ -115,9 +115,24 @@ class DictationCard(BaseCard):
         self.is_complete=False
         Clock.schedule_once(self._generate_options, 0)
 
+    def recycle(self, **params):
+        """复用卡片,重置答题状态并更新选项"""
+        super().recycle(**params)
+        self.is_complete=False
+        self._generate_options(0)
+
     def _generate_options(self, dt):
         """生成选项按钮"""
         container = self.ids.options_container
+        buttons = list(reversed(container.children))
+        if len(buttons) == len(self.options):
+            # 复用已有的选项按钮,只更新文字与状态
+            for idx, (btn, word) in enumerate(zip(buttons, self.options)):
+                Animation.cancel_all(btn)
+                btn.text = word
+                btn.is_correct = (idx == self.correct_index)
+                btn.is_selected = False
+            return
         container.clear_widgets()
 
         for idx, word in enumerate(self.options):
@@ -126,9 +126,28 @@ class QuizCard(BaseCard):
         self.only_one_wrong=False
         Clock.schedule_once(lambda dt: self._update_options(None, self.options), 0)
 
+    def recycle(self, **params):
+        """复用卡片,重置答题状态并更新选项"""
+        super().recycle(**params)
+        self.is_complete=False
+        self.only_one_wrong=False
+        self._update_options(None, self.options)
+
     def _update_options(self, instance, value):
         """改进后的选项生成方法"""
         container = self.ids.options_container
+        buttons = list(reversed(container.children))
+        if len(buttons) == len(self.options):
+            # 复用已有的选项按钮,只更新文字与状态
+            app = MDApp.get_running_app()
+            for idx, (btn, option) in enumerate(zip(buttons, self.options)):
+                Animation.cancel_all(btn)
+                btn.text = option
+                btn.is_correct = (idx == self.correct_index)
+                btn.is_selected = False
+                btn.disabled = False
+                btn.md_bg_color = app.theme_cls.primaryContainerColor
+            return
         container.clear_widgets()
         
         for idx, option in enumerate(self.options):
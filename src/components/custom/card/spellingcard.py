@@ -150,6 +150,13 @@ class WordInputCard(BaseCard):
         self.wrong_count=0#多次回答错误只会调用一次wrong回调
         self.all_correct = False#是否完全拼写正确
 
+    def recycle(self, **params):
+        """复用卡片,重置拼写状态并按新单词生成输入框"""
+        super().recycle(**params)
+        self.wrong_count=0
+        self.all_correct = False
+        self._setup_inputs(0)
+
     def _setup_inputs(self, dt):
         # 生成残缺单词
         original = self.word.replace("-", "").replace("'", "")  # 去除特殊符号
@@ -98,6 +98,14 @@ class WordCard(BaseCard):
         if self.swipe_vertical_callback:
             self.swipe_vertical_callback(self)
         return None
+    def recycle(self, **params):
+        """复用卡片,清空旧例句并为新单词生成例句"""
+        super().recycle(**params)
+        with self._example_lock:
+            self.example = ""
+        if self.word:
+            self.create_example()
+
     def __del__(self):
         """实例销毁时自动触发的清理"""
         self._is_active = False
@@ -114,12 +122,13 @@ class WordCard(BaseCard):
                 response = glm_4_flash.chat_sync(word, stream=True)
                 for result in response:
                     # 双重检查实例状态
-                    if not self_ref._is_active:
+                    if not self_ref._is_active or self_ref.word != word:
                         break
 
                     delta = getattr(result.choices[0].delta, 'content', '') or ''
                     with self_ref._example_lock:
-                        if self_ref._is_active:
+                        # 卡片被复用到其他单词后丢弃旧单词的例句
+                        if self_ref._is_active and self_ref.word == word:
                             self_ref.example += delta
             except Exception as e:
                 print(f"Error in example thread: {e}")
@@ -0,0 +1,211 @@
+"""
+共享的API客户端注册表
+同一组凭证(api_key, endpoint)的所有提供者实例共用一个客户端与连接池,
+聊天界面、写作指导等多处实例不再各自握手、各自持有连接池。
+
+- 连接池有上限,空闲的长连接超过 keepalive_expiry 后由httpx关闭
+- 每组凭证限制同时进行的请求数
+- 没有提供者引用且空闲超过 idle_timeout 的客户端被关闭并移出注册表
+"""
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple, Union
+
+import httpx
+
+logger = logging.getLogger("ClientRegistry")
+logger.addHandler(logging.NullHandler())
+
+ClientKey = Tuple[str, str]
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """连接池配置
+
+    Attributes:
+        max_connections: 每组凭证的最大连接数
+        max_keepalive_connections: 保持的空闲长连接数
+        keepalive_expiry: 空闲长连接的保留时间(秒)
+        max_concurrency: 每组凭证同时进行的请求数
+        idle_timeout: 无引用的客户端保留时间(秒)
+        timeout: 请求超时(秒)
+        connect_timeout: 建立连接超时(秒)
+        verify: TLS证书校验,可为CA证书路径
+    """
+    max_connections: int = 10
+    max_keepalive_connections: int = 5
+    keepalive_expiry: float = 30.0
+    max_concurrency: int = 4
+    idle_timeout: float = 300.0
+    timeout: float = 300.0
+    connect_timeout: float = 10.0
+    verify: Union[bool, str] = True
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    @property
+    def httpx_timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+class ClientEntry:
+    """一组凭证对应的共享客户端
+
+    同步客户端由工厂函数基于共享的 httpx.Client 创建;
+    异步客户端与事件循环绑定,每个事件循环各一个。
+    """
+
+    def __init__(self, key: ClientKey, config: PoolConfig, factory: Callable[[str, str, httpx.Client], object]):
+        self.key = key
+        self.config = config
+        self.http = httpx.Client(limits=config.limits, timeout=config.httpx_timeout, verify=config.verify)
+        self.client = factory(key[0], key[1], self.http)
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self._slots = threading.BoundedSemaphore(config.max_concurrency)
+        self._async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _async_state(self) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._async.get(loop)
+            if state is None or state[0].is_closed:
+                state = (
+                    httpx.AsyncClient(limits=self.config.limits, timeout=self.config.httpx_timeout, verify=self.config.verify),
+                    asyncio.Semaphore(self.config.max_concurrency),
+                )
+                self._async[loop] = state
+            return state
+
+    def async_client(self) -> httpx.AsyncClient:
+        """当前事件循环使用的异步客户端"""
+        return self._async_state()[0]
+
+    @contextmanager
+    def slot(self):
+        """占用一个同步请求名额,超出并发上限时等待"""
+        self._slots.acquire()
+        try:
+            yield self.client
+        finally:
+            self.last_used = time.monotonic()
+            self._slots.release()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        """占用一个异步请求名额,超出并发上限时等待"""
+        client, semaphore = self._async_state()
+        async with semaphore:
+            try:
+                yield client
+            finally:
+                self.last_used = time.monotonic()
+
+    def close(self):
+        """关闭同步连接池,异步客户端在其事件循环中关闭"""
+        self.http.close()
+        with self._lock:
+            states = list(self._async.items())
+            self._async.clear()
+        for loop, (client, _) in states:
+            if loop.is_closed():
+                continue
+            try:
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            except RuntimeError:
+                pass
+
+class ClientRegistry:
+    """按(api_key, endpoint)复用客户端的注册表"""
+
+    def __init__(self, config: Optional[PoolConfig] = None):
+        self.config = config or PoolConfig()
+        self._entries: Dict[ClientKey, ClientEntry] = {}
+        self._lock = threading.Lock()
+        self._created = 0
+        self._reused = 0
+        self._evicted = 0
+
+    def acquire(self, api_key: str, endpoint: str, factory: Callable[[str, str, httpx.Client], object]) -> ClientEntry:
+        """取得共享客户端并增加引用,不再使用时调用release
+
+        Args:
+            api_key: API密钥
+            endpoint: API地址
+            factory: 以(api_key, endpoint, httpx.Client)创建SDK客户端的函数
+        """
+        key = (api_key, endpoint.rstrip("/"))
+        with self._lock:
+            self._evict_idle_locked()
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = ClientEntry(key, self.config, factory)
+                self._created += 1
+            else:
+                self._reused += 1
+            entry.refs += 1
+            entry.last_used = time.monotonic()
+            return entry
+
+    def release(self, entry: ClientEntry):
+        """减少引用,客户端在空闲超时后才关闭"""
+        with self._lock:
+            entry.refs = max(0, entry.refs - 1)
+            entry.last_used = time.monotonic()
+
+    def evict_idle(self) -> int:
+        """关闭无引用且空闲超时的客户端,返回关闭的数量"""
+        with self._lock:
+            return self._evict_idle_locked()
+
+    def _evict_idle_locked(self) -> int:
+        now = time.monotonic()
+        expired = [
+            key for key, entry in self._entries.items()
+            if entry.refs == 0 and now - entry.last_used >= self.config.idle_timeout
+        ]
+        for key in expired:
+            self._entries.pop(key).close()
+            logger.info(f"关闭空闲客户端: {key[1]}")
+        self._evicted += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        """返回注册表统计: clients 当前客户端数, created 创建次数, reused 复用次数, evicted 关闭次数"""
+        with self._lock:
+            return {
+                "clients": len(self._entries),
+                "created": self._created,
+                "reused": self._reused,
+                "evicted": self._evicted,
+            }
+
+    def close(self):
+        """关闭全部客户端"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.close()
+
+_shared: Optional[ClientRegistry] = None
+_shared_lock = threading.Lock()
+
+def get_client_registry() -> ClientRegistry:
+    """获取进程内共享的客户端注册表"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ClientRegistry()
+        return _shared
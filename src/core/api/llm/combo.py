@@ -27,6 +27,10 @@ class LLMCombo:
         if self._current_provider:
             self._current_provider.set_message(message)
     
+    def get_message(self) -> Optional[Message]:
+        """当前使用的消息上下文"""
+        return self._current_message
+
     def update_parameters(self, **kwargs):
         """更新当前提供者的参数配置"""
         if not self._current_provider:
@@ -61,6 +65,11 @@ class LLMCombo:
         return self._current_provider.stream()
 
 
+    def astream(self):
+        """执行异步流式聊天,返回异步迭代器"""
+        self._validate_components()
+        return self._current_provider.astream()
+
     def stop_stream(self):
         """停止流式输出"""
         if self._current_provider:
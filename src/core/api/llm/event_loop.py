@@ -0,0 +1,88 @@
+"""
+共享的后台事件循环
+所有异步流式请求运行在同一个事件循环线程中,多路并发流不再各占一个线程
+界面线程通过 submit 提交协程,取得 concurrent.futures.Future
+"""
+import asyncio
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Coroutine, Optional
+
+logger = logging.getLogger("EventLoopThread")
+logger.addHandler(logging.NullHandler())
+
+class EventLoopThread:
+    """在后台守护线程中运行的asyncio事件循环
+
+    首次提交协程时启动,stop后再次提交会重新启动。
+    """
+
+    def __init__(self, name: str = "llm-event-loop"):
+        self._name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """运行中的事件循环,未启动时先启动"""
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                self._start()
+            return self._loop
+
+    def _start(self):
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(started.set)
+            loop.run_forever()
+            # 循环停止后取消残留任务并关闭
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+        self._loop = loop
+        self._thread = threading.Thread(target=run, name=self._name, daemon=True)
+        self._thread.start()
+        started.wait()
+        logger.info(f"事件循环已启动: {self._name}")
+
+    def submit(self, coro: Coroutine) -> Future:
+        """在事件循环中运行协程
+
+        Returns:
+            Future: 可跨线程等待结果,cancel() 会取消事件循环中的任务
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self, timeout: float = 5.0):
+        """停止事件循环,取消未完成的任务"""
+        with self._lock:
+            if self._loop is None:
+                return
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+        if thread.is_alive():
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+        logger.info(f"事件循环已停止: {self._name}")
+
+_shared: Optional[EventLoopThread] = None
+_shared_lock = threading.Lock()
+
+def get_event_loop_thread() -> EventLoopThread:
+    """获取进程内共享的事件循环线程"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = EventLoopThread()
+        return _shared
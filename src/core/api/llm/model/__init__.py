@@ -1,4 +1,8 @@
 from .zhipu_params import ZhipuChatParams
 from .message import Message
+from .tokenizer import Tokenizer, EstimateTokenizer, FunctionTokenizer
+from .packer import ContextPacker, PackPlan, TokenIndex
+from .compression import CompressionExecutor, get_compression_executor
+from .segment import Segment
 
-__all__=["ZhipuChatParams","Message"]
\ No newline at end of file
+__all__=["ZhipuChatParams","Message","Tokenizer","EstimateTokenizer","FunctionTokenizer","ContextPacker","PackPlan","TokenIndex","CompressionExecutor","get_compression_executor","Segment"]
\ No newline at end of file
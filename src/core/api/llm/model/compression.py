@@ -0,0 +1,183 @@
+"""
+共享的上下文压缩执行器
+所有Message实例共用一个有上限的工作线程池,不再每个实例常驻一个轮询线程。
+
+- 当前会话的任务优先执行
+- 同一上下文排队中的多个任务合并为一次压缩调用
+- 工作线程空闲超过 idle_timeout 后退出,有任务时按需重新创建
+"""
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("CompressionExecutor")
+logger.addHandler(logging.NullHandler())
+
+@dataclass
+class CompressionTask:
+    """一次压缩请求
+
+    Attributes:
+        owner: 提交任务的上下文,需提供 _compress_batch(tasks)
+        session: 所属会话ID,用于优先级判断
+        messages: 待压缩的消息
+        message_ids: 待压缩的消息ID
+        message_keys: 待压缩消息在队列中的键,摘要插入到其中第一条消息处
+        submitted_at: 提交时间,用于统计延迟
+    """
+    owner: Any
+    session: str
+    messages: List[Dict]
+    message_ids: List[int]
+    message_keys: List[Tuple[bool, int]]
+    submitted_at: float = field(default_factory=time.monotonic)
+
+class CompressionExecutor:
+    """有上限的共享压缩线程池
+
+    Attributes:
+        max_workers: 工作线程上限
+        idle_timeout: 工作线程空闲多久后退出(秒)
+        max_batch: 一次合并的任务数上限
+    """
+
+    def __init__(self, max_workers: int = 2, idle_timeout: float = 30.0, max_batch: int = 8):
+        if max_workers < 1:
+            raise ValueError("max_workers 必须大于0")
+        self.max_workers = max_workers
+        self.idle_timeout = idle_timeout
+        self.max_batch = max(1, max_batch)
+
+        self._cond = threading.Condition()
+        self._queue: Deque[CompressionTask] = deque()
+        # 正在执行任务的上下文,同一上下文的任务不并行执行,保证结果按提交顺序应用
+        self._running_owners: set = set()
+        self._active_session: Optional[str] = None
+        self._workers = 0
+        self._idle = 0
+        self._serial = 0
+
+        # 统计
+        self._peak_workers = 0
+        self._submitted = 0
+        self._completed = 0
+        self._batches = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def set_active(self, session: Optional[str]):
+        """设置当前会话,其任务优先于其他会话执行"""
+        with self._cond:
+            self._active_session = session
+
+    def submit(self, task: CompressionTask):
+        """提交压缩任务,需要时启动工作线程"""
+        with self._cond:
+            self._queue.append(task)
+            self._submitted += 1
+            if self._idle:
+                self._cond.notify()
+            elif self._workers < self.max_workers:
+                self._spawn()
+
+    def cancel(self, owner: Any) -> List[CompressionTask]:
+        """移除某个上下文排队中的任务(不影响执行中的任务),返回被移除的任务"""
+        with self._cond:
+            removed = [task for task in self._queue if task.owner is owner]
+            if removed:
+                self._queue = deque(task for task in self._queue if task.owner is not owner)
+            return removed
+
+    def _spawn(self):
+        """启动一个工作线程,调用方需持有锁"""
+        self._workers += 1
+        self._serial += 1
+        self._peak_workers = max(self._peak_workers, self._workers)
+        threading.Thread(
+            target=self._run, name=f"compression-worker-{self._serial}", daemon=True
+        ).start()
+
+    def _take_batch(self) -> List[CompressionTask]:
+        """取出下一批任务: 优先当前会话,并合并同一上下文排队中的任务,调用方需持有锁"""
+        first = None
+        for task in self._queue:
+            if task.owner in self._running_owners:
+                continue
+            if task.session == self._active_session:
+                first = task
+                break
+            if first is None:
+                first = task
+        if first is None:
+            return []
+        batch = [task for task in self._queue if task.owner is first.owner][:self.max_batch]
+        taken = set(map(id, batch))
+        self._queue = deque(task for task in self._queue if id(task) not in taken)
+        self._running_owners.add(first.owner)
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+                while not batch:
+                    self._idle += 1
+                    notified = self._cond.wait(self.idle_timeout)
+                    self._idle -= 1
+                    batch = self._take_batch()
+                    if not batch and not notified:
+                        # 空闲超时退出
+                        self._workers -= 1
+                        return
+            owner = batch[0].owner
+            try:
+                owner._compress_batch(batch)
+            except Exception as e:
+                logger.error(f"压缩任务执行失败: {e}")
+            finally:
+                now = time.monotonic()
+                with self._cond:
+                    self._running_owners.discard(owner)
+                    self._batches += 1
+                    self._completed += len(batch)
+                    for task in batch:
+                        latency = now - task.submitted_at
+                        self._latency_total += latency
+                        self._latency_max = max(self._latency_max, latency)
+                    # 同一上下文的后续任务可能在等待本批完成
+                    if self._queue:
+                        self._cond.notify()
+
+    def stats(self) -> Dict[str, float]:
+        """返回执行器统计
+
+        Returns:
+            dict: threads 当前线程数, peak_threads 最大线程数, queue_depth 排队任务数,
+            submitted 提交任务数, completed 完成任务数, batches 压缩调用次数,
+            avg_latency/max_latency 任务从提交到完成的平均/最大耗时(秒)
+        """
+        with self._cond:
+            return {
+                "threads": self._workers,
+                "peak_threads": self._peak_workers,
+                "queue_depth": len(self._queue),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "batches": self._batches,
+                "avg_latency": self._latency_total / self._completed if self._completed else 0.0,
+                "max_latency": self._latency_max,
+            }
+
+_shared: Optional[CompressionExecutor] = None
+_shared_lock = threading.Lock()
+
+def get_compression_executor() -> CompressionExecutor:
+    """获取进程内共享的压缩执行器"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = CompressionExecutor()
+        return _shared
@@ -1,12 +1,14 @@
 import threading
-from typing import List, Dict, Union, Optional, Callable, Deque,  get_args, get_origin
+from typing import List, Dict, Union, Optional, Callable, Tuple,  get_args, get_origin
 import inspect
-from collections import deque
 import logging
-from dataclasses import dataclass
-from queue import Queue
-import time
+from dataclasses import dataclass, field
 from .allocator import MessageIDAllocator
+from .compression import CompressionExecutor, CompressionTask, get_compression_executor
+from .tokenizer import Tokenizer, EstimateTokenizer
+from .packer import ContextPacker, PackPlan, TokenIndex
+from .segment import Segment
+from .message_queue import MessageQueue
 
 # 配置日志
 logging.basicConfig(level=logging.ERROR)
@@ -20,11 +22,12 @@ class CompressionResult:
     Attributes:
         message_ids: 被压缩的原始消息ID列表
         compressed_msg: 压缩后的消息字典，压缩失败时为None
-        start_index: 原始消息在队列中的起始位置索引
+        message_keys: 被压缩消息在队列中的键,为空时按message_ids查找;
+            摘要插入到其中第一条仍在队列中的消息处
     """
     message_ids: List[str]   # 被压缩的原始消息ID
     compressed_msg: Union[Dict,None]      # 压缩后的消息
-    start_index: int         # 在队列中的起始位置
+    message_keys: List[Tuple[bool, int]] = field(default_factory=list)
 
 class Message:
     """支持多线程压缩的对话上下文管理器。
@@ -36,16 +39,24 @@ class Message:
         raw_id_allocator: 原始消息ID分配器
         compressed_id_allocator: 压缩消息ID分配器
         system_pompmts: 受保护的系统消息列表
-        message_queue: 按时间排序的对话消息队列
-        current_context_tokens: 当前上下文token计数
+        base: 与父分支共享的只读消息前缀,位于message_queue之前,None表示没有前缀
+        message_queue: 按时间排序的对话消息(不含共享前缀),以(是否压缩, 消息ID)为键的消息链表
+        current_context_tokens: 当前上下文token计数(来自接口返回)
+        estimated_context_tokens: 由分词器累计的上下文token数,随消息增删维护
+        tokenizer: token计数器
         max_context_tokens: 允许的最大token阈值
-        compression_ratio: 触发压缩时的消息处理比例
+        compression_ratio: 超限处理时预留的预算比例,处理后上下文不超过预算的(1-比例),
+            避免之后每追加一条消息都再次超限
+        packer: 按token预算选择上下文消息
         compression_callback: 外部提供的压缩回调函数
         lock: 线程同步锁
-        compression_queue: 压缩任务队列
+        compression_executor: 执行压缩任务的共享线程池
+        pending_compressions: 已提交但尚未执行完的压缩任务数
         compression_results: 待应用的压缩结果缓存
-        compression_thread: 后台压缩工作线程
         last_operation: 记录上次操作类型及参数
+        _payload: 发送给模型的上下文(系统消息+对话消息),追加消息时增量维护
+        _payload_shared: 当前_payload是否已由get_context交出,交出后修改前先复制
+        _payload_dirty: 消息被删除或替换后置位,下次get_context时重建_payload
     """
     
     def __init__(
@@ -56,18 +67,24 @@ class Message:
         raw_id_start: int = 1,
         compressed_id_start: int = 1,
         system_prompt: str = "",
-        compression_callback: Optional[Callable[[List[Dict]], str]] = None
+        compression_callback: Optional[Callable[[List[Dict]], str]] = None,
+        tokenizer: Optional[Tokenizer] = None,
+        keep_recent: int = 4,
+        executor: Optional[CompressionExecutor] = None
     ):
         """初始化消息管理器实例。
         
         Args:
             session: 当前会话的唯一标识符
             max_context_tokens: 上下文token上限，默认4096
-            compression_ratio: 压缩比例系数(0.1-0.9)，默认0.3
+            compression_ratio: 压缩比例系数(0.1-0.9)，压缩后上下文不超过预算的(1-比例)，默认0.3
             raw_id_start: 原始消息ID起始值，默认1
             compressed_id_start: 压缩消息ID起始值，默认1
             system_prompt: 初始系统提示词
             compression_callback: 消息压缩处理回调函数
+            tokenizer: token计数器,默认使用估算器
+            keep_recent: 超限时固定保留的最近消息条数
+            executor: 压缩执行器,默认使用进程内共享的执行器
         """
 
         # 创建ID分配器
@@ -78,33 +95,42 @@ class Message:
             session, "compressed", compressed_id_start
         )
         self.session = session
+        self.tokenizer: Tokenizer = tokenizer or EstimateTokenizer()
         # 系统消息（受保护）
         self.system_pompmts = [{"id":self.raw_id_allocator(),"role":"system","content":system_prompt}] if system_prompt !="" else []
         
         # 对话消息队列（按时间顺序）
-        self.message_queue: Deque[Dict] = deque()
+        # 原始消息与压缩消息的ID由两个分配器各自分配,可能重复,因此键中带上类型
+        self.message_queue: MessageQueue = MessageQueue()
+        # 分支共享的消息前缀,需要修改其中的消息时才复制到message_queue
+        self.base: Optional[Segment] = None
+
+        # 请求格式的上下文,顺序与 system_pompmts + message_queue 一致
+        self._payload: List[Dict] = [self._wire(msg) for msg in self.system_pompmts]
+        self._payload_shared = False
+        self._payload_dirty = False
         
         # Token管理
         self.current_context_tokens = 0
+        self.estimated_context_tokens = sum(self._tokens(msg) for msg in self.system_pompmts)
         self.max_context_tokens = max_context_tokens
         self.compression_ratio = max(0.1, min(compression_ratio, 0.9))
         self.compression_callback = compression_callback
+        self.packer = ContextPacker(keep_recent)
+        # message_queue中消息的token前缀和,随消息增删维护
+        self._index = TokenIndex()
         
         # 线程安全组件
         self.lock = threading.Lock()
-        self.compression_queue = Queue()
-        self._shutdown = False
+        self._compression_done = threading.Condition(self.lock)
+        self.compression_executor = executor or get_compression_executor()
+        self.pending_compressions = 0
+        # 已提交压缩、结果尚未应用的消息键,规划新的压缩时跳过
+        self._compressing: set = set()
         
         # 压缩结果缓存
         self.compression_results: List[CompressionResult] = []
         
-        # 启动压缩线程
-        self.compression_thread = threading.Thread(
-            target=self._compression_worker, 
-            daemon=True
-        )
-        self.compression_thread.start()
-        
         # 状态跟踪
         self.last_operation: Optional[Dict] = None
 
@@ -166,85 +192,280 @@ class Message:
         
         self.compression_callback = callback
         
-    def load_context(self,raw:dict,com:dict,pompmts:list[str],messages:list[str]):
-        """恢复上下文
+    @staticmethod
+    def _wire(message: Dict) -> Dict:
+        """构造消息的请求格式(仅role与content)"""
+        return {"role": message["role"], "content": message["content"]}
+
+    @staticmethod
+    def _key(message: Dict) -> Tuple[bool, int]:
+        """消息在队列中的键"""
+        return (bool(message.get("is_compressed")), message["id"])
+
+    def _find_key(self, message_id: int, is_compressed: Optional[bool] = None) -> Optional[Tuple[bool, int]]:
+        """按ID查找消息的键,调用方需持有锁
 
         Args:
-            raw (_type_): 原始数据分配器配置
-            com (_type_): 压缩数据分配器配置
-            pompmts (_type_): 系统提示词
-            messages (_type_): 上下文消息
+            message_id: 消息ID
+            is_compressed: 消息类型,None时先查原始消息再查压缩消息
+        """
+        candidates = (False, True) if is_compressed is None else (bool(is_compressed),)
+        for compressed in candidates:
+            if (compressed, message_id) in self.message_queue:
+                return (compressed, message_id)
+        return None
+
+    def _splice_summary(self, keys: List[Tuple[bool, int]], summary: Optional[Dict]) -> bool:
+        """用摘要替换被压缩的消息,调用方需持有锁
+
+        摘要插入到第一条仍在队列中的被压缩消息之前,再按键移除这些消息,
+        只涉及被压缩的k条消息,不扫描也不复制队列
+
+        Args:
+            keys: 被压缩消息的键,按时间顺序
+            summary: 摘要消息,None表示压缩失败,只移除原消息
 
         Returns:
-            _type_: _description_
+            是否插入了摘要(被压缩的消息都已不在队列中时不插入)
+        """
+        anchor = next((key for key in keys if key in self.message_queue), None)
+        if summary is not None and anchor is not None:
+            key = self._key(summary)
+            self.message_queue.insert_before(anchor, key, summary)
+            self.estimated_context_tokens += self._tokens(summary)
+            # 摘要沿用被替换消息的槽位,前缀和中其他消息的位置不变
+            self._index.replace(anchor, key, self._tokens(summary), True)
+        for key in keys:
+            msg = self.message_queue.pop(key, None)
+            if msg is not None:
+                self.estimated_context_tokens -= self._tokens(msg)
+                self._index.remove(key)
+        self._payload_dirty = True
+        return summary is not None and anchor is not None
+
+    def _materialize(self):
+        """把共享前缀复制为自有消息(写时复制),调用方需持有锁
+
+        前缀中的消息字典仍与其他分支共用,压缩和删除只改变本上下文的队列
+        """
+        if self.base is None:
+            return
+        queue = MessageQueue((self._key(msg), msg) for msg in self.base.iter_messages())
+        for key, msg in self.message_queue.items():
+            queue[key] = msg
+        self.message_queue = queue
+        self.base = None
+        self._payload_dirty = True
+        self._reindex()
+
+    def _reindex(self):
+        """按message_queue重建token前缀和,调用方需持有锁"""
+        self._index.reset(
+            (key, self._tokens(msg), bool(msg.get("is_compressed")))
+            for key, msg in self.message_queue.items()
+        )
+        for key in self._compressing:
+            self._index.suspend(key)
+
+    def fork(self, session) -> "Message":
+        """派生分支上下文
+
+        当前已确定的对话消息冻结为共享的消息段,本上下文与新分支都以其为前缀,
+        之后各自只保存新增的消息。分支沿用本上下文的配置与系统消息。
+        不等待正在执行的压缩: 已完成的压缩结果先应用,正在压缩的第一条消息及其之后的消息
+        不冻结,仍由本上下文持有(压缩结果之后只作用于本上下文),分支得到这些消息的副本。
+
+        Args:
+            session: 新分支的会话标识
+
+        Returns:
+            Message: 新分支的上下文
+        """
+        # 压缩结果只能作用于自有消息,冻结前先应用已完成的结果
+        self._apply_compression_results()
+        child = Message(
+            session,
+            max_context_tokens=self.max_context_tokens,
+            compression_ratio=self.compression_ratio,
+            compression_callback=self.compression_callback,
+            tokenizer=self.tokenizer,
+            keep_recent=self.packer.keep_recent,
+            executor=self.compression_executor
+        )
+        with self.lock:
+            settled = []
+            for key, msg in self.message_queue.items():
+                if key in self._compressing:
+                    break
+                settled.append(msg)
+            if len(settled) == len(self.message_queue):
+                pending = []
+                if settled:
+                    self.message_queue = MessageQueue()
+                    self._index.reset()
+            else:
+                for msg in settled:
+                    key = self._key(msg)
+                    del self.message_queue[key]
+                    self._index.remove(key)
+                pending = [dict(msg) for msg in self.message_queue.values()]
+            if settled:
+                self.base = Segment(tuple(settled), self.base, sum(self._tokens(msg) for msg in settled))
+            child.system_pompmts = [dict(msg) for msg in self.system_pompmts]
+            # 分支继续使用父上下文之后的ID,与前缀中的消息不冲突
+            child.raw_id_allocator.reset(self.raw_id_allocator.current_id)
+            child.compressed_id_allocator.reset(self.compressed_id_allocator.current_id)
+            child.base = self.base
+            for msg in pending:
+                child.message_queue[self._key(msg)] = msg
+            child._reindex()
+            child.estimated_context_tokens = self.estimated_context_tokens
+            child._payload_dirty = True
+        return child
+
+    def _tokens(self, message: Dict) -> int:
+        """消息的token数,首次计算后缓存在消息的tokens字段中"""
+        tokens = message.get("tokens")
+        if tokens is None:
+            tokens = message["tokens"] = self.tokenizer.count_message(message)
+        return tokens
+
+    def set_tokenizer(self, tokenizer: Tokenizer):
+        """更换token计数器并重新计算所有消息的token数"""
+        with self.lock:
+            # 前缀中的消息与其他分支共用,重新计数前先复制前缀,
+            # 再复制每条消息字典,token数只写入本上下文的副本
+            self._materialize()
+            self.tokenizer = tokenizer
+            total = 0
+            for msg in self.system_pompmts:
+                msg.pop("tokens", None)
+                total += self._tokens(msg)
+            for key in list(self.message_queue):
+                msg = dict(self.message_queue[key])
+                msg.pop("tokens", None)
+                self.message_queue[key] = msg
+                total += self._tokens(msg)
+            self.estimated_context_tokens = total
+            self._reindex()
+
+    def _mutable_payload(self) -> List[Dict]:
+        """返回可修改的上下文列表,调用方需持有锁
+
+        已交出的列表视为只读快照,修改前先复制一份(写时复制)
+        """
+        if self._payload_shared:
+            self._payload = self._payload.copy()
+            self._payload_shared = False
+        return self._payload
+
+    def load_context(self,raw:dict,com:dict,pompmts:list,messages:list,base:Optional[Segment]=None):
+        """恢复上下文,替换当前的全部消息
+
+        Args:
+            raw (dict): 原始消息ID分配器状态,见 get_allocator_states
+            com (dict): 压缩消息ID分配器状态
+            pompmts (list): 系统消息字典(或内容字符串)列表
+            messages (list): 对话消息字典列表,保留原有ID与压缩信息
+            base (Segment): 共享的消息前缀
         """        
         if self.session is None:
             return ValueError("Message缺失 session")
-        
-        self.raw_id_allocator.load_data(**raw)
-        self.compressed_id_allocator.load_data(**com)
-        for pompmt in pompmts:
-            self.add_system_pompmt(pompmt,flush=False)
-        for message in messages:
-            self.add_message(message,flush=False)
 
-    def _compression_worker(self):
-        """后台压缩线程工作函数。
+        system = [
+            dict(p) if isinstance(p, dict) else {"id": self.raw_id_allocator(), "role": "system", "content": p}
+            for p in pompmts
+        ]
+        queue = MessageQueue()
+        for msg in messages:
+            msg = dict(msg)
+            msg.setdefault("is_compressed", False)
+            msg.setdefault("source_ids", [])
+            queue[self._key(msg)] = msg
+        # 在锁外计算token数(已缓存的直接复用)
+        total = sum(self._tokens(msg) for msg in system) + sum(self._tokens(msg) for msg in queue.values())
+        if base is not None:
+            total += base.tokens
+
+        with self.lock:
+            self.raw_id_allocator.load_data(self.session, "raw", raw.get("current_id", raw.get("start_id", 1)))
+            self.compressed_id_allocator.load_data(self.session, "compressed", com.get("current_id", com.get("start_id", 1)))
+            self.system_pompmts = system
+            self.message_queue = queue
+            self.base = base
+            self.compression_results.clear()
+            self._compressing.clear()
+            self.estimated_context_tokens = total
+            self._payload_dirty = True
+            self._reindex()
+
+    def snapshot(self) -> Dict:
+        """导出可持久化的上下文,可作为 load_context 的关键字参数恢复
+
+        messages 只包含自有消息,共享前缀以 base(Segment) 引用,由存储层按消息段保存
+        """
+        self._apply_compression_results()
+        with self.lock:
+            return {
+                "raw": self.raw_id_allocator.get_current_state(),
+                "com": self.compressed_id_allocator.get_current_state(),
+                "pompmts": [dict(msg) for msg in self.system_pompmts],
+                "messages": [dict(msg) for msg in self.message_queue.values()],
+                "base": self.base,
+            }
+
+    def _compress_batch(self, tasks: List[CompressionTask]):
+        """由压缩执行器调用,将同一上下文排队中的任务合并为一次压缩。
         
-        循环处理压缩队列中的任务，结果存入压缩缓存。
+        结果存入压缩缓存,在下次获取上下文时应用。
         """
+        messages = [msg for task in tasks for msg in task.messages]
+        message_ids = [msg_id for task in tasks for msg_id in task.message_ids]
+        message_keys = [key for task in tasks for key in task.message_keys]
+        try:
+            if self.compression_callback is None:
+                # 回调已被移除: 放弃本次压缩,消息保留在队列中
+                with self.lock:
+                    self._release_compressing(message_keys)
+                return
+            # 执行同步压缩操作
+            compressed_content = self.compression_callback(messages)
+            
+            # 创建压缩消息结构
+            compressed_msg = {
+                "id":self.compressed_id_allocator(),
+                "role": "user",
+                "content": compressed_content,
+                "is_compressed": True,
+                "source_ids": [msg["id"] for msg in messages]
+            }
+            # 在工作线程中计算摘要的token数,避免占用锁
+            self._tokens(compressed_msg)
 
-        while not self._shutdown:
-            try:
-                # 获取压缩任务（设置超时以便检查关闭标志）
-                task = self.compression_queue.get(timeout=0.5)
-                # 检查是否收到关闭信号
-                if self._shutdown:
-                    self.compression_queue.task_done()
-                    break
-                    
-                try:
-                    if self.compression_callback is None:
-                        continue
-                    # 执行同步压缩操作
-                    compressed_content = self.compression_callback(task["messages"])
-                    
-                    # 创建压缩消息结构
-                    compressed_msg = {
-                        "id":self.compressed_id_allocator(),
-                        "role": "user",
-                        "content": compressed_content,
-                        "is_compressed": True,
-                        "source_ids": [msg["id"] for msg in task["messages"]]
-                    }
-
-                    # 将结果存储在缓存中
-                    with self.lock:
-                        self.compression_results.append(CompressionResult(
-                            message_ids=task["message_ids"],
-                            compressed_msg=compressed_msg,
-
-                            start_index=task["start_index"]
-                        ))
-                    
-                    logger.info(f"压缩任务完成: {len(task['messages'])}条消息 -> 缓存结果")
-                    
-                except Exception as e:
-                    logger.error(f"压缩失败: {e}")
-                    # 即使失败也添加结果，但标记为失败
-                    with self.lock:
-                        self.compression_results.append(CompressionResult(
-                            message_ids=task["message_ids"],
-                            compressed_msg=None,  # None 表示压缩失败
-                            start_index=task["start_index"]
-                        ))
-                    
-                finally:
-                    self.compression_queue.task_done()
-                    
-            except:
-                # 队列超时，继续检查关闭标志
-                pass
+            # 将结果存储在缓存中
+            with self.lock:
+                self.compression_results.append(CompressionResult(
+                    message_ids=message_ids,
+                    compressed_msg=compressed_msg,
+                    message_keys=message_keys
+                ))
+            
+            logger.info(f"压缩任务完成: {len(tasks)}个任务 {len(messages)}条消息 -> 缓存结果")
+            
+        except Exception as e:
+            logger.error(f"压缩失败: {e}")
+            # 即使失败也添加结果，但标记为失败
+            with self.lock:
+                self.compression_results.append(CompressionResult(
+                    message_ids=message_ids,
+                    compressed_msg=None,  # None 表示压缩失败
+                    message_keys=message_keys
+                ))
+            
+        finally:
+            with self.lock:
+                self.pending_compressions -= len(tasks)
+                self._compression_done.notify_all()
     
     def _apply_compression_results(self):
         """应用所有待处理的压缩结果到消息队列。
@@ -257,17 +478,11 @@ class Message:
         with self.lock:
             # 处理所有待应用的压缩结果
             for result in self.compression_results:
-                # 移除原始消息
-                for msg_id in result.message_ids:
-                    for i, msg in enumerate(self.message_queue):
-                        if msg["id"] == msg_id:
-                            del self.message_queue[i]
-                            break
-                
-                # 插入压缩消息到起始位置（如果压缩成功）
-                if result.compressed_msg:
-                    self.message_queue.insert(result.start_index, result.compressed_msg)
-                    logger.info(f"压缩消息插入位置: {result.start_index}")
+                keys = result.message_keys or [self._find_key(msg_id) for msg_id in result.message_ids]
+                self._compressing.difference_update(keys)
+                # 摘要按键定位插入,先应用的结果改变队列长度也不影响位置
+                if self._splice_summary([key for key in keys if key is not None], result.compressed_msg):
+                    logger.info(f"压缩消息已插入: {len(keys)}条消息 -> 1条摘要")
             
             # 清空结果缓存
             self.compression_results.clear()
@@ -275,17 +490,25 @@ class Message:
     def close(self):
         """安全关闭管理器并清理资源。
         
-        停止压缩线程并等待退出。
+        撤回排队中的压缩任务,执行中的任务完成后结果不再应用。
         """
-        # 设置关闭标志
-        self._shutdown = True
-        
-        # 等待压缩线程退出
-        if self.compression_thread.is_alive():
-            self.compression_thread.join(timeout=1.0)
+        cancelled = self.compression_executor.cancel(self)
+        with self.lock:
+            self.pending_compressions -= len(cancelled)
+            for task in cancelled:
+                self._release_compressing(task.message_keys)
+            self._compression_done.notify_all()
         
         logger.info("管理器已关闭")
     
+    def _release_compressing(self, keys: List[Tuple[bool, int]]):
+        """放弃压缩,消息重新计入前缀和,调用方需持有锁"""
+        self._compressing.difference_update(keys)
+        for key in keys:
+            msg = self.message_queue.get(key)
+            if msg is not None:
+                self._index.resume(key, self._tokens(msg), bool(msg.get("is_compressed")))
+
     def add_message(
         self, 
         role: str, 
@@ -324,36 +547,49 @@ class Message:
             "is_compressed": is_compressed,
             "source_ids": source_ids or []
         }
+        # 在锁外计算token数
+        tokens = self._tokens(message)
         
         # 添加到队列
         with self.lock:
-            self.message_queue.append(message)
+            key = self._key(message)
+            self.message_queue[key] = message
+            self._index.append(key, tokens, is_compressed)
+            self.estimated_context_tokens += tokens
+            if not self._payload_dirty:
+                self._mutable_payload().append(self._wire(message))
 
         logger.info(f"添加消息: {message_id} (压缩: {is_compressed})")
         return message_id
     
     def get_context(self) -> List[Dict]:
         """生成当前对话上下文的格式化列表。
+
+        上下文随消息增删增量维护,此处直接返回,不再逐条重建。
+        返回的列表是只读快照:之后的修改作用于副本,不会影响已交出的列表;
+        调用方也不应修改列表及其中的字典。
+        超出token上限且压缩尚未完成时,返回按预算打包的上下文。
         
         Returns:
             包含系统消息和对话消息的字典列表
         """
         # 应用所有待处理的压缩结果
         self._apply_compression_results()
+        # 发送前按估算的token数处理超限
+        packed = self._check_token_budget()
+        if packed is not None:
+            return packed
         
         with self.lock:
-            context = [
-                {"role": msg["role"], "content": msg["content"]}
-                for msg in self.system_pompmts
-            ]
-            
-            for msg in self.message_queue:
-                context.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
-        
-        return context
+            if self._payload_dirty:
+                self._payload = [self._wire(msg) for msg in self.system_pompmts]
+                if self.base is not None:
+                    # 前缀的请求格式由共享的消息段缓存
+                    self._payload.extend(self.base.iter_wires())
+                self._payload.extend(self._wire(msg) for msg in self.message_queue.values())
+                self._payload_dirty = False
+            self._payload_shared = True
+            return self._payload
     
     def process_token_excess(self, prompt_tokens: int) -> Optional[List[Dict]]:
         """
@@ -374,70 +610,155 @@ class Message:
         
         return None
     
-    def handle_token_excess(self, excess_ratio: float) -> Optional[List[Dict]]:
-        """处理token超限情况（同步版）"""
+    def _check_token_budget(self) -> Optional[List[Dict]]:
+        """估算的token数超过上限时,在发送前按预算打包上下文
+
+        超出预算的消息:没有压缩回调时直接移除;有回调时提交压缩任务
+        (已有任务未完成时不重复提交),压缩完成前只发送预算内的消息。
+
+        Returns:
+            压缩完成前需要发送的上下文,不超限或已移除超出部分时返回None
+        """
+        if self.estimated_context_tokens <= self.max_context_tokens:
+            return None
+        self._handle_overflow(self.max_context_tokens)
         with self.lock:
-            # 计算需要处理的消息数量
-            total_messages = len(self.message_queue)
-            messages_to_process = max(1, int(total_messages * self.compression_ratio))
-            logger.info(f"Token超限处理: 比例={excess_ratio:.2f}, 处理消息数={messages_to_process}")
-            
-            # 收集要处理的消息
-            messages_to_handle = []
-            message_ids_to_handle = []
-            messages_content = []
-            
-            # 获取前N条消息
-            for i in range(messages_to_process):
-                if i < len(self.message_queue):
-                    msg = self.message_queue[i]
-                    messages_to_handle.append(msg)
-                    message_ids_to_handle.append(msg["id"])
-                    messages_content.append(msg)
-            
-            start_index = 0  # 消息起始位置
-            
-            # 如果没有压缩回调，直接移除消息
+            if self.estimated_context_tokens <= self.max_context_tokens:
+                return None
+            messages, plan = self._plan(self.max_context_tokens)
+            context = [self._wire(msg) for msg in self.system_pompmts]
+            context.extend(self._wire(messages[i]) for i in plan.selected)
+            return context
+
+    def _plan(self, budget: int, exclude: Optional[set] = None) -> Tuple[List[Dict], PackPlan]:
+        """按预算规划要保留的消息,调用方需持有锁
+
+        Args:
+            budget: token预算
+            exclude: 不参与规划的消息键
+        """
+        # 超出预算时需要移除或压缩前缀中的消息,先复制共享前缀
+        self._materialize()
+        messages = list(self.message_queue.values())
+        if exclude:
+            messages = [msg for msg in messages if self._key(msg) not in exclude]
+        plan = self.packer.pack(
+            sum(self._tokens(msg) for msg in self.system_pompmts),
+            [self._tokens(msg) for msg in messages],
+            [bool(msg.get("is_compressed")) for msg in messages],
+            budget
+        )
+        return messages, plan
+
+    def _overflow_messages(self, budget: int) -> List[Dict]:
+        """超出预算、需要移除或压缩的消息,调用方需持有锁
+
+        通常只需丢弃最旧的原始消息: 由前缀和索引直接得到截断位置,
+        只遍历截断位置之前的消息;需要丢弃摘要或最近消息时按完整列表规划
+        """
+        self._materialize()
+        system_tokens = sum(self._tokens(msg) for msg in self.system_pompmts)
+        cut = self.packer.cut(system_tokens, self._index, budget)
+        if cut == 0:
+            return []
+        if cut is None:
+            # 正在压缩的消息已暂停计入索引,规划时同样排除
+            messages, plan = self._plan(budget, self._compressing)
+            return [messages[i] for i in plan.dropped]
+        handled = []
+        for key, msg in self.message_queue.items():
+            if self._index.slot(key) >= cut:
+                break
+            if not key[0] and key not in self._compressing:
+                handled.append(msg)
+        return handled
+
+    def _handle_overflow(self, budget: int) -> Optional[List[Dict]]:
+        """移除或压缩预算之外的消息
+
+        Args:
+            budget: token预算(与estimated_context_tokens同一口径)
+
+        Returns:
+            被移除或提交压缩的消息列表,无需处理时返回None
+        """
+        with self.lock:
+            # 按比例预留预算给摘要和后续消息,处理后不会在下一条消息时立即再次超限;
+            # 没有压缩回调时同样预留,避免每次获取上下文都重新截断
+            budget = int(budget * (1 - self.compression_ratio))
+            handled = self._overflow_messages(budget)
+            if not handled:
+                return None
+            logger.info(f"Token超限处理: 预算={budget}, 超出预算的消息数={len(handled)}")
+
+            # 如果没有压缩回调，直接移除超出预算的消息
             if not self.compression_callback:
-                for _ in range(messages_to_process):
-                    if self.message_queue:
-                        self.message_queue.popleft()
-                
-                self.last_operation = {"type": "remove", "count": len(messages_to_handle)}
-                return messages_to_handle
-        
-        # 创建压缩任务
-        task = {
-            "message_ids": message_ids_to_handle,
-            "messages": messages_content,
-            "start_index": start_index
-        }
-        
-        # 提交压缩任务
-        self.compression_queue.put(task)
-        logger.info(f"压缩任务已提交: {len(message_ids_to_handle)}条消息")
+                for msg in handled:
+                    key = self._key(msg)
+                    self.estimated_context_tokens -= self._tokens(self.message_queue.pop(key))
+                    self._index.remove(key)
+                self._payload_dirty = True
+                self.last_operation = {"type": "remove", "count": len(handled)}
+                return handled
+
+            keys = [self._key(msg) for msg in handled]
+            # 已提交压缩的消息即将被摘要替换,不再计入预算,也不重复提交
+            self._compressing.update(keys)
+            for key in keys:
+                self._index.suspend(key)
+            self.pending_compressions += 1
+
+        # 提交压缩任务,同一上下文排队中的任务由执行器合并
+        self.compression_executor.submit(CompressionTask(
+            owner=self,
+            session=self.session,
+            messages=handled,
+            message_ids=[msg["id"] for msg in handled],
+            message_keys=keys
+        ))
+        logger.info(f"压缩任务已提交: {len(handled)}条消息")
         
         self.last_operation = {
             "type": "compress_started", 
-            "count": len(messages_to_handle)
+            "count": len(handled)
         }
         
-        return messages_to_handle
+        return handled
+
+    def handle_token_excess(self, excess_ratio: float) -> Optional[List[Dict]]:
+        """处理token超限情况（同步版）
+
+        接口返回的token数比上限多出 excess_ratio,按同样比例换算出估算口径下的预算,
+        超出预算的消息被移除或压缩。
+
+        Args:
+            excess_ratio: 超出比例,(实际token数 - 上限) / 上限
+        """
+        budget = int(self.estimated_context_tokens / (1 + max(excess_ratio, 0.0)))
+        return self._handle_overflow(min(budget, self.max_context_tokens))
     
-    def get_message(self, message_id: str) -> Optional[Dict]:
+    def get_message(self, message_id: str, is_compressed: Optional[bool] = None) -> Optional[Dict]:
         """根据ID从队列中检索消息。
         
         Args:
             message_id: 要检索的消息ID
+            is_compressed: 消息类型,None时先查原始消息再查压缩消息
             
         Returns:
             匹配的消息字典，未找到时返回None
         """
         with self.lock:
-            for msg in self.message_queue:
-                if msg.get("id") == message_id:
+            key = self._find_key(message_id, is_compressed)
+            if key is not None:
+                return self.message_queue[key]
+            if self.base is None:
+                return None
+            candidates = (False, True) if is_compressed is None else (bool(is_compressed),)
+            for compressed in candidates:
+                msg = self.base.find((compressed, message_id))
+                if msg is not None:
                     return msg
-        return None
+            return None
     
     def clear_context(self, keep_system: bool = True):
         """重置对话上下文状态。
@@ -448,24 +769,31 @@ class Message:
 
         with self.lock:
             self.message_queue.clear()
+            self._index.reset()
+            self.base = None
             self.current_context_tokens = 0
             self.last_operation = None
             self.compression_results.clear()
+            self._compressing.clear()
             
             self.raw_id_allocator.reset()
             self.compressed_id_allocator.reset()
 
             if not keep_system:
                 self.system_pompmts.clear()
+            self.estimated_context_tokens = sum(self._tokens(msg) for msg in self.system_pompmts)
+            self._payload = [self._wire(msg) for msg in self.system_pompmts]
+            self._payload_shared = False
+            self._payload_dirty = False
     
     def wait_for_compression(self, timeout: float = 30.0) -> bool:
-        """等待当前压缩任务完成（同步版）"""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if self.compression_queue.empty():
-                return True
-            time.sleep(0.1)
-        return False
+        """等待已提交的压缩任务全部执行完成（同步版）
+
+        Returns:
+            超时前完成返回True
+        """
+        with self.lock:
+            return self._compression_done.wait_for(lambda: self.pending_compressions <= 0, timeout)
     
     def get_original_messages(self, compressed_id: str) -> Optional[List[Dict]]:
         """通过压缩消息ID反查原始消息。
@@ -476,12 +804,31 @@ class Message:
         Returns:
             原始消息字典列表，查询失败时返回None
         """
-        compressed_msg = self.get_message(compressed_id)
-        if not compressed_msg or not compressed_msg.get("is_compressed"):
+        compressed_msg = self.get_message(compressed_id, is_compressed=True)
+        if not compressed_msg:
             return None
         
         source_ids = compressed_msg.get("source_ids", [])
-        return [msg for id in source_ids if (msg := self.get_message(id)) is not None]
+        with self.lock:
+            found: Dict[int, Dict] = {}
+            for msg_id in source_ids:
+                key = self._find_key(msg_id)
+                if key is not None:
+                    found[msg_id] = self.message_queue[key]
+            missing = set(source_ids) - found.keys()
+            if missing and self.base is not None:
+                # 其余的原始消息在共享前缀中: 沿消息段链表遍历一次,原始消息优先
+                compressed: Dict[int, Dict] = {}
+                for msg in self.base.iter_messages():
+                    if msg["id"] not in missing:
+                        continue
+                    if msg.get("is_compressed"):
+                        compressed.setdefault(msg["id"], msg)
+                    else:
+                        found.setdefault(msg["id"], msg)
+                for msg_id, msg in compressed.items():
+                    found.setdefault(msg_id, msg)
+            return [found[msg_id] for msg_id in source_ids if msg_id in found]
     
     def get_queue_size(self) -> int:
         """获取当前对话队列长度。
@@ -490,7 +837,7 @@ class Message:
             消息队列中的消息数量
         """
         with self.lock:
-            return len(self.message_queue)
+            return len(self.message_queue) + (self.base.length if self.base else 0)
     
     def add_system_pompmt(self, content: str) -> int:
         """添加系统消息到受保护区域。
@@ -508,25 +855,37 @@ class Message:
                 "content": content
             }
             self.system_pompmts.append(pormpt)
+            self.estimated_context_tokens += self._tokens(pormpt)
+            # 系统消息位于对话消息之前
+            if not self._payload_dirty:
+                self._mutable_payload().insert(len(self.system_pompmts) - 1, self._wire(pormpt))
 
             return message_id
     
-    def remove_message(self, message_id: str) -> Optional[Dict]:
+    def remove_message(self, message_id: str, is_compressed: Optional[bool] = None) -> Optional[Dict]:
         """从队列中删除指定消息。
         
         Args:
             message_id: 要删除的消息ID
+            is_compressed: 消息类型,None时先查原始消息再查压缩消息
             
         Returns:
             被删除的消息字典，未找到时返回None
         """
 
         with self.lock:
-            for i, msg in enumerate(self.message_queue):
-                if msg.get("id") == message_id:
-                    del self.message_queue[i]
-                    return msg
-        return None
+            key = self._find_key(message_id, is_compressed)
+            if key is None and self.base is not None:
+                # 要删除的消息在共享前缀中: 复制前缀后再删除
+                self._materialize()
+                key = self._find_key(message_id, is_compressed)
+            if key is None:
+                return None
+            self._payload_dirty = True
+            msg = self.message_queue.pop(key)
+            self._index.remove(key)
+            self.estimated_context_tokens -= self._tokens(msg)
+            return msg
     
     def get_allocator_states(self) -> Dict[str, Dict]:
         """获取ID分配器的当前状态。
@@ -544,20 +903,23 @@ class Message:
         """获取完整的原始消息队列（包含元数据）。
         
         Returns:
-            当前消息队列的完整副本
+            当前消息队列(含共享前缀)的完整副本
         """
-        return self.message_queue
+        with self.lock:
+            messages = list(self.base.iter_messages()) if self.base is not None else []
+            messages.extend(self.message_queue.values())
+            return messages
     
     def get_all_data(self):
         """返回所有数据"""
-        return self.system_pompmts,self.message_queue
+        return self.system_pompmts,self.get_full_context()
     
     def __str__(self) -> str:
         """返回对象的字符串表示，展示关键状态信息"""
         # 安全获取队列大小（避免锁冲突）
         try:
             queue_size = self.get_queue_size()
-            compression_tasks = self.compression_queue.qsize()
+            compression_tasks = self.pending_compressions
         except:
             queue_size = "未知"
             compression_tasks = "未知"
@@ -578,7 +940,7 @@ class Message:
             f"Message(会话: {self.session})\n"
             f"├── 系统消息: {system_summary}\n"
             f"├── 消息队列: {queue_size}条消息\n"
-            f"├── Token使用: {self.current_context_tokens}/{self.max_context_tokens}\n"
+            f"├── Token使用: {self.current_context_tokens}/{self.max_context_tokens} (估算: {self.estimated_context_tokens})\n"
             f"├── 原始消息ID: {allocator_states['raw']['current_id']}\n"
             f"├── 压缩消息ID: {allocator_states['compressed']['current_id']}\n"
             f"├── 压缩任务: {compression_tasks}个待处理\n"
@@ -0,0 +1,111 @@
+"""
+按键索引的消息链表
+对话消息按时间排列,压缩摘要需要插入到被压缩的第一条消息处。
+OrderedDict只能在两端插入,中间插入要重建整个字典;
+这里每个键对应一个双向链表节点,按键查找、删除以及在任意键之前插入都是O(1)。
+"""
+from collections.abc import MutableMapping
+from typing import Any, Dict, Hashable, Iterable, Iterator, Optional, Tuple
+
+class _Node:
+    __slots__ = ("prev", "next", "key", "value")
+
+    def __init__(self, key: Hashable = None, value: Any = None):
+        self.prev: "_Node" = self
+        self.next: "_Node" = self
+        self.key = key
+        self.value = value
+
+class MessageQueue(MutableMapping):
+    """按插入顺序排列、可在任意位置插入的有序映射
+
+    除MutableMapping的接口外,提供 insert_before / appendleft 在链表中间或队首插入。
+    为已有的键赋值只替换值,不改变位置;新键追加到队尾。
+
+    Example:
+        >>> queue = MessageQueue([("a", 1), ("c", 3)])
+        >>> queue.insert_before("c", "b", 2)
+        >>> list(queue.items())
+        [('a', 1), ('b', 2), ('c', 3)]
+    """
+
+    def __init__(self, items: Iterable[Tuple[Hashable, Any]] = ()):
+        self._root = _Node()  # 哨兵: root.next为队首, root.prev为队尾
+        self._nodes: Dict[Hashable, _Node] = {}
+        for key, value in items:
+            self[key] = value
+
+    def _link(self, node: _Node, before: _Node):
+        """把节点链接到before之前"""
+        prev = before.prev
+        node.prev, node.next = prev, before
+        prev.next = node
+        before.prev = node
+        self._nodes[node.key] = node
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self._nodes[key].value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        node = self._nodes.get(key)
+        if node is not None:
+            node.value = value
+        else:
+            self._link(_Node(key, value), self._root)
+
+    def __delitem__(self, key: Hashable):
+        node = self._nodes.pop(key)
+        node.prev.next = node.next
+        node.next.prev = node.prev
+        node.prev = node.next = node
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        node = self._root.next
+        while node is not self._root:
+            yield node.key
+            node = node.next
+
+    def values(self) -> Iterator[Any]:
+        node = self._root.next
+        while node is not self._root:
+            yield node.value
+            node = node.next
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        node = self._root.next
+        while node is not self._root:
+            yield node.key, node.value
+            node = node.next
+
+    def insert_before(self, anchor: Hashable, key: Hashable, value: Any):
+        """在anchor之前插入新键
+
+        Raises:
+            KeyError: anchor不存在或key已存在
+        """
+        if key in self._nodes:
+            raise KeyError(f"键已存在: {key}")
+        self._link(_Node(key, value), self._nodes[anchor])
+
+    def appendleft(self, key: Hashable, value: Any):
+        """在队首插入新键"""
+        if key in self._nodes:
+            raise KeyError(f"键已存在: {key}")
+        self._link(_Node(key, value), self._root.next)
+
+    def first_key(self) -> Optional[Hashable]:
+        """队首的键,队列为空时返回None"""
+        return self._root.next.key if self._nodes else None
+
+    def clear(self):
+        self._root.prev = self._root.next = self._root
+        self._nodes.clear()
+
+    def __repr__(self) -> str:
+        return f"MessageQueue({list(self.items())!r})"
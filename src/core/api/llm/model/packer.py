@@ -0,0 +1,272 @@
+"""
+上下文打包
+在token预算内选择要发送的消息:系统消息固定保留,最近的若干条消息固定保留,
+其余预算优先放入压缩摘要,再由近及远放入原始消息。
+按前缀和二分查找截断位置,无需逐条试探。
+TokenIndex随消息增删增量维护前缀和,上下文管理器每次检查预算时无需重新累加。
+"""
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from itertools import accumulate
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+@dataclass
+class PackPlan:
+    """打包结果
+
+    Attributes:
+        selected: 选中的消息下标(升序)
+        dropped: 未选中的消息下标(升序),即需要移除或压缩的消息
+        cut: 连续保留的原始消息起点,之前只保留摘要
+        tokens: 选中消息与系统消息的token总数
+    """
+    selected: List[int] = field(default_factory=list)
+    dropped: List[int] = field(default_factory=list)
+    cut: int = 0
+    tokens: int = 0
+
+class TokenIndex:
+    """按消息位置维护token前缀和的树状数组
+
+    每条消息加入时分配递增的槽位,槽位顺序即消息在队列中的顺序;
+    摘要沿用被压缩的第一条消息的槽位(replace),插入摘要时其他消息的槽位不变。
+    分别维护 消息数 / token数 / 原始消息token数 三组前缀和,增删改与查询均为O(log n),
+    槽位用尽时按存活的消息重新编号(均摊O(1))。
+    暂停(suspend)的消息保留槽位但不计入前缀和,用于正在压缩、即将被摘要替换的消息。
+
+    Attributes:
+        count: 计入的消息数
+        tokens: 计入的token总数
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._min_capacity = max(1, capacity)
+        self._reset(self._min_capacity)
+
+    def _reset(self, capacity: int):
+        self._capacity = capacity
+        self._size = 0  # 已分配的槽位数
+        self._keys: List[Optional[Hashable]] = [None] * capacity
+        self._slots: Dict[Hashable, int] = {}
+        # 各槽位当前计入的(消息数, token数, 原始消息token数)
+        self._values: List[Tuple[int, int, int]] = [(0, 0, 0)] * capacity
+        self._trees: Tuple[List[int], List[int], List[int]] = tuple([0] * (capacity + 1) for _ in range(3))
+        self.count = 0
+        self.tokens = 0
+
+    def _set(self, slot: int, value: Tuple[int, int, int]):
+        old = self._values[slot]
+        if old == value:
+            return
+        self._values[slot] = value
+        self.count += value[0] - old[0]
+        self.tokens += value[1] - old[1]
+        for tree, new, previous in zip(self._trees, value, old):
+            delta = new - previous
+            if delta:
+                i = slot + 1
+                while i <= self._capacity:
+                    tree[i] += delta
+                    i += i & -i
+
+    @staticmethod
+    def _value(tokens: int, summary: bool) -> Tuple[int, int, int]:
+        return (1, tokens, 0 if summary else tokens)
+
+    def _compact(self):
+        """按存活的消息重新编号,空闲槽位不少于存活消息数"""
+        live = [(key, self._values[slot]) for slot, key in enumerate(self._keys[:self._size]) if key is not None]
+        capacity = max(self._min_capacity, 2 * len(live))
+        self._reset(capacity)
+        trees = self._trees
+        for slot, (key, value) in enumerate(live):
+            self._keys[slot] = key
+            self._slots[key] = slot
+            self._values[slot] = value
+            self.count += value[0]
+            self.tokens += value[1]
+            for tree, v in zip(trees, value):
+                tree[slot + 1] += v
+        self._size = len(live)
+        # 线性建树
+        for tree in trees:
+            for i in range(1, capacity + 1):
+                parent = i + (i & -i)
+                if parent <= capacity:
+                    tree[parent] += tree[i]
+
+    def reset(self, entries: Iterable[Tuple[Hashable, int, bool]] = ()):
+        """按(键, token数, 是否摘要)重新建立索引"""
+        entries = list(entries)
+        self._reset(max(self._min_capacity, 2 * len(entries)))
+        for key, tokens, summary in entries:
+            slot = self._size
+            self._size += 1
+            self._keys[slot] = key
+            self._slots[key] = slot
+            self._values[slot] = self._value(tokens, summary)
+        self._compact()
+
+    def append(self, key: Hashable, tokens: int, summary: bool = False):
+        """在末尾加入消息"""
+        if key in self._slots:
+            raise KeyError(f"键已存在: {key}")
+        if self._size == self._capacity:
+            self._compact()
+        slot = self._size
+        self._size += 1
+        self._keys[slot] = key
+        self._slots[key] = slot
+        self._set(slot, self._value(tokens, summary))
+
+    def replace(self, old_key: Hashable, key: Hashable, tokens: int, summary: bool = False):
+        """新消息沿用old_key的槽位,old_key随之移除"""
+        slot = self._slots.pop(old_key)
+        self._keys[slot] = key
+        self._slots[key] = slot
+        self._set(slot, self._value(tokens, summary))
+
+    def remove(self, key: Hashable):
+        """移除消息,不存在时忽略"""
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._keys[slot] = None
+            self._set(slot, (0, 0, 0))
+
+    def suspend(self, key: Hashable):
+        """暂停计入消息,保留其槽位"""
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._set(slot, (0, 0, 0))
+
+    def resume(self, key: Hashable, tokens: int, summary: bool = False):
+        """恢复计入暂停的消息"""
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._set(slot, self._value(tokens, summary))
+
+    def slot(self, key: Hashable) -> int:
+        return self._slots[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._slots
+
+    def prefix(self, slot: int) -> Tuple[int, int, int]:
+        """槽位slot之前的(消息数, token数, 原始消息token数)"""
+        sums = [0, 0, 0]
+        i = slot
+        while i > 0:
+            for n, tree in enumerate(self._trees):
+                sums[n] += tree[i]
+            i -= i & -i
+        return tuple(sums)
+
+    def search_origin(self, need: int) -> Optional[int]:
+        """原始消息token前缀和不小于need的最小槽位边界c(即槽位 < c 的消息),不存在时返回None"""
+        if need <= 0:
+            return 0
+        tree = self._trees[2]
+        pos, rest = 0, need
+        step = 1 << self._capacity.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self._capacity and tree[nxt] < rest:
+                pos = nxt
+                rest -= tree[nxt]
+            step >>= 1
+        return pos + 1 if pos < self._capacity else None
+
+class ContextPacker:
+    """按token预算选择上下文消息
+
+    Attributes:
+        keep_recent: 固定保留的最近消息条数,预算不足时至少保留最后一条
+    """
+
+    def __init__(self, keep_recent: int = 4):
+        if keep_recent < 1:
+            raise ValueError("keep_recent 必须大于0")
+        self.keep_recent = keep_recent
+
+    def pack(
+        self,
+        system_tokens: int,
+        tokens: Sequence[int],
+        summaries: Sequence[bool],
+        budget: int
+    ) -> PackPlan:
+        """选择预算内的消息
+
+        保留 [cut, n) 的全部消息以及 cut 之前的全部摘要时,
+        花费为 total - origin_prefix[cut],随 cut 单调不增,可二分查找最小的 cut。
+
+        Args:
+            system_tokens: 系统消息的token总数(固定保留)
+            tokens: 各条消息的token数,按时间顺序
+            summaries: 各条消息是否为压缩摘要
+            budget: token预算(含系统消息)
+
+        Returns:
+            PackPlan: 选择结果
+        """
+        n = len(tokens)
+        remaining = budget - system_tokens
+        total = sum(tokens)
+        if total <= remaining:
+            return PackPlan(selected=list(range(n)), cut=0, tokens=system_tokens + total)
+
+        tail_start = max(0, n - self.keep_recent)
+        # origin_prefix[i]: 前i条消息中原始消息的token和
+        origin_prefix = list(accumulate(
+            (0 if summary else count for count, summary in zip(tokens, summaries)), initial=0
+        ))
+        cut = bisect_left(origin_prefix, total - remaining, 0, tail_start + 1)
+        if cut <= tail_start:
+            selected = [i for i in range(cut) if summaries[i]]
+            selected.extend(range(cut, n))
+            return self._plan(selected, n, cut, system_tokens + total - origin_prefix[cut])
+
+        # 保留最近消息后仍超出预算: 由旧到新丢弃尾部之前的摘要
+        cost = total - origin_prefix[tail_start]
+        kept = [i for i in range(tail_start) if summaries[i]]
+        first = 0
+        while first < len(kept) and cost > remaining:
+            cost -= tokens[kept[first]]
+            first += 1
+        if cost <= remaining:
+            return self._plan(kept[first:] + list(range(tail_start, n)), n, tail_start, system_tokens + cost)
+
+        # 最近消息本身超出预算: 缩短尾部,至少保留最后一条
+        prefix = list(accumulate(tokens, initial=0))
+        cut = min(bisect_left(prefix, prefix[n] - remaining, tail_start, n), n - 1) if n else 0
+        return self._plan(list(range(cut, n)), n, cut, system_tokens + prefix[n] - prefix[cut])
+
+    def cut(self, system_tokens: int, index: TokenIndex, budget: int) -> Optional[int]:
+        """按增量维护的前缀和查找截断位置,与pack的第一种情形一致
+
+        Args:
+            system_tokens: 系统消息的token总数
+            index: 消息的前缀和索引
+            budget: token预算(含系统消息)
+
+        Returns:
+            槽位边界c: 丢弃槽位 < c 的原始消息(保留其中的摘要)即可满足预算,全部放得下时为0;
+            需要丢弃最近消息或摘要时返回None,由pack处理
+        """
+        need = index.tokens - (budget - system_tokens)
+        if need <= 0:
+            return 0
+        cut = index.search_origin(need)
+        if cut is None or index.prefix(cut)[0] > max(0, index.count - self.keep_recent):
+            return None
+        return cut
+
+    @staticmethod
+    def _plan(selected: List[int], n: int, cut: int, tokens: int) -> PackPlan:
+        chosen = set(selected)
+        return PackPlan(
+            selected=selected,
+            dropped=[i for i in range(n) if i not in chosen],
+            cut=cut,
+            tokens=tokens
+        )
@@ -0,0 +1,72 @@
+"""
+分支共享的消息段
+分支从父对话派生时,父对话到分叉点为止的消息冻结为不可变的消息段,由父子共享;
+各自只保存分叉之后的消息。消息段通过parent串成持久化链表,按根 -> 叶的顺序即为完整前缀。
+"""
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+class Segment:
+    """不可变的消息段
+
+    Attributes:
+        segment_id: 消息段的唯一标识,持久化时用于引用
+        parent: 上一个消息段,None表示链表起点
+        messages: 本段的消息(不含祖先段)
+        wires: 本段消息的请求格式,与共享本段的所有上下文共用
+        length: 含祖先段的消息总数
+        tokens: 含祖先段的token总数
+    """
+    __slots__ = ("segment_id", "parent", "messages", "wires", "length", "tokens", "__weakref__")
+
+    def __init__(
+        self,
+        messages: Tuple[Dict, ...],
+        parent: Optional["Segment"] = None,
+        tokens: int = 0,
+        segment_id: Optional[str] = None
+    ):
+        """
+        Args:
+            messages: 本段的消息,消息字典创建后不应再修改
+            parent: 上一个消息段
+            tokens: 本段消息的token数(不含祖先段)
+            segment_id: 从存储恢复时传入原有标识
+        """
+        self.segment_id = segment_id or uuid.uuid4().hex
+        self.parent = parent
+        self.messages = tuple(messages)
+        self.wires = tuple({"role": msg["role"], "content": msg["content"]} for msg in self.messages)
+        self.length = len(self.messages) + (parent.length if parent else 0)
+        self.tokens = tokens + (parent.tokens if parent else 0)
+
+    def chain(self) -> List["Segment"]:
+        """从链表起点到本段的全部消息段"""
+        segments = []
+        segment = self
+        while segment is not None:
+            segments.append(segment)
+            segment = segment.parent
+        segments.reverse()
+        return segments
+
+    def iter_messages(self) -> Iterator[Dict]:
+        """按时间顺序遍历前缀中的全部消息"""
+        for segment in self.chain():
+            yield from segment.messages
+
+    def iter_wires(self) -> Iterator[Dict]:
+        """按时间顺序遍历前缀中全部消息的请求格式"""
+        for segment in self.chain():
+            yield from segment.wires
+
+    def find(self, key: Tuple[bool, int]) -> Optional[Dict]:
+        """按(是否压缩, 消息ID)查找前缀中的消息"""
+        for segment in self.chain():
+            for msg in segment.messages:
+                if (bool(msg.get("is_compressed")), msg["id"]) == key:
+                    return msg
+        return None
+
+    def __repr__(self) -> str:
+        return f"Segment({self.segment_id[:8]}, {len(self.messages)}/{self.length}条消息)"
@@ -0,0 +1,64 @@
+"""
+token计数接口
+Message在添加消息时计算一次token数并累计总量,超限时在发送前处理
+需要精确计数时可接入模型对应的分词器,否则使用估算器
+"""
+from abc import ABC, abstractmethod
+from typing import Callable, Dict
+
+class Tokenizer(ABC):
+    """token计数器基础接口
+
+    Attributes:
+        per_message_tokens: 每条消息除内容外的固定开销(角色、分隔符等)
+    """
+    per_message_tokens: int = 3
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """计算文本的token数量
+
+        Args:
+            text: 输入文本
+
+        Returns:
+            文本对应的token数量
+        """
+        pass
+
+    def count_message(self, message: Dict) -> int:
+        """计算一条消息的token数量(内容+固定开销)"""
+        return self.count(message.get("content") or "") + self.per_message_tokens
+
+    def __call__(self, text: str) -> int:
+        return self.count(text)
+
+class EstimateTokenizer(Tokenizer):
+    """按字符类别估算token数
+
+    英文约4字符1token,中文约2字符1token。
+    中文字符在UTF-8中占3字节,由编码后长度与字符数之差得到非ASCII字符数,
+    整个计算由编码在C层完成,避免逐字符的Python循环。
+    """
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        length = len(text)
+        if text.isascii():
+            return length // 4
+        # 每个3字节字符比ASCII多2字节
+        wide = (len(text.encode("utf-8", "surrogatepass")) - length) // 2
+        return int((length - wide) / 4 + wide / 2)
+
+class FunctionTokenizer(Tokenizer):
+    """包装已有的计数函数,如模型SDK提供的分词器"""
+
+    def __init__(self, func: Callable[[str], int], per_message_tokens: int = Tokenizer.per_message_tokens):
+        if not callable(func):
+            raise TypeError("计数函数必须可调用")
+        self._func = func
+        self.per_message_tokens = per_message_tokens
+
+    def count(self, text: str) -> int:
+        return int(self._func(text))
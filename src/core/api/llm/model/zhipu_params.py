@@ -1,6 +1,17 @@
 from dataclasses import dataclass, field
 from typing import List, Dict, Any, Literal, Optional, Union
 
+# 服务端默认值模板: 取值与之相同的可选字段不随请求发送,请求体更小
+# temperature、top_p、max_tokens 的默认值随模型而变,始终发送
+_SERVER_DEFAULTS: Dict[str, Any] = {
+    "request_id": None,
+    "do_sample": True,
+    "tools": None,
+    "tool_choice": "auto",
+    "user_id": None,
+    "stop": None,
+}
+
 @dataclass
 class ZhipuChatParams:
     """
@@ -101,23 +112,27 @@ class ZhipuChatParams:
         self._response_format_type = fmt
 
     def payload(self) -> Dict[str, Any]:
-        """转换为API请求格式"""
-        return {
+        """转换为API请求格式
+
+        只包含必需字段与不同于服务端默认值的可选字段,返回新字典,调用方可自由修改
+        """
+        payload = {
             "model": self.model,
             "messages": self.messages,
-            "request_id": self.request_id,
-            "do_sample": self.do_sample,
             "stream": self.stream,
             #"thinking": self.thinking,  # 使用属性获取结构化数据 sdk不支持思考参数,使用会报错
             "temperature": self.temperature,
             "top_p": self.top_p,
             "max_tokens": self.max_tokens,
-            "tools": self.tools,
-            "tool_choice": self.tool_choice,
-            "user_id": self.user_id,
-            "stop": self.stop,
-            "response_format": self.response_format  # 使用属性获取结构化数据
         }
+        for name, default in _SERVER_DEFAULTS.items():
+            value = getattr(self, name)
+            if value != default:
+                payload[name] = value
+        if self._response_format_type != "text":
+            payload["response_format"] = self.response_format  # 使用属性获取结构化数据
+        return payload
+
     def __str__(self) -> str:
         """返回对象的字符串表示，展示关键配置参数"""
         # 构建消息摘要
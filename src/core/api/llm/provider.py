@@ -5,7 +5,7 @@
 数据将会通过传递的方式获取,实现松耦合
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, AsyncGenerator,List
+from typing import Dict, Any, Optional, AsyncGenerator, AsyncIterator, List
 
 # ================= 大语言模型基础接口定义 =================
 class LLMProviderBase(ABC):
@@ -53,6 +53,18 @@ class LLMProviderBase(ABC):
         """
         pass
 
+    async def astream(self) -> AsyncIterator[str]:
+        """异步流式聊天补全接口
+
+        以异步迭代器逐块返回模型响应,可在同一事件循环中并发多路。
+        取消所在的asyncio任务即可终止请求,被取消的响应不写入上下文。
+
+        Yields:
+            str: 响应内容片段
+        """
+        raise NotImplementedError(f"{type(self).__name__} 不支持异步流式接口")
+        yield
+
     @abstractmethod
     def stop_stream(self):
         """终止流输出"""
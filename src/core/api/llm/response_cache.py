@@ -0,0 +1,199 @@
+"""
+确定性请求的响应缓存
+翻译、单词解释、引导词等功能常以 do_sample=False 重复发送相同的请求,
+按模型、参数与消息的内容哈希缓存响应,命中时不再发起网络请求。
+
+- 内存层: 有容量上限的LRU,命中在微秒级
+- 持久层: 可选的SQLite文件,带过期时间与总大小上限,重启后仍可命中
+- 启用采样(do_sample不为False)的请求不缓存
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+from ...database.pool import ConnectionPool
+
+logger = logging.getLogger("ResponseCache")
+logger.addHandler(logging.NullHandler())
+
+# 不影响响应内容的字段,不参与缓存键
+_VOLATILE_FIELDS = ("stream", "request_id", "user_id")
+
+class ResponseCache:
+    """内容寻址的两级响应缓存
+
+    Attributes:
+        capacity: 内存层的条目上限
+        ttl: 条目有效期(秒),None表示不过期
+        max_bytes: 持久层响应内容的总字节数上限,超出时淘汰最久未访问的条目
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        capacity: int = 256,
+        ttl: Optional[float] = 7 * 24 * 3600,
+        max_bytes: int = 16 * 1024 * 1024
+    ):
+        """
+        Args:
+            path: 持久层SQLite文件路径,为空时只使用内存层
+            capacity: 内存层的条目上限
+            ttl: 条目有效期(秒)
+            max_bytes: 持久层总大小上限(字节)
+        """
+        if capacity < 1:
+            raise ValueError("capacity 必须大于0")
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # key -> (过期时间, 响应内容)
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._bypassed = 0
+
+        self._pool: Optional[ConnectionPool] = None
+        if path:
+            self._pool = ConnectionPool(path)
+            with self._pool.write() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS response_cache (
+                        key TEXT PRIMARY KEY,
+                        response TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        expires_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                """)
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_response_cache_accessed ON response_cache(accessed_at)"
+                )
+
+    @staticmethod
+    def cacheable(payload: Mapping[str, Any]) -> bool:
+        """只有关闭采样的请求才有确定的响应"""
+        return payload.get("do_sample", True) is False
+
+    @staticmethod
+    def make_key(payload: Mapping[str, Any]) -> str:
+        """按模型、参数与消息计算缓存键"""
+        content = {k: v for k, v in payload.items() if k not in _VOLATILE_FIELDS}
+        data = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def lookup(self, payload: Mapping[str, Any]) -> Optional[str]:
+        """查找请求的缓存响应,采样请求总是返回None"""
+        if not self.cacheable(payload):
+            with self._lock:
+                self._bypassed += 1
+            return None
+        return self.get(self.make_key(payload))
+
+    def store(self, payload: Mapping[str, Any], response: str):
+        """缓存请求的响应,采样请求不缓存"""
+        if response and self.cacheable(payload):
+            self.put(self.make_key(payload), response)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                if item[0] > now:
+                    self._memory.move_to_end(key)
+                    self._hits += 1
+                    return item[1]
+                del self._memory[key]
+
+        row = None
+        if self._pool is not None:
+            row = self._pool.reader.execute(
+                "SELECT response, expires_at FROM response_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        if row is None:
+            with self._lock:
+                self._misses += 1
+            return None
+
+        # 持久层命中: 提升到内存层并刷新访问时间
+        response, expires_at = row["response"], row["expires_at"]
+        self._remember(key, expires_at, response)
+        with self._pool.write() as conn:
+            conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self._disk_hits += 1
+        return response
+
+    def put(self, key: str, response: str):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl is not None else float("inf")
+        self._remember(key, expires_at, response)
+        if self._pool is None:
+            return
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._pool.write() as conn:
+            conn.execute(
+                "INSERT INTO response_cache (key, response, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET response = excluded.response, size = excluded.size, "
+                "expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                (key, response, size, expires_at, now)
+            )
+            self._trim(conn, now)
+
+    def _remember(self, key: str, expires_at: float, response: str):
+        with self._lock:
+            self._memory[key] = (expires_at, response)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.capacity:
+                self._memory.popitem(last=False)
+
+    def _trim(self, conn, now: float):
+        """删除过期条目,总大小超出上限时按访问时间淘汰,调用方需持有写连接"""
+        conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for row in conn.execute("SELECT key, size FROM response_cache ORDER BY accessed_at"):
+            stale.append((row["key"],))
+            freed += row["size"]
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM response_cache WHERE key = ?", stale)
+        logger.info(f"响应缓存超出大小上限,淘汰 {len(stale)} 条")
+
+    def clear(self):
+        """清空两级缓存"""
+        with self._lock:
+            self._memory.clear()
+        if self._pool is not None:
+            with self._pool.write() as conn:
+                conn.execute("DELETE FROM response_cache")
+
+    def stats(self) -> Dict[str, int]:
+        """返回缓存统计: entries 内存层条目数, hits 内存层命中, disk_hits 持久层命中,
+        misses 未命中, bypassed 因启用采样而跳过的次数"""
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "bypassed": self._bypassed,
+            }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
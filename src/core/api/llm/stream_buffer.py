@@ -0,0 +1,158 @@
+"""
+流式片段合并缓冲
+网络读取线程只负责写入,由独立的分发线程按时间或长度阈值把片段合并后交给回调,
+界面回调再慢也不会阻塞读取。待分发的帧放在有界环形队列中,
+队列满时新内容并入最后一帧(或按配置丢弃最旧的帧)。
+"""
+import io
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger("StreamCoalescer")
+logger.addHandler(logging.NullHandler())
+
+class StreamCoalescer:
+    """合并流式片段并在后台线程中分发给回调
+
+    片段先写入 io.StringIO 累积,满足以下任一条件时封装为一帧:
+    累积长度达到 max_chars,或距第一个未封装片段超过 interval 秒。
+
+    Attributes:
+        interval: 时间阈值(秒),默认约一帧(16ms)
+        max_chars: 长度阈值
+        capacity: 待分发帧的队列容量
+        drop_on_overflow: 队列满时丢弃最旧的帧,默认并入最后一帧而不丢内容
+    """
+
+    def __init__(
+        self,
+        callbacks: List[Callable[[str], None]],
+        interval: float = 0.016,
+        max_chars: int = 64,
+        capacity: int = 64,
+        drop_on_overflow: bool = False,
+        name: str = "stream-coalescer"
+    ):
+        if capacity < 1:
+            raise ValueError("capacity 必须大于0")
+        self._callbacks = list(callbacks)
+        self.interval = interval
+        self.max_chars = max_chars
+        self.capacity = capacity
+        self.drop_on_overflow = drop_on_overflow
+
+        self._cond = threading.Condition()
+        self._pending = io.StringIO()
+        self._pending_len = 0
+        self._pending_since = 0.0
+        self._frames: Deque[str] = deque()
+        self._closed = False
+
+        # 统计
+        self._chunks = 0
+        self._merged = 0
+        self._dropped = 0
+        self._delivered = 0
+        self._max_depth = 0
+        self._callback_time = 0.0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def push(self, chunk: str):
+        """写入一个片段,不等待回调执行"""
+        if not chunk:
+            return
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("缓冲已关闭")
+            self._chunks += 1
+            if self._pending_len:
+                self._merged += 1
+            else:
+                self._pending_since = time.monotonic()
+            self._pending.write(chunk)
+            self._pending_len += len(chunk)
+            if self._pending_len >= self.max_chars:
+                self._seal()
+                self._cond.notify()
+            elif self._pending_len == len(chunk):
+                # 新的累积开始,唤醒分发线程计时
+                self._cond.notify()
+
+    def close(self, timeout: Optional[float] = None):
+        """封装剩余内容并等待分发完成"""
+        with self._cond:
+            if not self._closed:
+                self._closed = True
+                self._seal()
+                self._cond.notify()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, float]:
+        """返回合并与分发统计
+
+        Returns:
+            dict: chunks 写入片段数, frames 分发帧数, merged 被合并的片段数,
+            dropped 丢弃的帧数, queue_depth 当前待分发帧数, max_queue_depth 最大待分发帧数,
+            callback_time 回调总耗时(秒)
+        """
+        with self._cond:
+            return {
+                "chunks": self._chunks,
+                "frames": self._delivered,
+                "merged": self._merged,
+                "dropped": self._dropped,
+                "queue_depth": len(self._frames),
+                "max_queue_depth": self._max_depth,
+                "callback_time": self._callback_time,
+            }
+
+    def _seal(self):
+        """把累积内容封装为一帧,调用方需持有锁"""
+        if not self._pending_len:
+            return
+        text = self._pending.getvalue()
+        self._pending = io.StringIO()
+        self._pending_len = 0
+        if len(self._frames) >= self.capacity:
+            if self.drop_on_overflow:
+                self._frames.popleft()
+                self._dropped += 1
+            else:
+                self._frames[-1] += text
+                self._merged += 1
+                return
+        self._frames.append(text)
+        self._max_depth = max(self._max_depth, len(self._frames))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._frames:
+                    if self._pending_len:
+                        remaining = self._pending_since + self.interval - time.monotonic()
+                        if remaining <= 0:
+                            self._seal()
+                            continue
+                        self._cond.wait(remaining)
+                    elif self._closed:
+                        return
+                    else:
+                        self._cond.wait()
+                frame = self._frames.popleft()
+
+            start = time.perf_counter()
+            for callback in self._callbacks:
+                try:
+                    callback(frame)
+                except Exception as e:
+                    logger.error(f"流式回调执行失败: {e}")
+            elapsed = time.perf_counter() - start
+
+            with self._cond:
+                self._delivered += 1
+                self._callback_time += elapsed
@@ -1,13 +1,54 @@
-from typing import Dict, Any, Optional, AsyncGenerator, List, Callable
+from typing import Dict, Any, Optional, AsyncGenerator, AsyncIterator, List, Callable, FrozenSet
 from zhipuai import ZhipuAI
-from zhipuai.core._errors import ZhipuAIError,APIAuthenticationError,APIStatusError,APIResponseValidationError
+from zhipuai.core._errors import (
+    ZhipuAIError, APIAuthenticationError, APIStatusError, APIResponseValidationError,
+    APIRequestFailedError, APIReachLimitError, APIInternalError, APIServerFlowExceedError,
+    APIConnectionError, APITimeoutError
+)
 import warnings
 import threading
 import inspect
+import json
+import weakref
+from contextlib import nullcontext
+import httpx
 from .provider import LLMProviderBase
-from .model import Message, ZhipuChatParams
+from .client_registry import ClientEntry, ClientRegistry, get_client_registry
+from .model import Message, ZhipuChatParams, EstimateTokenizer
+from .stream_buffer import StreamCoalescer
+from .response_cache import ResponseCache
+
+# 各SDK客户端类的 create 接受的参数名,每个类只检测一次; None 表示接受任意关键字参数
+_create_params: Dict[type, Optional[FrozenSet[str]]] = {}
+_create_params_lock = threading.Lock()
+
+def supported_create_params(completions: Any) -> Optional[FrozenSet[str]]:
+    """返回 completions.create 接受的参数名,按客户端类缓存"""
+    cls = type(completions)
+    try:
+        return _create_params[cls]
+    except KeyError:
+        pass
+    with _create_params_lock:
+        if cls not in _create_params:
+            parameters = inspect.signature(completions.create).parameters.values()
+            if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters):
+                _create_params[cls] = None
+            else:
+                _create_params[cls] = frozenset(p.name for p in parameters)
+        return _create_params[cls]
 
 class ZhipuAIProvider(LLMProviderBase):
+    DEFAULT_ENDPOINT = "https://open.bigmodel.cn/api/paas/v4"
+    # 与SDK一致的错误类型映射
+    STATUS_ERRORS = {
+        400: APIRequestFailedError,
+        401: APIAuthenticationError,
+        429: APIReachLimitError,
+        500: APIInternalError,
+        503: APIServerFlowExceedError,
+    }
+
     def __init__(self):
         '''智谱ai提供类'''        
         super().__init__()
@@ -21,12 +62,24 @@ class ZhipuAIProvider(LLMProviderBase):
         self._error_callback:List[Callable]=[]
         self._stream_thread = None
         self._stop_stream = threading.Event()
+        self._tokenizer = EstimateTokenizer()
+        # 流式片段合并阈值,见 StreamCoalescer
+        self.coalesce_interval = 0.016
+        self.coalesce_chars = 64
+        self._stream_stats: Dict[str, float] = {}
+        self._endpoint = self.DEFAULT_ENDPOINT
+        self._client_entry: Optional[ClientEntry] = None
+        self._client_finalizer = None
+        # 关闭采样的请求优先从缓存取得响应
+        self.response_cache: Optional[ResponseCache] = None
         
-    def initialize(self,api_key: str="",identity:str=""):
+    def initialize(self,api_key: str="",identity:str="",endpoint:str="",registry:Optional[ClientRegistry]=None):
         """
         初始化客户端和上下文管理器
         
         :param api_key: ZhiPu API密钥
+        :param endpoint: API地址,为空时使用默认地址
+        :param registry: 客户端注册表,默认使用进程内共享的注册表
         :raises ValueError: 如果参数不合法
         """
         # 参数验证
@@ -37,9 +90,33 @@ class ZhipuAIProvider(LLMProviderBase):
         if errors:
             raise ValueError("\n".join(errors))
         
-        # 初始化API客户端
+        # 初始化API客户端,相同凭证的实例共用客户端与连接池
+        self.close()
+        registry = registry or get_client_registry()
         self._api_key = api_key
-        self._client = ZhipuAI(api_key=api_key)
+        self._endpoint = endpoint or self.DEFAULT_ENDPOINT
+        self._client_entry = registry.acquire(api_key, self._endpoint, self._create_client)
+        self._client = self._client_entry.client
+        # 实例被回收时归还引用
+        self._client_finalizer = weakref.finalize(self, registry.release, self._client_entry)
+
+    @staticmethod
+    def _create_client(api_key: str, endpoint: str, http_client: httpx.Client) -> ZhipuAI:
+        return ZhipuAI(api_key=api_key, base_url=endpoint, http_client=http_client)
+
+    def _request_slot(self):
+        """占用共享客户端的一个请求名额"""
+        if self._client_entry is None:
+            return nullcontext()
+        return self._client_entry.slot()
+
+    def close(self):
+        """归还共享客户端,之后需重新initialize"""
+        if self._client_finalizer is not None:
+            self._client_finalizer()
+            self._client_finalizer = None
+        self._client_entry = None
+        self._client = None
     
     def set_message(self,message:Message):
         # 初始化上下文管理器
@@ -104,6 +181,25 @@ class ZhipuAIProvider(LLMProviderBase):
             else:
                 warnings.warn(f"忽略无效参数: {key}")
     
+    def _create_payload(self, params: Optional[ZhipuChatParams] = None) -> Dict[str, Any]:
+        """生成SDK调用参数,移除当前SDK版本不支持的参数(如旧版本的response_format)"""
+        payload = (params or self._params).payload()
+        supported = supported_create_params(self._client.chat.completions)
+        if supported is not None:
+            for key in [key for key in payload if key not in supported]:
+                payload.pop(key)
+        return payload
+
+    def _cached_response(self, payload: Dict[str, Any]) -> Optional[str]:
+        """关闭采样的请求返回缓存的响应,未启用缓存或未命中时返回None"""
+        if self.response_cache is None:
+            return None
+        return self.response_cache.lookup(payload)
+
+    def _store_response(self, payload: Dict[str, Any], content: str):
+        if self.response_cache is not None:
+            self.response_cache.store(payload, content)
+
     def get_parameters(self) -> dict:
         """返回当前模型参数配置"""
         if self._params is None:
@@ -127,16 +223,17 @@ class ZhipuAIProvider(LLMProviderBase):
             self._params.set_message(final_messages)
             self._params.stream = False
             # 获取参数
-            params = self._params.payload()
-            # 检查SDK是否支持response_format参数,暂时为了在交互环境中使用
-            # 可能是因为版本原因,交互式环境不支持格式参数,此处将参数移除
-            # 正常调用支持不会影响,但后续也会删除
-            create_params = inspect.signature(self._client.chat.completions.create).parameters
-            if "response_format" not in create_params:
-                params.pop("response_format", None)
+            params = self._create_payload()
+            cached = self._cached_response(params)
+            if cached is not None:
+                # 与网络响应一致: 上下文存在时才写入
+                if self._context_manager:
+                    self._context_manager.add_message("assistant", cached)
+                return cached
         
             # 调用API
-            response = self._client.chat.completions.create(**params)
+            with self._request_slot():
+                response = self._client.chat.completions.create(**params)
             
             # 处理响应
             if response.choices and response.choices[0].message.content: # type: ignore
@@ -146,6 +243,7 @@ class ZhipuAIProvider(LLMProviderBase):
                 # 添加到上下文
                 if self._context_manager:
                     self._context_manager.add_message("assistant", content)
+                self._store_response(params, content)
                 
                 return content
             return None
@@ -169,31 +267,52 @@ class ZhipuAIProvider(LLMProviderBase):
             messages = self._context_manager.get_context()
             self._params.set_message(messages)
             self._params.stream = True
+            params = self._create_payload()
+            cached = self._cached_response(params)
+            if cached is not None:
+                for callback in self._stream_callback:
+                    callback(cached)
+                if self._context_manager:
+                    self._context_manager.add_message("assistant", cached)
+                for callback in self._stream_finish_callback:
+                    callback("assistant", cached)
+                return
             
-            # 调用流式API
-            response = self._client.chat.completions.create(**self._params.payload())
+            # 占用一个请求名额,超出并发上限时等待
+            with self._request_slot():
+                # 调用流式API
+                response = self._client.chat.completions.create(**params)
             
-            # 处理流式响应
-            full_content = ""
-            for chunk in response:
-                if self._stop_stream.is_set():
-                    break
-                last_chunk = chunk
-                if chunk.choices and chunk.choices[0].delta.content: # type: ignore
-                    content_piece = chunk.choices[0].delta.content # type: ignore
-                    full_content += content_piece
-                    
-                    # 通过回调传递数据
-                    # if self._stream_callback:
-                    #     self._stream_callback(content_piece)
-
-                    # 每次流式信息的回调
-                    for call in self._stream_callback:
-                        call(content_piece)
+                # 处理流式响应
+                # 片段经合并缓冲交给回调,读取线程不等待界面处理
+                parts: List[str] = []
+                last_chunk = None
+                total_tokens = None
+                coalescer = StreamCoalescer(
+                    self._stream_callback,
+                    interval=self.coalesce_interval,
+                    max_chars=self.coalesce_chars
+                )
+                try:
+                    for chunk in response:
+                        if self._stop_stream.is_set():
+                            break
+                        last_chunk = chunk
+                        if chunk.choices and chunk.choices[0].delta.content: # type: ignore
+                            content_piece = chunk.choices[0].delta.content # type: ignore
+                            parts.append(content_piece)
+                            coalescer.push(content_piece)
+                finally:
+                    # 完成回调之前分发完剩余片段
+                    coalescer.close()
+                    self._stream_stats = coalescer.stats()
+            full_content = "".join(parts)
             
-            # 将完整响应添加到上下文
+            # 将完整响应添加到上下文,中途停止的响应不缓存
             if full_content and self._context_manager:
                 self._context_manager.add_message("assistant", full_content)
+                if not self._stop_stream.is_set():
+                    self._store_response(params, full_content)
 
             # 设置总tokens
             try:
@@ -235,14 +354,127 @@ class ZhipuAIProvider(LLMProviderBase):
         return True
     
     def join(self,timeout:int=300):
-        import time
-        p=0
-        while True:
-            p+=1
-            if not self._stream_thread.is_alive() or p>timeout:
-                break
-            else:
-                time.sleep(1)
+        """等待流式线程结束,线程结束后立即返回"""
+        if self._stream_thread is not None:
+            self._stream_thread.join(timeout)
+
+    async def astream(self) -> AsyncIterator[str]:
+        """异步流式聊天补全接口
+
+        直接以SSE读取响应,不占用额外线程,多路请求可共享同一事件循环。
+        请求参数在发起时复制,不修改共享的参数实例,因此同一提供者可并发多路。
+        正常结束后将完整响应写入上下文并执行完成回调;
+        所在任务被取消时连接随之关闭,不写入上下文。
+        网络与响应错误转换为与同步接口(SDK)相同的异常类型,见 _transport_error。
+        """
+        if not self._client:
+            raise RuntimeError("Provider not initialized. Call initialize() first.")
+        if self._context_manager is None:
+            raise ValueError("未设置上下文")
+        if self._params is None:
+            raise ValueError("未设置参数")
+
+        payload = self._params.payload()
+        payload["messages"] = self._context_manager.get_context()
+        payload["stream"] = True
+        payload = {key: value for key, value in payload.items() if value is not None}
+
+        cached = self._cached_response(payload)
+        if cached is not None:
+            yield cached
+            if self._context_manager:
+                self._context_manager.add_message("assistant", cached)
+            for callback in self._stream_finish_callback:
+                callback("assistant", cached)
+            return
+
+        parts: List[str] = []
+        total_tokens = None
+        url = f"{self._endpoint.rstrip('/')}/chat/completions"
+        try:
+            async with self._client_entry.async_slot() as client, client.stream(
+                "POST", url, json=payload, headers=self._request_headers()
+            ) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise self._status_error(response)
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except json.JSONDecodeError:
+                        raise APIResponseValidationError(response, data, message=f"无法解析的流式片段: {data[:100]}")
+                    usage = chunk.get("usage")
+                    if usage and usage.get("total_tokens") is not None:
+                        total_tokens = usage["total_tokens"]
+                    choices = chunk.get("choices")
+                    content_piece = choices[0].get("delta", {}).get("content") if choices else None
+                    if content_piece:
+                        parts.append(content_piece)
+                        yield content_piece
+        except ZhipuAIError as e:
+            self._handle_api_error(e)
+            for callback in self._error_callback:
+                callback()
+            raise
+        except httpx.HTTPError as e:
+            error = self._transport_error(e, url)
+            self._handle_api_error(error)
+            for callback in self._error_callback:
+                callback()
+            raise error from e
+
+        full_content = "".join(parts)
+        # 将完整响应添加到上下文
+        if full_content:
+            if self._context_manager:
+                self._context_manager.add_message("assistant", full_content)
+            self._store_response(payload, full_content)
+        if total_tokens is not None and self._context_manager:
+            self._context_manager.process_token_excess(total_tokens)
+        # 完成一次流式的回调
+        for callback in self._stream_finish_callback:
+            callback("assistant", full_content)
+
+    def _request_headers(self) -> Dict[str, str]:
+        """与SDK一致的鉴权请求头"""
+        headers = dict(self._client.auth_headers)
+        headers["Accept"] = "text/event-stream"
+        return headers
+
+    def _status_error(self, response: httpx.Response) -> APIStatusError:
+        """将错误状态码转换为SDK的异常类型"""
+        message = f"Error code: {response.status_code}, with error text {response.text.strip()}"
+        error_type = self.STATUS_ERRORS.get(response.status_code, APIStatusError)
+        return error_type(message=message, response=response)
+
+    def _transport_error(self, error: httpx.HTTPError, url: str) -> ZhipuAIError:
+        """将httpx异常转换为SDK同步调用抛出的异常类型
+
+        超时为APITimeoutError,错误状态码按STATUS_ERRORS转换,其余网络错误为APIConnectionError
+        """
+        if isinstance(error, httpx.HTTPStatusError):
+            return self._status_error(error.response)
+        try:
+            request = error.request
+        except RuntimeError:
+            request = httpx.Request("POST", url)
+        if isinstance(error, httpx.TimeoutException):
+            return APITimeoutError(request=request)
+        return APIConnectionError(request=request)
+
+    async def aclose(self):
+        """在协程中归还共享客户端,同 close"""
+        self.close()
+
+    def get_stream_stats(self) -> Dict[str, float]:
+        """上一次流式响应的片段合并统计,见 StreamCoalescer.stats"""
+        return dict(self._stream_stats)
 
     def stop_stream(self):
         """停止流式响应"""
@@ -272,9 +504,7 @@ class ZhipuAIProvider(LLMProviderBase):
     def token_count(self, text: str) -> int:
         """计算文本的token数量（估算）"""
         # 简单估算：英文1token≈4字符，中文1token≈2字符
-        ch_count = sum(1 for c in text if '\u4e00' <= c <= '\u9fff')
-        en_count = len(text) - ch_count
-        return int(en_count / 4 + ch_count / 2)
+        return self._tokenizer.count(text)
     
     def is_available(self) -> bool:
         """连通性测试"""
@@ -289,7 +519,7 @@ class ZhipuAIProvider(LLMProviderBase):
             test_params.set_message([{"role": "user", "content": "ping"}])
             test_params.max_tokens = 1
             
-            self._client.chat.completions.create(**test_params.payload())
+            self._client.chat.completions.create(**self._create_payload(test_params))
             return True
         except:
             return False
@@ -0,0 +1,162 @@
+"""
+会话节点上下文的惰性缓存
+加载对话树时不再为每个节点创建Message,首次访问节点时才创建并从存储中恢复。
+常驻内存的上下文数量有上限,超出时把最久未访问的上下文写回存储后释放。
+只在绑定了持久化存储时淘汰(否则写回只是把快照移到另一个内存字典),
+仍被使用的上下文(如LLMCombo当前持有的上下文)不淘汰,避免同一会话出现两个Message。
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from ..api.llm.model import Message
+
+logger = logging.getLogger("ContextCache")
+logger.addHandler(logging.NullHandler())
+
+class ContextCache:
+    """按LRU管理常驻内存的节点上下文
+
+    Attributes:
+        capacity: 常驻内存的上下文数量上限
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[int], Message],
+        loader: Optional[Callable[[int], Optional[Dict[str, Any]]]] = None,
+        saver: Optional[Callable[[int, Message], None]] = None,
+        capacity: int = 16,
+        persistent: Optional[Callable[[], bool]] = None,
+        in_use: Optional[Callable[[int, Message], bool]] = None
+    ):
+        """
+        Args:
+            factory: 以会话ID创建空上下文的函数
+            loader: 以会话ID读取上下文快照的函数,快照格式见 Message.snapshot
+            saver: 把上下文写回存储的函数
+            capacity: 常驻内存的上下文数量上限
+            persistent: 返回saver是否写入持久化存储,返回False时超出容量也不淘汰;为None时总是淘汰
+            in_use: 判断上下文是否仍被其他对象使用,使用中的上下文不淘汰
+        """
+        if capacity < 1:
+            raise ValueError("capacity 必须大于0")
+        self.capacity = capacity
+        self._factory = factory
+        self._loader = loader
+        self._saver = saver
+        self._persistent = persistent
+        self._in_use = in_use
+        self._resident: "OrderedDict[int, Message]" = OrderedDict()
+        self._lock = threading.RLock()
+
+        # 统计
+        self._hits = 0
+        self._created = 0
+        self._hydrated = 0
+        self._evicted = 0
+
+    def get(self, session_id: int) -> Message:
+        """取得节点的上下文,不在内存中时创建并从存储恢复"""
+        with self._lock:
+            message = self._resident.get(session_id)
+            if message is not None:
+                self._resident.move_to_end(session_id)
+                self._hits += 1
+                return message
+
+            message = self._factory(session_id)
+            self._created += 1
+            snapshot = self._loader(session_id) if self._loader else None
+            if snapshot:
+                message.load_context(**snapshot)
+                self._hydrated += 1
+            self._resident[session_id] = message
+            self._evict_over_capacity()
+            return message
+
+    def put(self, session_id: int, message: Message):
+        """放入已创建的上下文(如派生的分支),替换已有的上下文"""
+        with self._lock:
+            previous = self._resident.pop(session_id, None)
+            if previous is not None and previous is not message:
+                previous.close()
+            self._resident[session_id] = message
+            self._evict_over_capacity()
+
+    def __contains__(self, session_id: int) -> bool:
+        with self._lock:
+            return session_id in self._resident
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._resident)
+
+    def _evictable(self, session_id: int, message: Message) -> bool:
+        """上下文能否释放: 需要已绑定持久化存储且上下文不再被使用"""
+        if self._persistent is not None and not self._persistent():
+            return False
+        return self._in_use is None or not self._in_use(session_id, message)
+
+    def _evict_over_capacity(self):
+        if len(self._resident) <= self.capacity:
+            return
+        if self._persistent is not None and not self._persistent():
+            return
+        # 从最久未访问的上下文开始,跳过仍在使用的上下文;刚访问的上下文不淘汰
+        for session_id in list(self._resident)[:-1]:
+            if len(self._resident) <= self.capacity:
+                break
+            message = self._resident[session_id]
+            if not self._evictable(session_id, message):
+                continue
+            del self._resident[session_id]
+            self._release(session_id, message)
+            self._evicted += 1
+
+    def _release(self, session_id: int, message: Message):
+        """写回存储并关闭上下文"""
+        if self._saver is not None:
+            self._saver(session_id, message)
+        message.close()
+        logger.info(f"上下文已写回存储: {session_id}")
+
+    def evict(self, session_id: int) -> bool:
+        """立即写回并释放指定节点的上下文,未绑定持久化存储或上下文仍在使用时不释放"""
+        with self._lock:
+            message = self._resident.get(session_id)
+            if message is None or not self._evictable(session_id, message):
+                return False
+            del self._resident[session_id]
+            self._release(session_id, message)
+            self._evicted += 1
+            return True
+
+    def flush(self):
+        """把常驻内存的上下文全部写回存储,不释放"""
+        if self._saver is None:
+            return
+        with self._lock:
+            items = list(self._resident.items())
+        for session_id, message in items:
+            self._saver(session_id, message)
+
+    def clear(self):
+        """写回并释放全部上下文"""
+        with self._lock:
+            items = list(self._resident.items())
+            self._resident.clear()
+        for session_id, message in items:
+            self._release(session_id, message)
+
+    def stats(self) -> Dict[str, int]:
+        """返回缓存统计: resident 常驻数量, hits 命中次数, created 创建次数,
+        hydrated 从存储恢复的次数, evicted 写回释放的次数"""
+        with self._lock:
+            return {
+                "resident": len(self._resident),
+                "hits": self._hits,
+                "created": self._created,
+                "hydrated": self._hydrated,
+                "evicted": self._evicted,
+            }
@@ -2,9 +2,10 @@ from typing import Any,Dict
 from .session import SessionNode,SessionTree
 from ..bridge import DataStorageManager
 from ..api.llm import LLMCombo
-from ..api.llm.model import Message
+from ..api.llm.model import Message, get_compression_executor
 from ..api.llm import ProviderGroup
 from .session import GlobalSessionIDAllocator
+from .context_cache import ContextCache
 class ConversationManager:
     """
     对话管理器 - 负责高层业务逻辑和组件集成
@@ -13,9 +14,17 @@ class ConversationManager:
     管理Message中信息的传递方向
     """
     
-    def __init__(self):
+    def __init__(self, max_resident_contexts: int = 16, db=None, user_id: int = 0):
+        """
+        Args:
+            max_resident_contexts: 常驻内存的节点上下文数量
+            db: 应用的core.database.DB实例,传入后聊天记录与上下文写入该数据库
+            user_id: 聊天记录所属用户
+        """
         # 与数据库的桥梁
         self.storage = DataStorageManager()
+        if db is not None:
+            self.storage.set_database(db, user_id=user_id)
 
         # 初始化包含了所有提供者的信息和实例
         provider_data = self.storage.get_all_provider_configs()
@@ -27,8 +36,8 @@ class ConversationManager:
         provider = self.group.create_provider('zhipu')
         self.llm_combo.load_provider(provider)
         
-        # 给流式调用添加存入数据库方法回调
-        self.llm_combo.add_callback(self.storage.save_message)
+        # 给流式调用添加存入数据库方法回调(流结束时以("assistant", 完整内容)调用)
+        self.llm_combo.add_stream_finish_callback(self.storage.save_message)
 
         # 创建session的分配器
         self.allocator = GlobalSessionIDAllocator()
@@ -42,13 +51,20 @@ class ConversationManager:
         # 对话树的实例化在分配器之前
         self.tree = SessionTree(self.allocator)
 
-        # 每个节点关联的消息上下文 {session_id: Message}
-        self.message_contexts: Dict[SessionNode, Message] = {}
+        # 每个节点关联的消息上下文,首次访问时创建并从存储恢复,超出上限时写回存储
+        self.message_contexts = ContextCache(
+            factory=self._create_message_for_node,
+            loader=self.storage.load_message_context,
+            saver=self.storage.save_message_context,
+            capacity=max_resident_contexts,
+            # 未绑定数据库时不淘汰;LLMCombo正在使用的上下文不淘汰
+            persistent=lambda: self.storage.has_database,
+            in_use=lambda session_id, message: self.llm_combo.get_message() is message
+        )
     
     def initialize_new_tree(self, title: str = "主对话") -> SessionNode:
         """初始化全新的对话树"""
         self.tree = SessionTree(root=SessionNode(title=title))
-        self._create_message_for_node(self.tree.root)
         self.storage.save_session_tree(self.tree.to_dict())
         return self.tree.root
     
@@ -58,21 +74,20 @@ class ConversationManager:
         if not tree_data:
             return False
         
+        # 节点的上下文在首次切换到该节点时才创建
+        self.message_contexts.clear()
         self.tree.load_from_dict(tree_data)
         
-        # 确保所有节点都有消息上下文
-        for session_id in self.tree._node_map:
-            if session_id not in self.message_contexts:
-                self._create_message_for_node(self.tree._node_map[session_id])
-        
         # 设置当前节点的上下文
         self._set_current_context()
         return True
     
     def create_child_branch(self, title: str = "新分支") -> SessionNode:
         """创建新的子分支"""
+        parent_context = self.message_contexts.get(self.tree.current_node.session_id)
         child = self.tree.create_child_branch(title)
-        self._create_message_for_node(child)
+        # 分支与父节点共享到目前为止的消息,只保存之后新增的消息
+        self.message_contexts.put(child.session_id, parent_context.fork(child.session_id))
         self.storage.save_session_tree(self.tree.to_dict())
         return child
     
@@ -99,14 +114,14 @@ class ConversationManager:
     
     def chat(self,content: str):
         """发送消息并记录到当前会话"""
-        role: str = "user", 
+        role: str = "user"
         # 获取当前节点的消息上下文
-        current_context = self.message_contexts[self.tree.current_node.session_id]
+        current_context = self.message_contexts.get(self.tree.current_node.session_id)
         
         # 添加到消息历史
         current_context.add_message(role, content)
         
-        # 存储到数据库
+        # 存储到数据库(写后队列,不阻塞调用方)
         self.storage.save_message(role,content)
         # 调用LLM
         response = self.llm_combo.chat()
@@ -128,14 +143,14 @@ class ConversationManager:
             _type_: 是否成功运行
         """        
 
-        role: str = "user", 
+        role: str = "user"
         # 获取当前节点的消息上下文
-        current_context = self.message_contexts[self.tree.current_node.session_id]
+        current_context = self.message_contexts.get(self.tree.current_node.session_id)
         
         # 添加到消息历史
         current_context.add_message(role, content)
         
-        # 存储到数据库
+        # 存储到数据库(写后队列,不阻塞调用方)
         self.storage.save_message(role,content)
         # 调用LLM
         response = self.llm_combo.stream()
@@ -146,24 +161,27 @@ class ConversationManager:
         """获取树结构的可视化表示"""
         return self.tree.to_tree_string()
     
-    def _create_message_for_node(self, node: SessionNode):
-        """为节点创建消息上下文"""
+    def _create_message_for_node(self, session_id: int) -> Message:
+        """为节点创建空的消息上下文"""
         # 这里使用之前设计的Message类
-        self.message_contexts[node.session_id] = Message(
-            session=node.session_id
+        return Message(
+            session=session_id
         )
     
     def _set_current_context(self):
         """设置当前节点的上下文到LLMCombo"""
         session_id = self.tree.current_node.session_id
-        if session_id in self.message_contexts:
-            self.llm_combo.set_message(self.message_contexts[session_id])
+        # 当前会话的压缩任务优先执行
+        get_compression_executor().set_active(session_id)
+        self.llm_combo.set_message(self.message_contexts.get(session_id))
     
     def save_current_state(self):
         """保存当前状态到数据库"""
         # 保存树结构
         self.storage.save_session_tree(self.tree.to_dict())
         
-        # 保存所有消息上下文
-        for session_id, message in self.message_contexts.items():
-            self.storage.save_message_context(session_id, message)
\ No newline at end of file
+        # 保存常驻内存的消息上下文(已释放的在释放时已写回)
+        self.message_contexts.flush()
+
+        # 确保排队中的聊天记录已写入
+        self.storage.flush_messages()
\ No newline at end of file
@@ -1,3 +1,4 @@
 from .chat_data import DataStorageManager
+from .write_behind import WriteBehindQueue
 
-__all__=["DataStorageManager"]
\ No newline at end of file
+__all__=["DataStorageManager","WriteBehindQueue"]
\ No newline at end of file
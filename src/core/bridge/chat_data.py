@@ -4,14 +4,27 @@
 只需要向这个类索要和存储数据就足够了
 通过单例模式可以让任何上下文管理器仅使用同一个数据操作对象,
 """
+import logging
 import threading
-from typing import Dict, Any, List, Callable, Optional
+import weakref
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Callable, Optional, Tuple
+from .write_behind import WriteBehindQueue
+from ..api.llm.model import Segment
+from ..database.session import SessionContextOperator  # 导入即注册session_context表
+from ..database.branch import SessionSegmentOperator  # 导入即注册session_segment表
+
+logger = logging.getLogger("DataStorageManager")
 
 class DataStorageManager:
     """统一的数据存储管理器"""
     
     _instance = None  # 单例实例
     _lock = threading.Lock()  # 线程安全锁
+    # 绑定数据库前最多暂存的聊天记录数,超出时丢弃最早的记录
+    MAX_PENDING_MESSAGES = 1024
+    # 未绑定数据库时最多在内存中保存的上下文快照数,超出时丢弃最久未保存的快照
+    MAX_CONTEXT_SNAPSHOTS = 64
     
     def __new__(cls):
         """单例模式实现"""
@@ -24,6 +37,66 @@ class DataStorageManager:
     def _initialize(self):
         """初始化管理器状态"""
         self.storage_handlers: Dict[str, Callable] = {}
+        self._db = None
+        self._user_id: int = 0
+        # 聊天记录写后队列,绑定数据库后创建
+        self._message_queue: Optional[WriteBehindQueue] = None
+        # 绑定数据库前保存的聊天记录,绑定后写入
+        self._pending_messages: "deque[Tuple[str, str]]" = deque(maxlen=self.MAX_PENDING_MESSAGES)
+        self._dropped_messages = 0
+        # 未绑定数据库时,会话上下文快照保存在内存中
+        self._context_snapshots: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        # 已加载的消息段,多个分支恢复时共用同一个对象
+        self._segments: "weakref.WeakValueDictionary[str, Segment]" = weakref.WeakValueDictionary()
+        # 已写入数据库的消息段标识,消息段不可变,只需写入一次
+        self._saved_segments: set = set()
+
+    def set_database(
+        self,
+        db,
+        user_id: int = 0,
+        batch_size: int = 64,
+        flush_interval: float = 0.2,
+        max_queue: int = 1024
+    ):
+        """绑定数据库,之后的聊天记录经写后队列批量写入context表
+
+        Args:
+            db: core.database.DB实例
+            user_id: 记录所属用户
+            batch_size: 单个写入事务的最大记录数
+            flush_interval: 记录最长等待写入的秒数
+            max_queue: 队列容量,写入跟不上时save_message阻塞
+        """
+        # 旧队列关闭时仍未写入的记录转入新数据库
+        unwritten = self._message_queue.close() if self._message_queue is not None else []
+        self._db = db
+        self._saved_segments = set()
+        self._user_id = user_id
+
+        def write_records(records: List[Dict]):
+            # 多条add_chat_record合并为一次batch_insert事务
+            with db.write_dao('context') as dao:
+                dao.context.batch_insert(records)
+
+        self._message_queue = WriteBehindQueue(
+            write_records,
+            max_queue=max_queue,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            name="chat-message-writer"
+        )
+        for record in unwritten:
+            self._message_queue.put(record)
+        pending = list(self._pending_messages)
+        self._pending_messages.clear()
+        for role, content in pending:
+            self._enqueue_message(role, content)
+
+    @property
+    def has_database(self) -> bool:
+        """是否已绑定数据库;未绑定时上下文快照只保存在内存中"""
+        return self._db is not None
 
     def get_context_data(self,session:str,max_tokes:int):
         """
@@ -79,10 +152,118 @@ class DataStorageManager:
         """获取最新的session的id"""
         pass
 
-    def save_message(self,**kwrage):
-        """存储对话信息到数据库中"""
-        print(kwrage)
-        pass
+    def save_message(self, role: str, content: str):
+        """存储对话信息到数据库中
+
+        只把记录放入写后队列,立即返回,不阻塞调用方(UI/流式线程);
+        尚未绑定数据库时记录暂存在内存中,绑定后写入。暂存的记录超过
+        MAX_PENDING_MESSAGES条时丢弃最早的记录并记录日志
+        """
+        if self._message_queue is None:
+            if not self._pending_messages:
+                logger.warning("尚未绑定数据库,聊天记录暂存在内存中")
+            elif len(self._pending_messages) == self._pending_messages.maxlen:
+                self._dropped_messages += 1
+                if self._dropped_messages == 1:
+                    logger.error(f"尚未绑定数据库,暂存的聊天记录超过{self.MAX_PENDING_MESSAGES}条,开始丢弃最早的记录")
+            self._pending_messages.append((role, content))
+            return
+        self._enqueue_message(role, content)
+
+    def _enqueue_message(self, role: str, content: str):
+        self._message_queue.put({
+            'user_id': self._user_id,
+            'content': content,
+            # context表的角色只区分user/ai
+            'role': 'user' if role == 'user' else 'ai',
+        })
+
+    def flush_messages(self, timeout: Optional[float] = None) -> bool:
+        """立即写入所有排队中的聊天记录"""
+        if self._message_queue is None:
+            return True
+        return self._message_queue.flush(timeout)
+
+    def get_message_queue_metrics(self) -> Dict[str, Any]:
+        """聊天记录写后队列的指标（队列深度、写入延迟等）"""
+        if self._message_queue is None:
+            return {}
+        return self._message_queue.metrics()
+
+    def close(self) -> List[Dict[str, Any]]:
+        """关闭写后队列,返回前写入排队中的全部记录
+
+        Returns:
+            list: 重试后仍未能写入的记录,全部写入时为空列表
+        """
+        if self._message_queue is None:
+            return []
+        unwritten = self._message_queue.close()
+        self._message_queue = None
+        if unwritten:
+            logger.error(f"关闭时仍有{len(unwritten)}条聊天记录未能写入数据库")
+        return unwritten
+
+    def save_message_context(self, session_id: int, message) -> None:
+        """保存节点的上下文快照,见 Message.snapshot
+
+        共享前缀按消息段保存,每段只写入一次,快照中只记录所引用的消息段
+        """
+        snapshot = message.snapshot()
+        if self._db is None:
+            self._context_snapshots[session_id] = snapshot
+            self._context_snapshots.move_to_end(session_id)
+            if len(self._context_snapshots) > self.MAX_CONTEXT_SNAPSHOTS:
+                dropped, _ = self._context_snapshots.popitem(last=False)
+                logger.warning(f"尚未绑定数据库,内存中的上下文快照超过{self.MAX_CONTEXT_SNAPSHOTS}个,丢弃会话{dropped}的快照")
+            return
+        base: Optional[Segment] = snapshot.pop("base", None)
+        snapshot["base"] = base.segment_id if base is not None else None
+        with self._db.write_dao(['session_segment', 'session_context']) as dao:
+            if base is not None:
+                for segment in base.chain():
+                    if segment.segment_id in self._saved_segments:
+                        continue
+                    parent = segment.parent
+                    dao.session_segment.save_segment(
+                        segment.segment_id,
+                        parent.segment_id if parent else None,
+                        segment.tokens - (parent.tokens if parent else 0),
+                        list(segment.messages)
+                    )
+            dao.session_context.save_snapshot(session_id, snapshot, self._user_id)
+        if base is not None:
+            self._saved_segments.update(segment.segment_id for segment in base.chain())
+
+    def load_message_context(self, session_id: int) -> Optional[Dict[str, Any]]:
+        """读取节点的上下文快照,可作为 Message.load_context 的关键字参数;不存在时返回None"""
+        if self._db is None:
+            return self._context_snapshots.get(session_id)
+        dao = self._db.get_dao(['session_segment', 'session_context'])
+        snapshot = dao.session_context.get_snapshot(session_id)
+        if snapshot is not None and snapshot.get("base"):
+            snapshot["base"] = self._load_segment(dao.session_segment, snapshot["base"])
+        return snapshot
+
+    def _load_segment(self, operator: SessionSegmentOperator, segment_id: str) -> Segment:
+        """按标识恢复消息段链表,已加载的消息段直接复用"""
+        # 先向上找到第一个已加载的消息段,再由上到下依次创建
+        pending = []
+        parent = None
+        while segment_id is not None:
+            parent = self._segments.get(segment_id)
+            if parent is not None:
+                break
+            row = operator.get_segment(segment_id)
+            if row is None:
+                raise KeyError(f"消息段不存在: {segment_id}")
+            pending.append((segment_id, row))
+            segment_id = row["parent_id"]
+        for segment_id, row in reversed(pending):
+            parent = Segment(row["messages"], parent, row["tokens"], segment_id)
+            self._segments[segment_id] = parent
+            self._saved_segments.add(segment_id)
+        return parent
 
     def load_message(self,session):
         """通过session根节点从数据库中获取所有信息"""
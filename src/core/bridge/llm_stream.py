@@ -0,0 +1,61 @@
+"""
+将异步流式接口接入Kivy
+流式请求运行在共享的后台事件循环中,界面侧通过asynckivy逐块取得响应,
+片段在Kivy主线程中交付,可直接更新控件。
+
+用法:
+    async def show_reply():
+        async for chunk in kivy_stream(provider.astream()):
+            label.text += chunk
+
+    task = asynckivy.start(show_reply())
+    task.cancel()  # 取消界面任务时同时取消事件循环中的请求
+"""
+import asyncgui
+from typing import AsyncIterator, Optional
+from kivy.clock import Clock
+from ..api.llm.event_loop import EventLoopThread, get_event_loop_thread
+
+async def _next_chunk(iterator: AsyncIterator[str]) -> str:
+    return await iterator.__anext__()
+
+async def kivy_stream(
+    stream: AsyncIterator[str],
+    loop_thread: Optional[EventLoopThread] = None
+) -> AsyncIterator[str]:
+    """在asynckivy任务中迭代运行于后台事件循环的异步流
+
+    每次取下一块时向事件循环提交一次,结果经Clock回到主线程,
+    界面处理完当前片段后才取下一块,慢速界面不会堆积片段。
+
+    Args:
+        stream: 异步流,如 provider.astream()
+        loop_thread: 运行流的事件循环线程,默认使用共享实例
+
+    Yields:
+        str: 响应内容片段
+    """
+    loop_thread = loop_thread or get_event_loop_thread()
+    iterator = stream.__aiter__()
+    finished = False
+    try:
+        while True:
+            ev = asyncgui.AsyncEvent()
+            future = loop_thread.submit(_next_chunk(iterator))
+            future.add_done_callback(lambda f, ev=ev: Clock.schedule_once(lambda dt: ev.fire(f)))
+            try:
+                done = (await ev.wait())[0][0]
+            except asyncgui.Cancelled:
+                # 界面任务被取消: 取消事件循环中的请求任务,取消会同时结束流
+                finished = future.cancel()
+                raise
+            try:
+                chunk = done.result()
+            except StopAsyncIteration:
+                finished = True
+                return
+            yield chunk
+    finally:
+        if not finished:
+            # 提前退出迭代时关闭流,释放连接
+            loop_thread.submit(iterator.aclose())
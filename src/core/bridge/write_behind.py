@@ -0,0 +1,253 @@
+"""
+写后(write-behind)持久化队列
+调用方线程只负责把记录放入有界队列,后台写线程把多条记录合并为一次批量写入事务,
+在达到批大小或时间阈值时落盘。写入失败的记录保留在缓冲区中,间隔retry_interval秒后重试;
+close()在返回前写入队列中的全部记录,最后一次写入仍失败的记录由close()交还调用方
+"""
+import logging
+import threading
+import time
+from queue import Queue, Empty
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("WriteBehindQueue")
+logger.addHandler(logging.NullHandler())
+
+# 队列控制信号
+_STOP = object()
+
+class _FlushRequest:
+    """请求后台线程立即写入缓冲区,并在完成后通知调用方"""
+    __slots__ = ("event", "ok")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.ok = False
+
+class WriteBehindQueue:
+    """有界写后队列
+
+    Attributes:
+        writer: 批量写入函数,接收记录列表,在后台线程中调用
+        batch_size: 缓冲记录达到该数量时立即写入
+        flush_interval: 缓冲区中最早的记录等待超过该秒数时写入
+        retry_interval: 写入失败后等待重试的秒数
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[List[Dict[str, Any]]], Any],
+        max_queue: int = 1024,
+        batch_size: int = 64,
+        flush_interval: float = 0.2,
+        retry_interval: float = 1.0,
+        name: str = "write-behind"
+    ):
+        """
+        初始化并启动后台写线程
+
+        Args:
+            writer: 批量写入函数,例如包装`Context.batch_insert`的事务
+            max_queue: 队列容量,队列满时`put`阻塞调用方(背压)
+            batch_size: 单次写入的最大记录数
+            flush_interval: 时间阈值(秒)
+            retry_interval: 写入失败后重试的间隔(秒)。失败的记录积压到max_queue条时
+                后台线程暂停从队列取记录,队列满后put阻塞调用方
+            name: 后台线程名称
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size必须大于0")
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+
+        self._queue: Queue = Queue(maxsize=max_queue)
+        self._max_buffer = max(max_queue, batch_size)
+        self._closed = False
+        # 关闭标志与正在放入的记录数在同一把锁下维护,close()等待放入完成后才发送停止信号
+        self._close_lock = threading.Condition(threading.Lock())
+        self._putting = 0
+        # close()时最后一次写入仍失败的记录
+        self._unwritten: List[Dict[str, Any]] = []
+
+        # 指标
+        self._metrics_lock = threading.Lock()
+        self._enqueued = 0
+        self._flushed = 0
+        self._failed = 0
+        self._batches = 0
+        self._max_depth = 0
+        self._last_latency = 0.0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _enqueue(self, item: Any, block: bool = True, timeout: Optional[float] = None):
+        """在关闭前放入队列;检查关闭标志与放入之间不会插入停止信号
+
+        Raises:
+            RuntimeError: 队列已关闭
+        """
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("写后队列已关闭")
+            self._putting += 1
+        try:
+            # 队列满时在锁外阻塞,close()设置关闭标志后后台线程继续取出记录
+            self._queue.put(item, block, timeout)
+        finally:
+            with self._close_lock:
+                self._putting -= 1
+                if not self._putting:
+                    self._close_lock.notify_all()
+
+    def put(self, record: Dict[str, Any], block: bool = True, timeout: Optional[float] = None):
+        """放入一条待写入记录
+
+        Raises:
+            RuntimeError: 队列已关闭
+            queue.Full: 非阻塞模式或超时后队列仍满
+        """
+        self._enqueue(record, block, timeout)
+        depth = self._queue.qsize()
+        with self._metrics_lock:
+            self._enqueued += 1
+            if depth > self._max_depth:
+                self._max_depth = depth
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """立即写入此前放入的全部记录
+
+        Returns:
+            bool: 在超时前写入成功返回True;写入失败时记录留待重试,返回False
+        """
+        request = _FlushRequest()
+        try:
+            self._enqueue(request)
+        except RuntimeError:
+            return not self._thread.is_alive() and not self._unwritten
+        return request.event.wait(timeout) and request.ok
+
+    def close(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """停止接收新记录,写入队列中剩余的全部记录后结束后台线程
+
+        Returns:
+            list: 最后一次写入仍失败的记录,由调用方另行保存;全部写入时为空列表
+        """
+        with self._close_lock:
+            if self._closed:
+                return self._unwritten
+            self._closed = True
+            # 已通过关闭检查的记录先放入队列,保证排在停止信号之前
+            while self._putting:
+                self._close_lock.wait()
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        return self._unwritten
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def metrics(self) -> Dict[str, Any]:
+        """返回队列指标
+
+        Returns:
+            dict: queue_depth(当前队列深度), max_queue_depth(历史最大深度),
+                enqueued/flushed(记录数), failed(写入失败的记录次数,失败的记录会重试),
+                unwritten(关闭时仍未写入的记录数), batches(写入批次数),
+                last/avg/max_flush_latency(单批写入耗时,秒)
+        """
+        with self._metrics_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_depth,
+                "enqueued": self._enqueued,
+                "flushed": self._flushed,
+                "failed": self._failed,
+                "unwritten": len(self._unwritten),
+                "batches": self._batches,
+                "last_flush_latency": self._last_latency,
+                "avg_flush_latency": self._total_latency / self._batches if self._batches else 0.0,
+                "max_flush_latency": self._max_latency,
+            }
+
+    def _run(self):
+        """后台写线程: 缓冲为空时阻塞等待,有缓冲时最多等待到时间阈值(写入失败后为重试时间)"""
+        buffer: List[Dict[str, Any]] = []
+        deadline = 0.0
+        retry_at = 0.0
+        while True:
+            now = time.monotonic()
+            if len(buffer) >= self._max_buffer and not self._closed:
+                # 失败的记录积压过多: 暂停取新记录,等待重试
+                time.sleep(max(0.0, retry_at - now))
+                item = None
+            else:
+                try:
+                    if buffer:
+                        # 缓冲已满一批时只需等到重试时间,否则还要等到时间阈值
+                        wake = retry_at if len(buffer) >= self.batch_size else max(deadline, retry_at)
+                        item = self._queue.get(timeout=max(0.0, wake - now))
+                    else:
+                        item = self._queue.get()
+                except Empty:
+                    item = None
+
+            if item is _STOP:
+                self._unwritten = self._write_all(buffer)
+                return
+            if isinstance(item, _FlushRequest):
+                buffer = self._write_all(buffer)
+                if buffer:
+                    retry_at = time.monotonic() + self.retry_interval
+                item.ok = not buffer
+                item.event.set()
+                continue
+            if item is not None:
+                if not buffer:
+                    deadline = time.monotonic() + self.flush_interval
+                buffer.append(item)
+
+            now = time.monotonic()
+            if buffer and now >= retry_at and (len(buffer) >= self.batch_size or now >= deadline):
+                buffer = self._write_all(buffer)
+                if buffer:
+                    retry_at = time.monotonic() + self.retry_interval
+
+    def _write_all(self, buffer: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """按batch_size分批写入缓冲区,遇到失败即停止,返回未写入的记录"""
+        while buffer:
+            if not self._write(buffer[:self.batch_size]):
+                return buffer
+            buffer = buffer[self.batch_size:]
+        return buffer
+
+    def _write(self, batch: List[Dict[str, Any]]) -> bool:
+        """在一次调用中写入整批记录并更新指标
+
+        Returns:
+            bool: 写入成功(或没有记录)返回True,失败时记录由调用方保留
+        """
+        if not batch:
+            return True
+        start = time.perf_counter()
+        try:
+            self.writer(batch)
+        except Exception as e:
+            logger.error(f"批量写入失败, {len(batch)}条记录等待重试: {e}")
+            with self._metrics_lock:
+                self._failed += len(batch)
+            return False
+        latency = time.perf_counter() - start
+        with self._metrics_lock:
+            self._flushed += len(batch)
+            self._batches += 1
+            self._last_latency = latency
+            self._total_latency += latency
+            if latency > self._max_latency:
+                self._max_latency = latency
+        return True
@@ -1,5 +1,6 @@
 from .db import DB
 from .dao import DAO
 from .user import UserOperator
+from .migration import MigrationRunner
 
-__all__=["DB","DAO","UserOperator"]
\ No newline at end of file
+__all__=["DB","DAO","UserOperator","MigrationRunner"]
\ No newline at end of file
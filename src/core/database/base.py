@@ -2,12 +2,24 @@
 作为数据库表操作类的父类,提供基础的操作方法 
 """
 import sqlite3
-from typing import Optional,Union,List
+import threading
+from typing import Optional,Union,List,Dict,Tuple,Literal,Iterator
 import re
 from typing import Protocol, runtime_checkable
 
+# select返回行的模式: dict为字典列表, row为连接row_factory产生的原始行(sqlite3.Row/tuple)
+RowMode = Literal["dict", "row"]
+
 class BaseTableOperator():
 
+    # SQL语句缓存上限,CRUD辅助方法的语句形状有限,超出时整体清空即可
+    STATEMENT_CACHE_SIZE: int = 512
+
+    # SQL语句缓存: (表名, 操作, 列元组, 子句...) -> SQL字符串
+    # 相同的键总是生成完全相同的SQL字符串,从而命中sqlite3连接内部的预编译语句缓存
+    _statement_cache: Dict[tuple, str] = {}
+    _statement_lock = threading.Lock()
+
     def __init__(self, conn: sqlite3.Connection, table_name: str):
         """初始化数据库操作对象，绑定连接与目标表。
 
@@ -229,12 +241,8 @@ class BaseTableOperator():
         if 'id' in data:
             del data['id']  # 避免手动指定主键导致冲突
         
-        # 动态构建插入语句的列名和占位符
-        columns = ', '.join(data.keys())  # 例: "name, email, age"
-        placeholders = ', '.join(['?'] * len(data))  # 例: "?, ?, ?"
-        
-        # 组合完整SQL语句（关键：分离用户输入与SQL结构）
-        sql = f"INSERT INTO {self._table_name} ({columns}) VALUES ({placeholders})"
+        # 从缓存获取插入语句（键为列名元组）
+        sql = self._statement("insert", tuple(data.keys()))
         
         # 执行参数化查询（元组化字典值作为参数）
         cursor = self._execute(sql, tuple(data.values()))
@@ -271,11 +279,8 @@ class BaseTableOperator():
             # 生成SQL: UPDATE table_name SET status=? WHERE id=?
             # 参数: (3, 1001)
         """
-        # 动态生成SET子句（例如：field1=?, field2=?）
-        set_clause = ', '.join([f"{k}=?" for k in update_data.keys()])
-        
-        # 组合完整SQL语句（关键：分离用户输入与SQL结构）
-        sql = f"UPDATE {self._table_name} SET {set_clause} WHERE {where_clause}"
+        # 从缓存获取更新语句（键为更新列元组与条件子句）
+        sql = self._statement("update", tuple(update_data.keys()), where_clause)
         
         # 合并参数：先更新字段值，后条件参数（确保顺序匹配占位符）
         params = tuple(update_data.values()) + where_params
@@ -309,7 +314,7 @@ class BaseTableOperator():
             # 参数: (0, '2025-01-01')
             # 返回: 5 (删除5条记录)
         """
-        sql = f"DELETE FROM {self._table_name} WHERE {where_clause}"
+        sql = self._statement("delete", (), where_clause)
         return self._execute(sql, where_params).rowcount
 
     def select(
@@ -317,11 +322,16 @@ class BaseTableOperator():
         columns: str = "*",
         where_clause: Optional[str] = None,
         where_params: tuple = (),
-        order_by: Optional[str] = None
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        row_mode: RowMode = "dict"
     ) -> list:
         """执行安全的参数化查询，返回结果字典列表。
         
         支持动态列选择、条件过滤和排序，所有用户输入均通过参数化传递。
+        热路径调用方可传入`row_mode="row"`直接获取连接产生的原始行，
+        跳过逐行构造字典的开销（sqlite3.Row同样支持按列名取值）。
 
         Args:
             columns (str): 查询的列名（逗号分隔，默认所有列）。示例："id, name, age"。
@@ -330,9 +340,14 @@ class BaseTableOperator():
             where_params (tuple): WHERE 条件参数值（如 ('books',)）。
             order_by (str | None): ORDER BY 子句（不含关键字），
                 示例："created_at DESC, id ASC"。
+            limit (int | None): 返回的最大行数，以参数形式传递。
+            offset (int | None): 跳过的行数，仅在指定limit时生效。
+            row_mode (str): "dict"返回字典列表（默认）；
+                "row"返回sqlite3.Row/tuple列表，不构造字典。
 
         Returns:
             list[dict]: 查询结果列表，每行转为字典（键为列名，值为数据）。
+                row_mode为"row"时为原始行列表。
 
         Raises:
             sqlite3.OperationalError: 表/列不存在或SQL语法错误
@@ -349,21 +364,134 @@ class BaseTableOperator():
             # 参数: (18, 1)
             # 返回: [{'name':'Alice','email':'alice@test.com'}, ...]
         """
-        # 基础SELECT语句
-        sql = f"SELECT {columns} FROM {self._table_name}"
-        
-        # 动态添加WHERE条件
-        if where_clause:
-            sql += f" WHERE {where_clause}"
-        
-        # 动态添加排序
-        if order_by:
-            sql += f" ORDER BY {order_by}"
+        # 从缓存获取查询语句,LIMIT/OFFSET以参数传递,保证语句形状稳定
+        has_limit = limit is not None
+        has_offset = has_limit and offset is not None
+        sql = self._statement("select", (columns,), where_clause, order_by, has_limit, has_offset)
+        if has_limit:
+            where_params = tuple(where_params) + (limit,)
+            if has_offset:
+                where_params += (offset,)
         
-        # 执行参数化查询并转换结果为字典列表
+        # 执行参数化查询
         cursor = self._execute(sql, where_params)
+        if row_mode == "row":
+            return cursor.fetchall()
+        # 转换结果为字典列表
         return [dict(row) for row in cursor.fetchall()]
     
+    def select_iter(
+        self,
+        columns: str = "*",
+        where_clause: Optional[str] = None,
+        where_params: tuple = (),
+        order_by: Optional[str] = None,
+        batch_size: int = 500,
+        row_mode: RowMode = "dict"
+    ) -> Iterator:
+        """以生成器方式逐批读取查询结果，避免一次性加载全部数据。
+
+        参数与`select`一致，但内部使用`fetchmany(batch_size)`分批拉取，
+        内存占用只与批大小相关。生成器关闭（或被垃圾回收）时自动关闭游标。
+
+        Args:
+            columns (str): 查询的列名（逗号分隔，默认所有列）。
+            where_clause (str | None): WHERE 条件语句（不含 WHERE 关键字）。
+            where_params (tuple): WHERE 条件参数值。
+            order_by (str | None): ORDER BY 子句（不含关键字）。
+            batch_size (int): 每次从游标拉取的行数（默认500）。
+            row_mode (str): "dict"逐行产出字典；"row"产出原始行。
+
+        Yields:
+            dict | sqlite3.Row: 查询结果行。
+
+        Example:
+            >>> for row in db.select_iter(where_clause="user_id=?", where_params=(1,)):
+            ...     process(row)
+
+        Note:
+            游标在迭代期间保持打开，迭代过程中不应在同一连接上提交会修改该表的事务。
+            需要跨越写操作的长时间遍历请使用基于键集分页的接口（如`Context.iter_records_by_user`）。
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size必须大于0")
+        sql = self._statement("select", (columns,), where_clause, order_by, False, False)
+        cursor = self._execute(sql, where_params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if row_mode == "row":
+                    yield from rows
+                else:
+                    for row in rows:
+                        yield dict(row)
+        finally:
+            cursor.close()
+
+    def upsert(
+        self,
+        data: dict,
+        conflict_columns: Tuple[str, ...],
+        set_clause: str,
+        returning: bool = False
+    ) -> Union[int, sqlite3.Row, None]:
+        """单条语句完成"不存在则插入,存在则更新"（INSERT ... ON CONFLICT DO UPDATE）。
+
+        取代"先查询再插入/更新"的两次往返,在并发写入下同样是原子的。
+
+        Args:
+            data (dict): 待插入的字段名与值，'id'键会被移除。
+            conflict_columns (tuple): 冲突目标列，必须对应表上的PRIMARY KEY或UNIQUE约束。
+            set_clause (str): 冲突时执行的SET子句（不含SET关键字），
+                可用`excluded.列名`引用本次插入的值，例如 "count = count + excluded.count"。
+            returning (bool): 为True时附加RETURNING *并返回写入后的整行。
+
+        Returns:
+            int | sqlite3.Row: returning为False时返回受影响行数，否则返回写入后的行。
+
+        Example:
+            >>> db.upsert(
+            ...     {"word_id": 1, "hits": 1},
+            ...     conflict_columns=("word_id",),
+            ...     set_clause="hits = hits + excluded.hits"
+            ... )
+            # SQL: INSERT INTO table_name (word_id, hits) VALUES (?, ?)
+            #      ON CONFLICT(word_id) DO UPDATE SET hits = hits + excluded.hits
+        """
+        data = {k: v for k, v in data.items() if k != 'id'}
+        sql = self._statement("upsert", tuple(data.keys()), tuple(conflict_columns), set_clause, returning)
+        cursor = self._execute(sql, tuple(data.values()))
+        if returning:
+            return cursor.fetchone()
+        return cursor.rowcount
+
+    def batch_upsert(
+        self,
+        data_list: list[dict],
+        conflict_columns: Tuple[str, ...],
+        set_clause: str
+    ) -> int:
+        """批量UPSERT，使用executemany在一次调用中处理所有行。
+
+        所有字典必须具有相同的键（以第一行的键顺序为准）。
+
+        Args:
+            data_list (list[dict]): 待写入的行。
+            conflict_columns (tuple): 冲突目标列。
+            set_clause (str): 冲突时执行的SET子句（不含SET关键字）。
+
+        Returns:
+            int: 受影响的总行数。
+        """
+        if not data_list:
+            return 0
+        columns = tuple(k for k in data_list[0] if k != 'id')
+        sql = self._statement("upsert", columns, tuple(conflict_columns), set_clause, False)
+        params = [tuple(row[col] for col in columns) for row in data_list]
+        return self._execute(sql, params, many=True).rowcount
+
     def batch_insert(self, data_list: list[dict], batch_size: int = 500) -> int:
         """批量插入数据方法，通过事务管理和分批处理优化性能
         
@@ -396,17 +524,16 @@ class BaseTableOperator():
 
         # 1. 预处理数据：移除所有字典中的'id'键并提取列名
         clean_data = []
-        columns = set()
+        columns = {}  # 使用字典保持列的首次出现顺序,保证语句缓存键稳定
         for row in data_list:
             row_copy = row.copy()
             row_copy.pop('id', None)  # 移除可能存在的id键[6](@ref)
             clean_data.append(row_copy)
-            columns.update(row_copy.keys())
+            columns.update(dict.fromkeys(row_copy))
+        columns = tuple(columns)
         
-        # 2. 动态构建SQL（参数化防注入）
-        columns_str = ', '.join(columns)
-        placeholders = ', '.join(['?'] * len(columns))
-        sql = f"INSERT INTO {self._table_name} ({columns_str}) VALUES ({placeholders})"
+        # 2. 从缓存获取SQL（参数化防注入）
+        sql = self._statement("insert", columns)
         
         # 3. 分批处理数据
         total_rows = 0
@@ -426,6 +553,70 @@ class BaseTableOperator():
         
         return total_rows
 
+    def _statement(self, operation: str, columns: Tuple[str, ...] = (), *clauses) -> str:
+        """内部方法：按(操作, 列元组, 子句)获取缓存的SQL字符串。
+
+        CRUD辅助方法不再在每次调用时拼接SQL，而是以语句形状为键缓存生成结果。
+        相同形状的调用总是得到同一个字符串对象，sqlite3据此复用连接内部的
+        预编译语句（见`DB.STATEMENT_CACHE_SIZE`）。
+
+        Args:
+            operation (str): 操作类型，insert/update/delete/select/upsert之一。
+            columns (tuple): insert/update/upsert为列名元组，select为(列表达式,)。
+            *clauses: 影响语句形状的其余部分，
+                update/delete为(where_clause,)，
+                upsert为(冲突列元组, set_clause, returning)，
+                select为(where_clause, order_by, has_limit, has_offset)。
+
+        Returns:
+            str: 含占位符的SQL语句。
+
+        Example:
+            >>> self._statement("update", ("status",), "id=?")
+            'UPDATE users SET status=? WHERE id=?'
+        """
+        key = (self._table_name, operation, columns, *clauses)
+        sql = self._statement_cache.get(key)
+        if sql is not None:
+            return sql
+
+        if operation == "insert":
+            placeholders = ', '.join(['?'] * len(columns))
+            sql = f"INSERT INTO {self._table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+        elif operation == "update":
+            set_clause = ', '.join([f"{k}=?" for k in columns])
+            sql = f"UPDATE {self._table_name} SET {set_clause} WHERE {clauses[0]}"
+        elif operation == "delete":
+            sql = f"DELETE FROM {self._table_name} WHERE {clauses[0]}"
+        elif operation == "upsert":
+            conflict_columns, set_clause, returning = clauses
+            placeholders = ', '.join(['?'] * len(columns))
+            sql = (
+                f"INSERT INTO {self._table_name} ({', '.join(columns)}) VALUES ({placeholders}) "
+                f"ON CONFLICT({', '.join(conflict_columns)}) DO UPDATE SET {set_clause}"
+            )
+            if returning:
+                sql += " RETURNING *"
+        elif operation == "select":
+            where_clause, order_by, has_limit, has_offset = clauses
+            sql = f"SELECT {columns[0]} FROM {self._table_name}"
+            if where_clause:
+                sql += f" WHERE {where_clause}"
+            if order_by:
+                sql += f" ORDER BY {order_by}"
+            if has_limit:
+                sql += " LIMIT ?"
+                if has_offset:
+                    sql += " OFFSET ?"
+        else:
+            raise ValueError(f"未知的语句类型: {operation}")
+
+        with self._statement_lock:
+            if len(self._statement_cache) >= self.STATEMENT_CACHE_SIZE:
+                self._statement_cache.clear()
+            self._statement_cache[key] = sql
+        return sql
+
     def _execute(self, sql: str, params: Union[tuple, List[tuple]],many: bool = False) -> sqlite3.Cursor:
         """内部方法：执行参数化SQL语句并返回游标对象。
         
@@ -1,4 +1,55 @@
 """
 分支,用于实现同一个会话中针对不同话题的分支
+分支共享父对话的消息前缀,前缀按不可变的消息段保存,每段只写入一次,
+各节点的上下文快照只保存分叉后的消息与所引用的消息段
+"""
+import json
+from typing import Any, Dict, List, Optional
+from .base import BaseTableOperator
+from .registry import OperatorRegistry
+
+@OperatorRegistry.register('session_segment')
+class SessionSegmentOperator(BaseTableOperator):
+    def __init__(self, conn):
+        super().__init__(conn, 'session_segment')
+
+    def get_table_definition(self) -> str:
+        table = '''
+                CREATE TABLE IF NOT EXISTS session_segment (
+                    segment_id TEXT PRIMARY KEY,
+                    parent_id TEXT,
+                    tokens INTEGER NOT NULL DEFAULT 0,
+                    messages TEXT NOT NULL,
+                    FOREIGN KEY(parent_id) REFERENCES session_segment(segment_id)
+                )'''
+        return table
+
+    def save_segment(
+        self,
+        segment_id: str,
+        parent_id: Optional[str],
+        tokens: int,
+        messages: List[Dict[str, Any]]
+    ) -> int:
+        """写入消息段,消息段不可变,已存在时忽略"""
+        return self._execute(
+            "INSERT OR IGNORE INTO session_segment (segment_id, parent_id, tokens, messages) VALUES (?, ?, ?, ?)",
+            (segment_id, parent_id, tokens, json.dumps(messages, ensure_ascii=False, separators=(',', ':')))
+        ).rowcount
+
+    def get_segment(self, segment_id: str) -> Optional[Dict[str, Any]]:
+        """读取消息段,不存在时返回None
 
-"""
\ No newline at end of file
+        Returns:
+            dict: parent_id 上一段的标识, tokens 本段token数, messages 本段消息列表
+        """
+        rows = self.select(
+            columns="parent_id, tokens, messages",
+            where_clause="segment_id=?",
+            where_params=(segment_id,),
+            row_mode="row"
+        )
+        if not rows:
+            return None
+        parent_id, tokens, messages = rows[0]
+        return {"parent_id": parent_id, "tokens": tokens, "messages": json.loads(messages)}
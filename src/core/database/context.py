@@ -1,10 +1,10 @@
 """
 对ai上下文进行存储管理的类
 """
-from .base import BaseTableOperator
+from .base import BaseTableOperator, RowMode
 from .registry import OperatorRegistry
 from datetime import datetime
-from typing import Union,Optional,List
+from typing import Union,Optional,List,Tuple,Iterator
 
 @OperatorRegistry.register('context')
 class Context(BaseTableOperator):
@@ -111,10 +111,15 @@ class Context(BaseTableOperator):
         user_id: int,
         scenario_id: Optional[int] = None,
         limit: Optional[int] = None,
-        offset: Optional[int] = None
+        offset: Optional[int] = None,
+        row_mode: RowMode = "dict",
+        before: Optional[Tuple[str, int]] = None
     ) -> List[dict]:
         """
-        获取用户的所有聊天记录（可指定场景）
+        获取用户的所有聊天记录（可指定场景）,按(create_time, id)降序
+        row_mode为"row"时返回sqlite3.Row列表,不构造字典
+        翻页时传入上一页最后一条记录的(create_time, id)作为before,
+        使用键集分页代替OFFSET,翻页开销不随页码增长
         返回列表
         """
         where_clause = "user_id=?"
@@ -123,16 +128,41 @@ class Context(BaseTableOperator):
         if scenario_id is not None:
             where_clause += " AND scenario_id=?"
             where_params += (scenario_id,)
+
+        if before is not None:
+            where_clause += " AND (create_time, id) < (?, ?)"
+            where_params += tuple(before)
             
-        sql = f"SELECT * FROM {self._table_name} WHERE {where_clause} ORDER BY create_time DESC"
-        
-        if limit is not None:
-            sql += f" LIMIT {limit}"
-            if offset is not None:
-                sql += f" OFFSET {offset}"
-                
-        cursor = self._execute(sql, where_params)
-        return [dict(row) for row in cursor.fetchall()]
+        return self.select(
+            where_clause=where_clause,
+            where_params=where_params,
+            order_by="create_time DESC, id DESC",
+            limit=limit,
+            offset=offset,
+            row_mode=row_mode
+        )
+
+    def iter_records_by_user(
+        self,
+        user_id: int,
+        scenario_id: Optional[int] = None,
+        batch_size: int = 500,
+        descending: bool = True,
+        row_mode: RowMode = "dict"
+    ) -> Iterator[dict]:
+        """
+        逐批遍历用户的聊天记录（可指定场景）
+        每批是一次独立的键集分页查询,不持有长时间打开的游标
+        返回生成器
+        """
+        where_clause = "user_id=?"
+        where_params = (user_id,)
+
+        if scenario_id is not None:
+            where_clause += " AND scenario_id=?"
+            where_params += (scenario_id,)
+
+        return self._iter_keyset(where_clause, where_params, batch_size, descending, row_mode)
 
     def get_records_by_time_range(
         self,
@@ -146,29 +176,34 @@ class Context(BaseTableOperator):
         获取指定时间范围内的聊天记录
         返回列表
         """
-        # 转换日期格式
-        if isinstance(start_date, datetime):
-            start_date = start_date.strftime('%Y-%m-%d %H:%M:%S')
-        if isinstance(end_date, datetime):
-            end_date = end_date.strftime('%Y-%m-%d %H:%M:%S')
-            
-        where_clause = "user_id=? AND create_time BETWEEN ? AND ?"
-        where_params = (user_id, start_date, end_date)
-        
-        if scenario_id is not None:
-            where_clause += " AND scenario_id=?"
-            where_params += (scenario_id,)
-            
-        if role is not None:
-            where_clause += " AND role=?"
-            where_params += (role,)
-            
+        where_clause, where_params = self._time_range_clause(
+            user_id, start_date, end_date, scenario_id, role
+        )
         return self.select(
             where_clause=where_clause,
             where_params=where_params,
             order_by="create_time ASC"  # 按时间升序排列
         )
 
+    def iter_records_by_time_range(
+        self,
+        user_id: int,
+        start_date: Union[str, datetime],
+        end_date: Union[str, datetime],
+        scenario_id: Optional[int] = None,
+        role: Optional[str] = None,
+        batch_size: int = 500,
+        row_mode: RowMode = "dict"
+    ) -> Iterator[dict]:
+        """
+        逐批遍历指定时间范围内的聊天记录,按时间升序
+        返回生成器
+        """
+        where_clause, where_params = self._time_range_clause(
+            user_id, start_date, end_date, scenario_id, role
+        )
+        return self._iter_keyset(where_clause, where_params, batch_size, False, row_mode)
+
     def delete_records_by_user(
         self,
         user_id: int,
@@ -231,4 +266,71 @@ class Context(BaseTableOperator):
             where_clause="id=?",
             where_params=(record_id,),
             update_data={'translation_cache': translation_cache}
-        )
\ No newline at end of file
+        )
+
+    # ================= 辅助方法 =================
+
+    def _time_range_clause(
+        self,
+        user_id: int,
+        start_date: Union[str, datetime],
+        end_date: Union[str, datetime],
+        scenario_id: Optional[int] = None,
+        role: Optional[str] = None
+    ) -> Tuple[str, tuple]:
+        """构建时间范围查询的条件语句和参数"""
+        # 转换日期格式
+        if isinstance(start_date, datetime):
+            start_date = start_date.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(end_date, datetime):
+            end_date = end_date.strftime('%Y-%m-%d %H:%M:%S')
+            
+        where_clause = "user_id=? AND create_time BETWEEN ? AND ?"
+        where_params = (user_id, start_date, end_date)
+        
+        if scenario_id is not None:
+            where_clause += " AND scenario_id=?"
+            where_params += (scenario_id,)
+            
+        if role is not None:
+            where_clause += " AND role=?"
+            where_params += (role,)
+        return where_clause, where_params
+
+    def _iter_keyset(
+        self,
+        where_clause: str,
+        where_params: tuple,
+        batch_size: int,
+        descending: bool,
+        row_mode: RowMode
+    ) -> Iterator[dict]:
+        """
+        基于(create_time, id)的键集分页遍历
+        每页以上一页最后一行的键作为起点,查询代价与所处页码无关
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size必须大于0")
+        direction = "DESC" if descending else "ASC"
+        order_by = f"create_time {direction}, id {direction}"
+        keyset_clause = f"{where_clause} AND (create_time, id) {'<' if descending else '>'} (?, ?)"
+
+        last_key: Optional[tuple] = None
+        while True:
+            rows = self.select(
+                where_clause=where_clause if last_key is None else keyset_clause,
+                where_params=where_params if last_key is None else where_params + last_key,
+                order_by=order_by,
+                limit=batch_size,
+                row_mode="row"
+            )
+            if not rows:
+                return
+            if row_mode == "row":
+                yield from rows
+            else:
+                for row in rows:
+                    yield dict(row)
+            if len(rows) < batch_size:
+                return
+            last_key = (rows[-1]['create_time'], rows[-1]['id'])
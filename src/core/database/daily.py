@@ -1,31 +1,105 @@
 
 import json
-from typing import List, Optional, Dict, Union
+from array import array
+from typing import Iterable, List, Optional, Dict, Union
 from datetime import datetime
 from .registry import OperatorRegistry
 from .base import BaseTableOperator
 
-@OperatorRegistry.register('daily')
+def pack_word_ids(word_ids: Optional[Iterable[int]]) -> Optional[bytes]:
+    """单词ID列表打包为int32数组(本机字节序)的BLOB,空列表返回None"""
+    if not word_ids:
+        return None
+    packed = array('i', word_ids)
+    return packed.tobytes() if packed else None
+
+def unpack_word_ids(value: Union[bytes, str, None]) -> List[int]:
+    """从BLOB恢复单词ID列表,兼容迁移前的JSON数组文本"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return []
+    ids = array('i')
+    # 长度不是int32整数倍的BLOB(如旧版本把文本与BLOB拼接的结果)只读取完整的部分
+    ids.frombytes(value[:len(value) - len(value) % ids.itemsize])
+    return ids.tolist()
+
+def pack_legacy_word_lists(conn) -> int:
+    """把迁移前JSON数组文本的word_list就地转换为BLOB,无法解析的文本置为NULL
+
+    Returns:
+        int: 转换的记录数
+    """
+    rows = conn.execute(
+        "SELECT id, word_list FROM daily_study WHERE typeof(word_list) = 'text'"
+    ).fetchall()
+    conn.executemany(
+        "UPDATE daily_study SET word_list=? WHERE id=?",
+        [(pack_word_ids(unpack_word_ids(text)), record_id) for record_id, text in rows]
+    )
+    return len(rows)
+
+@OperatorRegistry.register('daily_study')
 class DailyStudyOperator(BaseTableOperator):
+    # 增量字段: 冲突时在已有值上累加
+    COUNTER_FIELDS = (
+        'question_count', 'correct_count', 'wrong_count',
+        'usage_time', 'review_count', 'new_word_count'
+    )
+
+    # 每日记录以(日期, 学习计划)唯一,冲突时累加计数并追加错误单词
+    # study_plan_id可为NULL,而NULL在UNIQUE约束中互不冲突,
+    # 因此冲突目标使用 IFNULL(study_plan_id, 0) 上的唯一表达式索引
+    CONFLICT_COLUMNS = ('study_date', 'IFNULL(study_plan_id, 0)')
+    DATE_PLAN_INDEX = (
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_daily_study_date_plan "
+        "ON daily_study(study_date, IFNULL(study_plan_id, 0))"
+    )
+
+    # word_list为int32数组的BLOB,追加时直接拼接两段字节,不读出已有的列表
+    # (||的结果为TEXT,按字节拼接后再转换回BLOB)
+    # 迁移前的JSON数组文本无法按字节追加,由DB打开时的迁移转换为BLOB;
+    # 未迁移的连接(migrate=False)在首次累加前由_pack_legacy_word_lists转换,
+    # CASE中的text分支只防止拼接出无效的BLOB,正常情况下不会走到
+    INCREMENT_SET_CLAUSE = ', '.join(
+        [f"{field} = {field} + excluded.{field}" for field in COUNTER_FIELDS]
+    ) + """, word_list = CASE
+                WHEN excluded.word_list IS NULL THEN word_list
+                WHEN word_list IS NULL OR typeof(word_list) = 'text' THEN excluded.word_list
+                ELSE CAST(word_list || excluded.word_list AS BLOB)
+            END"""
+
     def __init__(self, conn):
-        super().__init__(conn, 'daily')
+        super().__init__(conn, 'daily_study')
+        # 本连接上是否已把迁移前的JSON文本word_list转换为BLOB
+        self._legacy_packed = False
 
     def get_table_definition(self) -> str:
         table='''
                 CREATE TABLE IF NOT EXISTS daily_study (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    study_date DATE UNIQUE DEFAULT CURRENT_DATE,
+                    study_date DATE DEFAULT CURRENT_DATE,
                     question_count INTEGER DEFAULT 0,
                     correct_count INTEGER DEFAULT 0,
                     wrong_count INTEGER DEFAULT 0,
-                    word_list TEXT,
+                    word_list BLOB,  -- 错误单词ID, int32数组
                     usage_time INTEGER DEFAULT 0,
                     study_plan_id INTEGER,  -- 新增字段
                     review_count INTEGER DEFAULT 0,  -- 新增字段
                     new_word_count INTEGER DEFAULT 0,  -- 新增字段
+                    UNIQUE (study_date, study_plan_id),  -- 每个计划每天一条记录
                     FOREIGN KEY (study_plan_id) REFERENCES study_plan(id)  -- 添加外键
                 )'''
         return table
+
+    def _create_table(self):
+        """建表并创建(日期, 学习计划)的唯一表达式索引"""
+        super()._create_table()
+        with self._conn:
+            self._conn.execute(self.DATE_PLAN_INDEX)
     
     def create_daily_record(
         self,
@@ -104,14 +178,14 @@ class DailyStudyOperator(BaseTableOperator):
     def get_record_by_date(
         self,
         study_date: Union[str, datetime],
-        study_plan_id: int  # 新增必填参数
+        study_plan_id: Optional[int]  # 新增必填参数, None查询未关联计划的记录
     ) -> Optional[Dict]:
         """通过日期和学习计划ID获取每日学习记录"""
         if isinstance(study_date, datetime):
             study_date = study_date.strftime('%Y-%m-%d')
             
         result = self.select(
-            where_clause="study_date=? AND study_plan_id=?",  # 修改查询条件
+            where_clause="study_date=? AND study_plan_id IS ?",  # 修改查询条件
             where_params=(study_date, study_plan_id)
         )
         return self._process_record(result[0]) if result else None
@@ -162,71 +236,88 @@ class DailyStudyOperator(BaseTableOperator):
             usage_time: 新增使用时间(秒)
         返回更新后的记录
         """
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        # 获取当前记录（带study_plan_id条件）
-        today_record = self.get_record_by_date(today, study_plan_id)
-        
-        # 初始化基础数据
-        update_data = {
-            'study_plan_id': study_plan_id,  # 强制使用当前传入的ID
+        # 单条UPSERT完成"不存在则创建,存在则累加",并直接返回更新后的记录
+        self._pack_legacy_word_lists()
+        row = self.upsert(
+            self._increment_row(
+                study_plan_id, question_count, correct_count, wrong_count,
+                wrong_word_id, usage_time, review_count, new_word_count
+            ),
+            conflict_columns=self.CONFLICT_COLUMNS,
+            set_clause=self.INCREMENT_SET_CLAUSE,
+            returning=True
+        )
+        return self._process_record(dict(row))
+
+    def bulk_increment_stats(self, increments: List[Dict]) -> int:
+        """
+        批量增量更新每日学习统计(executemany一次提交所有增量)
+        参数:
+            increments: 增量列表,每项为increment_today_stats的关键字参数字典,
+                可额外包含study_date(默认今天)
+        返回受影响的行数
+        """
+        rows = []
+        for item in increments:
+            item = dict(item)
+            study_date = item.pop('study_date', None)
+            rows.append(self._increment_row(study_date=study_date, **item))
+        self._pack_legacy_word_lists()
+        return self.batch_upsert(
+            rows,
+            conflict_columns=self.CONFLICT_COLUMNS,
+            set_clause=self.INCREMENT_SET_CLAUSE
+        )
+
+    # ================= 辅助方法 =================
+
+    def _pack_legacy_word_lists(self):
+        """累加前把迁移前的JSON文本word_list转换为BLOB,否则追加时旧的单词ID会被新的BLOB替换
+
+        DB打开时的迁移已完成转换,这里只处理migrate=False的连接,每个操作对象只检查一次
+        """
+        if self._legacy_packed:
+            return
+        with self._conn:
+            pack_legacy_word_lists(self._conn)
+        self._legacy_packed = True
+
+    def _increment_row(
+        self,
+        study_plan_id: int,
+        question_count: int = 0,
+        correct_count: int = 0,
+        wrong_count: int = 0,
+        wrong_word_id: Optional[list] = None,
+        usage_time: int = 0,
+        review_count: int = 0,
+        new_word_count: int = 0,
+        study_date: Optional[Union[str, datetime]] = None
+    ) -> Dict:
+        """构建增量UPSERT的行数据(列顺序固定,保证语句缓存命中)"""
+        if study_date is None:
+            study_date = datetime.now().strftime('%Y-%m-%d')
+        elif isinstance(study_date, datetime):
+            study_date = study_date.strftime('%Y-%m-%d')
+        return {
+            'study_date': study_date,
+            'study_plan_id': study_plan_id,
             'question_count': question_count,
             'correct_count': correct_count,
             'wrong_count': wrong_count,
+            'word_list': self._list_to_str(wrong_word_id),
             'usage_time': usage_time,
             'review_count': review_count,
             'new_word_count': new_word_count,
         }
-        word_list = []
-
-        # 合并已有数据
-        if today_record:
-            word_list = today_record['word_list']
-            update_data = {
-                'study_plan_id': study_plan_id,
-                'question_count': today_record['question_count'] + question_count,
-                'correct_count': today_record['correct_count'] + correct_count,
-                'wrong_count': today_record['wrong_count'] + wrong_count,
-                'usage_time': today_record['usage_time'] + usage_time,
-                'review_count': today_record['review_count'] + review_count,
-                'new_word_count': today_record['new_word_count'] + new_word_count,
-            }
-
-        # 处理错误单词
-        if wrong_word_id is not None:
-            word_list.extend(wrong_word_id)
-            update_data['word_list'] = word_list
-
-        # 执行操作
-        if today_record:
-            self.update_record(today_record['id'], **update_data)
-        else:
-            # 确保新建时包含必要字段
-            self.create_daily_record(
-                study_plan_id=study_plan_id,
-                question_count=update_data.get('question_count', 0),
-                correct_count=update_data.get('correct_count', 0),
-                wrong_count=update_data.get('wrong_count', 0),
-                word_list=word_list,
-                usage_time=update_data.get('usage_time', 0),
-                review_count=update_data.get('review_count', 0),
-                new_word_count=update_data.get('new_word_count', 0)
-            )
-
-        return self.get_record_by_date(today, study_plan_id)
-
-    # ================= 辅助方法 =================
     
-    def _list_to_str(self, id_list: Optional[List[int]]) -> Optional[str]:
-        """将ID列表转换为字符串格式"""
-        return json.dumps(id_list) if id_list else None
+    def _list_to_str(self, id_list: Optional[List[int]]) -> Optional[bytes]:
+        """将ID列表转换为存储格式(int32数组BLOB)"""
+        return pack_word_ids(id_list)
 
-    def _str_to_list(self, id_str: Optional[str]) -> List[int]:
-        """将字符串格式的ID列表转换为Python列表"""
-        try:
-            return json.loads(id_str) if id_str else []
-        except json.JSONDecodeError:
-            return []
+    def _str_to_list(self, id_str: Union[bytes, str, None]) -> List[int]:
+        """将存储格式的ID列表转换为Python列表"""
+        return unpack_word_ids(id_str)
 
     def _process_record(self, record: Dict) -> Dict:
         """处理记录字段转换"""
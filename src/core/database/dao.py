@@ -2,7 +2,7 @@ from contextlib import contextmanager
 from .registry import OperatorRegistry
 from .base import BaseTableOperator
 from sqlite3 import Connection
-from typing import Type, TypeVar, Union, Generic
+from typing import Type, TypeVar, Union, Generic, Optional
 
 # 定义泛型类型变量
 T = TypeVar('T', bound='BaseTableOperator')
@@ -15,16 +15,27 @@ class DAO(Generic[T]):
     ):
         self._conn = conn
         self._allowed_tables = [allowed_tables] if isinstance(allowed_tables, str) else allowed_tables
+        # 连接未在注册中心登记时,操作对象缓存在DAO上,不会使连接常驻内存
+        self._operators: dict = {}
+        self._generation = OperatorRegistry._generation
 
     def __getattr__(self, table_name: str) -> T:
         if table_name not in self._allowed_tables:
             raise AttributeError(f"模块无权访问表 {table_name}")
             
-        operator_cls = OperatorRegistry.get(table_name)
-        if operator_cls is None:
+        # 操作对象按(连接, 表)缓存,避免每次访问都重新构造并查询sqlite_master
+        if self._generation != OperatorRegistry._generation:
+            self._operators.clear()
+            self._generation = OperatorRegistry._generation
+        operator = OperatorRegistry.get_operator(self._conn, table_name, self._operators)
+        if operator is None:
             raise NameError("未注册的操作对象")
             
-        return operator_cls(self._conn)  
+        return operator
+
+    def invalidate(self, table_name: Optional[str] = None):
+        """使当前连接上的操作对象缓存失效（迁移修改表结构后调用）"""
+        OperatorRegistry.invalidate(self._conn, table_name)
 
     @contextmanager
     def transaction(self):
@@ -1,26 +1,53 @@
 import sqlite3
-from typing import Optional
+from contextlib import contextmanager
+from typing import Iterator, Union
 import os
 from .dao import DAO
+from .migration import MigrationRunner
+from .pool import ConnectionPool
 from .registry import OperatorRegistry
 # ================= 数据库管理器 =================
 class DB:
-    def __init__(self, database_path: str):
+    # sqlite3连接内部预编译语句缓存的容量（默认128）
+    # BaseTableOperator的语句缓存保证相同形状的SQL字符串一致,从而命中该缓存
+    STATEMENT_CACHE_SIZE: int = 256
+
+    def __init__(
+        self,
+        database_path: str,
+        cache_size: int = -16000,
+        mmap_size: int = 64 * 1024 * 1024,
+        migrate: bool = True
+    ):
         """
         初始化数据库管理器
         
         Args:
             database_path: SQLite 数据库文件路径
+            cache_size: 每个连接的页缓存(PRAGMA cache_size),负数为KiB
+            mmap_size: 内存映射读取大小(PRAGMA mmap_size),单位字节
+            migrate: 是否在打开时执行未应用的结构迁移。旧版本创建的数据库
+                (如daily_study仍为study_date单列唯一)必须迁移后才能正常写入
         """
         # 确保单例模式只初始化一次
         if hasattr(self, '_database_path'):
             return
             
         self._database_path = database_path
-        self._conn: Optional[sqlite3.Connection] = None
+        # 每个线程独立的读连接 + 串行化的写连接,均启用WAL
+        self._pool = ConnectionPool(
+            database_path,
+            cache_size=cache_size,
+            mmap_size=mmap_size,
+            cached_statements=self.STATEMENT_CACHE_SIZE
+        )
         
         # 检查并创建数据库文件
         self._ensure_database_exists()
+
+        # 在任何读写之前把结构升级到最新版本
+        if migrate:
+            self.migrate()
     
     def _ensure_database_exists(self):
         """确保数据库文件存在，不存在则创建空数据库"""
@@ -52,20 +79,40 @@ class DB:
 
     @property
     def conn(self) -> sqlite3.Connection:
-        if self._conn is None:
-            self._conn = sqlite3.connect(self._database_path)
-            self._conn.row_factory = sqlite3.Row
-        return self._conn
+        """当前线程专属的连接,不同线程(kivy主线程/流式线程/压缩线程)互不共享"""
+        return self._pool.reader
+
+    @property
+    def pool(self) -> ConnectionPool:
+        return self._pool
 
     def get_all_dao(self) -> DAO:
         return DAO(self.conn, OperatorRegistry.list_registered_tables())
     
     def get_dao(self,table_name) -> DAO:
         return DAO(self.conn, table_name)
+
+    @contextmanager
+    def write_dao(self, table_name: Union[str, list[str]]) -> Iterator[DAO]:
+        """获取绑定到串行化写连接的DAO,退出时提交事务
+
+        后台线程的批量写入应使用此接口,避免与其他线程的写事务相互等待锁
+
+        Example:
+            >>> with db.write_dao('context') as dao:
+            ...     dao.context.add_chat_record(...)
+        """
+        with self._pool.write() as conn:
+            yield DAO(conn, table_name)
+    
+    def migrate(self) -> list[int]:
+        """在写连接上执行未应用的结构迁移,返回本次应用的版本号"""
+        with self._pool.write() as conn:
+            return MigrationRunner(conn).run()
     
     def close(self):
-        if self._conn:
-            self._conn.close()
+        # 关闭所有线程的连接并释放其上缓存的操作对象
+        self._pool.close()
 
 
 
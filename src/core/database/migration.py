@@ -0,0 +1,199 @@
+"""
+数据库结构迁移
+表结构由各表操作类的get_table_definition在首次使用时创建,此后的结构变化(索引、约束调整、
+数据格式转换)通过版本化迁移完成。当前结构版本记录在 PRAGMA user_version 中,
+每个迁移在独立事务中执行,成功后版本号随事务一同提交
+"""
+import logging
+from dataclasses import dataclass
+from sqlite3 import Connection
+from typing import Callable, List, Optional, Tuple
+from .registry import OperatorRegistry
+# 导入以完成迁移依赖的表操作类注册
+from . import context, daily, plan, schedule
+from .daily import DailyStudyOperator, pack_legacy_word_lists, pack_word_ids, unpack_word_ids
+
+logger = logging.getLogger("MigrationRunner")
+logger.addHandler(logging.NullHandler())
+
+@dataclass(frozen=True)
+class Migration:
+    """单个结构迁移
+
+    Attributes:
+        version: 迁移完成后的结构版本号,必须严格递增
+        description: 迁移说明
+        tables: 迁移依赖的表,执行前通过OperatorRegistry确保其已创建
+        apply: 在事务内执行迁移的函数
+    """
+    version: int
+    description: str
+    tables: Tuple[str, ...]
+    apply: Callable[[Connection], None]
+
+# 全部迁移,按版本号排序
+MIGRATIONS: List[Migration] = []
+
+def migration(version: int, description: str, tables: Tuple[str, ...] = ()):
+    """装饰器: 注册一个迁移函数
+
+    Example:
+        @migration(3, "为xx表添加索引", tables=("xx",))
+        def _add_xx_index(conn):
+            conn.execute("CREATE INDEX ...")
+    """
+    def decorator(func: Callable[[Connection], None]):
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"迁移版本重复: {version}")
+        MIGRATIONS.append(Migration(version, description, tuple(tables), func))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return decorator
+
+class MigrationRunner:
+    """按版本号顺序执行未应用的迁移
+
+    Example:
+        >>> MigrationRunner(conn).run()
+        [1, 2]
+    """
+
+    def __init__(self, conn: Connection, migrations: Optional[List[Migration]] = None):
+        self._conn = conn
+        self._migrations = MIGRATIONS if migrations is None else sorted(migrations, key=lambda m: m.version)
+
+    @property
+    def current_version(self) -> int:
+        """数据库当前结构版本"""
+        return self._conn.execute("PRAGMA user_version").fetchone()[0]
+
+    @property
+    def latest_version(self) -> int:
+        """已知的最新结构版本"""
+        return self._migrations[-1].version if self._migrations else 0
+
+    def pending(self) -> List[Migration]:
+        """尚未应用的迁移"""
+        current = self.current_version
+        return [m for m in self._migrations if m.version > current]
+
+    def run(self) -> List[int]:
+        """执行全部未应用的迁移
+
+        Returns:
+            list[int]: 本次应用的版本号
+
+        Raises:
+            sqlite3.DatabaseError: 迁移失败,该迁移的事务已回滚,版本号保持不变
+        """
+        applied = []
+        for item in self.pending():
+            # 依赖的表由对应的表操作类创建(构造时校验并建表)
+            for table_name in item.tables:
+                if OperatorRegistry.get_operator(self._conn, table_name) is None:
+                    raise NameError(f"迁移{item.version}依赖未注册的表: {table_name}")
+
+            # 重建表时需先关闭外键检查(事务内设置无效),结束后恢复原状态
+            foreign_keys = self._conn.execute("PRAGMA foreign_keys").fetchone()[0]
+            self._conn.execute("PRAGMA foreign_keys = OFF")
+            self._conn.execute("BEGIN")
+            try:
+                item.apply(self._conn)
+                # user_version写在数据库头中,随事务一同提交或回滚
+                self._conn.execute(f"PRAGMA user_version = {int(item.version)}")
+                self._conn.execute("COMMIT")
+            except:
+                self._conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._conn.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
+            logger.info(f"已应用迁移 {item.version}: {item.description}")
+            applied.append(item.version)
+
+        if applied:
+            # 结构已变化,所有连接上缓存的操作对象重新校验
+            OperatorRegistry.invalidate()
+        return applied
+
+# ================= 迁移定义 =================
+
+@migration(1, "为context、daily_study、plan的热点查询添加索引", tables=("context", "daily_study", "plan"))
+def _add_hot_query_indexes(conn: Connection):
+    # Context.get_records_by_user / iter_records_by_user / get_records_by_time_range
+    # 以 (create_time, id) 排序和键集分页,索引尾部带上id可免去额外排序
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_context_user_time "
+        "ON context(user_id, create_time, id)"
+    )
+    # 指定场景时的同类查询
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_context_user_scenario_time "
+        "ON context(user_id, scenario_id, create_time, id)"
+    )
+    # StudyPlanOperator.get_current_plan / _clear_current_plan
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_plan_user_current "
+        "ON plan(user_id, is_current)"
+    )
+
+@migration(2, "daily_study唯一约束由study_date改为(study_date, study_plan_id)", tables=("daily_study",))
+def _rebuild_daily_study_unique(conn: Connection):
+    # 旧版表定义中 study_date 单列唯一,同一天多个学习计划会冲突,且无法作为UPSERT的冲突目标
+    legacy = False
+    for index in conn.execute("PRAGMA index_list(daily_study)").fetchall():
+        if not index[2]:  # unique
+            continue
+        columns = [row[2] for row in conn.execute(f"PRAGMA index_info({index[1]})").fetchall()]
+        if columns == ["study_date"]:
+            legacy = True
+            break
+
+    if legacy:
+        columns = ", ".join(row[1] for row in conn.execute("PRAGMA table_info(daily_study)").fetchall())
+        conn.execute("ALTER TABLE daily_study RENAME TO daily_study_legacy")
+        conn.execute(OperatorRegistry.get_operator(conn, "daily_study").get_table_definition())
+        conn.execute(f"INSERT INTO daily_study ({columns}) SELECT {columns} FROM daily_study_legacy")
+        conn.execute("DROP TABLE daily_study_legacy")
+    # 新表定义中的 UNIQUE (study_date, study_plan_id) 同时作为按(日期, 计划)查询的索引
+
+@migration(3, "为word_schedule添加按到期时间的索引", tables=("word_schedule",))
+def _add_schedule_due_index(conn: Connection):
+    # WordScheduleOperator.get_due / count_due: 每天开始背诵时按 (计划, 到期时间) 范围扫描,
+    # 结果已按到期时间排序;WITHOUT ROWID表的二级索引自带主键列,count_due只读索引即可完成
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_word_schedule_due "
+        "ON word_schedule(study_plan_id, due)"
+    )
+
+@migration(4, "daily_study.word_list由JSON数组文本改为int32数组BLOB", tables=("daily_study",))
+def _pack_daily_word_list(conn: Connection):
+    # 旧库中列声明仍为TEXT,TEXT亲和性的列不会转换BLOB值,无需重建表
+    pack_legacy_word_lists(conn)
+
+@migration(5, "daily_study按(日期, IFNULL(学习计划, 0))唯一,合并未关联计划的重复记录", tables=("daily_study",))
+def _unique_daily_study_null_plan(conn: Connection):
+    # study_plan_id为NULL的记录在 UNIQUE (study_date, study_plan_id) 中互不冲突,
+    # 旧版本每次累加都会插入新行;建立唯一索引前先把同一天的这些记录合并为一条
+    counters = DailyStudyOperator.COUNTER_FIELDS
+    rows = conn.execute(
+        f"SELECT id, study_date, word_list, {', '.join(counters)} FROM daily_study "
+        "WHERE study_plan_id IS NULL ORDER BY study_date, id"
+    ).fetchall()
+    merged = {}
+    for record_id, study_date, word_list, *values in rows:
+        if study_date not in merged:
+            merged[study_date] = [record_id, unpack_word_ids(word_list), [v or 0 for v in values], []]
+            continue
+        kept = merged[study_date]
+        kept[1].extend(unpack_word_ids(word_list))
+        kept[2] = [a + (b or 0) for a, b in zip(kept[2], values)]
+        kept[3].append(record_id)
+    for record_id, word_ids, values, duplicates in merged.values():
+        if not duplicates:
+            continue
+        conn.execute(
+            f"UPDATE daily_study SET word_list=?, {', '.join(f'{field}=?' for field in counters)} WHERE id=?",
+            (pack_word_ids(word_ids), *values, record_id)
+        )
+        conn.executemany("DELETE FROM daily_study WHERE id=?", [(i,) for i in duplicates])
+    conn.execute(DailyStudyOperator.DATE_PLAN_INDEX)
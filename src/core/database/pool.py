@@ -0,0 +1,161 @@
+"""
+数据库连接池
+sqlite3连接默认不能跨线程使用,而主线程(kivy)、流式响应线程与压缩线程都需要访问数据库
+连接池为每个线程分配独立的读连接,写操作统一经过一个加锁串行化的写连接,
+配合WAL日志模式,读操作不会被正在进行的写事务阻塞
+"""
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from .registry import OperatorRegistry
+
+class ConnectionPool:
+    """按线程分配读连接、串行化写连接的SQLite连接池
+
+    Attributes:
+        database_path (str): 数据库文件路径
+        journal_mode (str): 日志模式,默认WAL
+        synchronous (str): 同步级别,WAL下NORMAL即可保证数据库一致性
+        cache_size (int): 每个连接的页缓存,负数表示KiB
+        mmap_size (int): 内存映射读取的字节数,0表示关闭
+        busy_timeout (float): 等待数据库锁的秒数
+        cached_statements (int): 每个连接的预编译语句缓存容量
+    """
+
+    def __init__(
+        self,
+        database_path: str,
+        journal_mode: str = "WAL",
+        synchronous: str = "NORMAL",
+        cache_size: int = -16000,
+        mmap_size: int = 64 * 1024 * 1024,
+        busy_timeout: float = 5.0,
+        cached_statements: int = 256
+    ):
+        """
+        初始化连接池,连接均在首次使用时创建
+
+        Args:
+            database_path: SQLite 数据库文件路径
+            journal_mode: 日志模式（WAL/DELETE/TRUNCATE等）
+            synchronous: 同步级别（OFF/NORMAL/FULL）
+            cache_size: PRAGMA cache_size,负数为KiB,正数为页数
+            mmap_size: PRAGMA mmap_size,单位字节
+            busy_timeout: 锁等待超时（秒）
+            cached_statements: sqlite3预编译语句缓存容量
+        """
+        self.database_path = database_path
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+
+        self._local = threading.local()
+        # 记录所有读连接及其所属线程,用于回收已结束线程的连接和统一关闭
+        self._readers: List[Tuple[weakref.ref, sqlite3.Connection]] = []
+        self._readers_lock = threading.Lock()
+
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """创建连接并应用PRAGMA配置"""
+        # 连接只在所属线程使用,关闭跨线程统一进行,因此关闭同线程检查
+        conn = sqlite3.connect(
+            self.database_path,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        # 池中的连接在所有DAO之间共享操作对象缓存,关闭时释放
+        OperatorRegistry.track(conn)
+        return conn
+
+    @property
+    def reader(self) -> sqlite3.Connection:
+        """当前线程专属的连接（首次访问时创建）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self._closed:
+                raise sqlite3.ProgrammingError("连接池已关闭")
+            conn = self._connect()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._prune_readers()
+                self._readers.append((weakref.ref(threading.current_thread()), conn))
+        return conn
+
+    @property
+    def writer(self) -> sqlite3.Connection:
+        """共享的写连接,使用前必须持有`write()`提供的锁"""
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    if self._closed:
+                        raise sqlite3.ProgrammingError("连接池已关闭")
+                    self._writer = self._connect()
+        return self._writer
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """串行化写事务
+
+        持有写锁期间独占写连接,正常退出时提交,异常时回滚。
+
+        Example:
+            >>> with pool.write() as conn:
+            ...     conn.execute("INSERT INTO context ...", params)
+        """
+        with self._writer_lock:
+            conn = self.writer
+            try:
+                yield conn
+                conn.commit()
+            except:
+                conn.rollback()
+                raise
+
+    def _prune_readers(self):
+        """关闭所属线程已结束的读连接（调用方需持有_readers_lock）"""
+        alive = []
+        for thread_ref, conn in self._readers:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                alive.append((thread_ref, conn))
+            else:
+                OperatorRegistry.release(conn)
+                conn.close()
+        self._readers = alive
+
+    def stats(self) -> Dict[str, int]:
+        """返回连接池当前状态"""
+        with self._readers_lock:
+            return {
+                "readers": len(self._readers),
+                "writer": int(self._writer is not None)
+            }
+
+    def close(self):
+        """关闭池中所有连接"""
+        self._closed = True
+        with self._readers_lock:
+            for _, conn in self._readers:
+                OperatorRegistry.release(conn)
+                conn.close()
+            self._readers = []
+        with self._writer_lock:
+            if self._writer is not None:
+                OperatorRegistry.release(self._writer)
+                self._writer.close()
+                self._writer = None
+        self._local = threading.local()
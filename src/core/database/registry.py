@@ -1,4 +1,6 @@
-from typing import Union,Dict, Type, TypeVar, Generic, Any,Callable
+import threading
+from sqlite3 import Connection
+from typing import Union,Dict, Type, TypeVar, Generic, Any,Callable,Tuple,Optional
 from .base import BaseTableOperator
 
 # 定义操作类基类型
@@ -13,10 +15,18 @@ class OperatorRegistry:
     Attributes:
         _instance (OperatorRegistry): 单例实例
         _registry (dict): 表名到操作类的映射字典
+        _instances (dict): 连接到其 表名->已校验操作对象 的缓存,只包含通过`track`登记的连接
+        _generation (int): 缓存版本,每次`invalidate`递增,DAO据此丢弃自身缓存的操作对象
     """
     
     _instance = None
     _registry: Dict[str, Type[Any]] = {}  # 显式声明类型
+    # 共享的操作对象缓存,以连接对象本身为键(sqlite3.Connection不支持弱引用)。
+    # 缓存的操作对象持有连接,因此只缓存由连接池/DB登记并在关闭时`release`的连接,
+    # 其他连接的操作对象由DAO自行持有,随DAO一起释放
+    _instances: Dict[Connection, Dict[str, BaseTableOperator]] = {}
+    _instances_lock = threading.Lock()
+    _generation: int = 0
     
     def __new__(cls):
         """单例模式实现：确保全局只有一个注册表实例"""
@@ -60,10 +70,86 @@ class OperatorRegistry:
         """
         return cls._registry.get(table_name, None)
 
+    @classmethod
+    def track(cls, conn: Connection):
+        """登记连接,其上的操作对象在所有DAO之间共享,关闭连接前需调用`release`"""
+        with cls._instances_lock:
+            cls._instances.setdefault(conn, {})
+
+    @classmethod
+    def release(cls, conn: Connection):
+        """取消登记连接并丢弃其缓存的操作对象,在关闭连接前调用"""
+        with cls._instances_lock:
+            cls._instances.pop(conn, None)
+
+    @classmethod
+    def get_operator(
+        cls,
+        conn: Connection,
+        table_name: str,
+        cache: Optional[Dict[str, BaseTableOperator]] = None
+    ) -> Union[BaseTableOperator,None]:
+        """获取绑定到指定连接的表操作对象（带缓存）
+
+        同一连接上的同一张表只会构造一次操作对象,表结构校验(`_tables_exist`)
+        也因此每个连接只执行一次。迁移修改表结构后需调用`invalidate`使缓存失效。
+        通过`track`登记的连接使用共享缓存,其他连接使用调用方传入的cache。
+
+        Args:
+            conn (Connection): 数据库连接
+            table_name (str): 目标表名称
+            cache (dict | None): 未登记的连接使用的缓存,为None时不缓存
+
+        Returns:
+            BaseTableOperator: 缓存的操作对象,表未注册时返回None
+        """
+        operators = cls._instances.get(conn)
+        if operators is None:
+            operators = cache if cache is not None else {}
+        operator = operators.get(table_name)
+        if operator is not None:
+            return operator
+
+        operator_cls = cls._registry.get(table_name, None)
+        if operator_cls is None:
+            return None
+
+        with cls._instances_lock:
+            # 双重检查,避免并发时重复构造
+            operator = operators.get(table_name)
+            if operator is None:
+                operator = operator_cls(conn)
+                operators[table_name] = operator
+        return operator
+
+    @classmethod
+    def invalidate(cls, conn: Optional[Connection] = None, table_name: Optional[str] = None):
+        """使操作对象缓存失效,下次访问时重新构造并校验表结构
+
+        DAO自行持有的缓存按版本号整体失效
+
+        Args:
+            conn (Connection | None): 目标连接,为None时作用于所有连接
+            table_name (str | None): 目标表名,为None时作用于该连接的所有表
+
+        Example:
+            >>> run_migration(conn)
+            >>> OperatorRegistry.invalidate(conn)  # 迁移后重新校验表结构
+        """
+        with cls._instances_lock:
+            cls._generation += 1
+            targets = cls._instances.values() if conn is None else [cls._instances.get(conn, {})]
+            for operators in targets:
+                if table_name is None:
+                    operators.clear()
+                else:
+                    operators.pop(table_name, None)
+
     @classmethod
     def clear(cls):
         """清空注册表（主要用于测试环境）"""
         cls._registry = {}
+        cls.invalidate()
 
     @classmethod
     def list_registered_tables(cls):
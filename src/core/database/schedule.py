@@ -0,0 +1,80 @@
+"""
+单词的间隔重复调度状态
+每个学习计划中每个单词一行,按(学习计划, 到期时间)建立索引(见迁移3),
+每天开始背诵时只需一次范围扫描取出到期的单词
+"""
+from typing import Dict, Iterable, List, Optional
+from .base import BaseTableOperator
+from .registry import OperatorRegistry
+from ..review import ReviewState
+
+@OperatorRegistry.register('word_schedule')
+class WordScheduleOperator(BaseTableOperator):
+    # 状态列,顺序与ReviewState的字段一致
+    STATE_COLUMNS = ', '.join(ReviewState._fields)
+
+    SAVE_SQL = (
+        f"INSERT INTO word_schedule (study_plan_id, {STATE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(study_plan_id, word_id) DO UPDATE SET "
+        + ', '.join(f"{field} = excluded.{field}" for field in ReviewState._fields[1:])
+    )
+
+    def __init__(self, conn):
+        super().__init__(conn, 'word_schedule')
+
+    def get_table_definition(self) -> str:
+        table = '''
+                CREATE TABLE IF NOT EXISTS word_schedule (
+                    study_plan_id INTEGER NOT NULL,
+                    word_id INTEGER NOT NULL,
+                    due INTEGER NOT NULL,  -- 下次复习时间(Unix时间戳)
+                    stability REAL NOT NULL,
+                    difficulty REAL NOT NULL,
+                    reps INTEGER NOT NULL DEFAULT 0,
+                    lapses INTEGER NOT NULL DEFAULT 0,
+                    last_review INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (study_plan_id, word_id),
+                    FOREIGN KEY (study_plan_id) REFERENCES study_plan(id)
+                ) WITHOUT ROWID'''
+        return table
+
+    def get_due(self, study_plan_id: int, until: int, limit: Optional[int] = None) -> List[ReviewState]:
+        """按到期时间顺序取出until之前到期的单词"""
+        rows = self.select(
+            columns=self.STATE_COLUMNS,
+            where_clause="study_plan_id=? AND due<=?",
+            where_params=(study_plan_id, until),
+            order_by="due",
+            limit=limit,
+            row_mode="row"
+        )
+        return [ReviewState._make(row) for row in rows]
+
+    def count_due(self, study_plan_id: int, until: int) -> int:
+        """until之前到期的单词数"""
+        return self.select(
+            columns="COUNT(*)",
+            where_clause="study_plan_id=? AND due<=?",
+            where_params=(study_plan_id, until),
+            row_mode="row"
+        )[0][0]
+
+    def get_states(self, study_plan_id: int, word_ids: Iterable[int]) -> Dict[int, ReviewState]:
+        """取得指定单词的调度状态,没有记录的单词不在结果中"""
+        word_ids = list(word_ids)
+        if not word_ids:
+            return {}
+        rows = self.select(
+            columns=self.STATE_COLUMNS,
+            where_clause=f"study_plan_id=? AND word_id IN ({','.join('?' * len(word_ids))})",
+            where_params=(study_plan_id, *word_ids),
+            row_mode="row"
+        )
+        return {row[0]: ReviewState._make(row) for row in rows}
+
+    def save_states(self, study_plan_id: int, states: Iterable[ReviewState]) -> int:
+        """批量写入调度状态,已存在的单词覆盖原状态"""
+        params = [(study_plan_id, *state) for state in states]
+        if not params:
+            return 0
+        return self._execute(self.SAVE_SQL, params, many=True).rowcount
@@ -1,3 +1,49 @@
 """
 用于记录会话管理,主要实现管理
-"""
\ No newline at end of file
+会话树中每个节点的上下文以快照形式保存,切换到该节点时再取出恢复
+"""
+import json
+from typing import Any, Dict, Optional
+from .base import BaseTableOperator
+from .registry import OperatorRegistry
+
+@OperatorRegistry.register('session_context')
+class SessionContextOperator(BaseTableOperator):
+    def __init__(self, conn):
+        super().__init__(conn, 'session_context')
+
+    def get_table_definition(self) -> str:
+        table = '''
+                CREATE TABLE IF NOT EXISTS session_context (
+                    session_id INTEGER PRIMARY KEY,
+                    user_id INTEGER NOT NULL DEFAULT 0,
+                    data TEXT NOT NULL,
+                    update_time DATETIME DEFAULT CURRENT_TIMESTAMP
+                )'''
+        return table
+
+    def save_snapshot(self, session_id: int, data: Dict[str, Any], user_id: int = 0) -> int:
+        """保存会话上下文快照,已存在则覆盖(单条UPSERT语句)"""
+        return self.upsert(
+            {
+                'session_id': session_id,
+                'user_id': user_id,
+                'data': json.dumps(data, ensure_ascii=False, separators=(',', ':')),
+            },
+            conflict_columns=('session_id',),
+            set_clause="data = excluded.data, user_id = excluded.user_id, update_time = CURRENT_TIMESTAMP"
+        )
+
+    def get_snapshot(self, session_id: int) -> Optional[Dict[str, Any]]:
+        """读取会话上下文快照,不存在时返回None"""
+        rows = self.select(
+            columns="data",
+            where_clause="session_id=?",
+            where_params=(session_id,),
+            row_mode="row"
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def delete_snapshot(self, session_id: int) -> int:
+        """删除会话上下文快照"""
+        return self.delete(where_clause="session_id=?", where_params=(session_id,))
@@ -53,32 +53,34 @@ class SettingsOperator(BaseTableOperator):
 
     def get_all_settings(self, user_id: int) -> Dict[str, Any]:
         """获取指定用户的所有设置项"""
+        # 只取需要的两列并直接使用原始行,省去逐行构造字典
         records = self.select(
+            columns="setting_key, setting_value",
             where_clause="user_id=?",
-            where_params=(user_id,))
-        return {r['setting_key']: r['setting_value'] for r in records}
+            where_params=(user_id,),
+            row_mode="row")
+        return {key: value for key, value in records}
 
     def update_multiple_settings(self, user_id: int, settings: Dict[str, Any]) -> int:
-        """批量更新设置项"""
-        affected = 0
+        """批量更新设置项(单条UPSERT语句通过executemany完成)"""
         with self._conn:
-            for key, value in settings.items():
-                affected += self.set_setting(user_id, key, value)
-        return affected
+            return self.batch_upsert(
+                [
+                    {'user_id': user_id, 'setting_key': key, 'setting_value': value}
+                    for key, value in settings.items()
+                ],
+                conflict_columns=('user_id', 'setting_key'),
+                set_clause="setting_value = excluded.setting_value"
+            )
 
     def set_setting(self, user_id: int, setting_key: str, setting_value: Any) -> int:
-        """简化后的设置方法（已移除类型相关代码）"""
-        existing = self.get_setting_raw(user_id, setting_key)
-        
-        if existing:
-            return self.update(
-                where_clause="user_id=? AND setting_key=?",
-                where_params=(user_id, setting_key),
-                update_data={'setting_value': setting_value}
-            )
-        else:
-            return self.insert({
+        """写入配置项,不存在则插入,存在则覆盖(单条UPSERT语句)"""
+        return self.upsert(
+            {
                 'user_id': user_id,
                 'setting_key': setting_key,
                 'setting_value': setting_value
-            })
+            },
+            conflict_columns=('user_id', 'setting_key'),
+            set_clause="setting_value = excluded.setting_value"
+        )
@@ -1,12 +1,35 @@
+import logging
+import threading
+import time
 from sqlite3 import Connection
-from typing import Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from .base import BaseTableOperator
 from .registry import OperatorRegistry
 
-@OperatorRegistry.register('stats')
+logger = logging.getLogger("WordStatsBuffer")
+
+# 单词统计的全部计数字段
+STAT_FIELDS = (
+    'translate_count', 'use_count', 'listen_count',
+    'see_count', 'correct_count', 'wrong_count'
+)
+
+def stat_field_index(stat_field: str) -> int:
+    """校验统计字段并返回其在STAT_FIELDS中的位置"""
+    try:
+        return STAT_FIELDS.index(stat_field)
+    except ValueError:
+        raise ValueError(f"无效统计字段: {stat_field}")
+
+@OperatorRegistry.register('word_stats')
 class StatsOperator(BaseTableOperator):
+    # 冲突时累加全部计数字段,仅在提供了单词文本时覆盖word
+    BULK_SET_CLAUSE = ', '.join(
+        [f"{field} = {field} + excluded.{field}" for field in STAT_FIELDS]
+    ) + ", word = CASE WHEN excluded.word = '' THEN word ELSE excluded.word END"
+
     def __init__(self, conn:Connection):
-        super().__init__(conn, 'stats')
+        super().__init__(conn, 'word_stats')
 
     def get_table_definition(self) -> str:
         table = '''CREATE TABLE IF NOT EXISTS word_stats (
@@ -25,20 +48,13 @@ class StatsOperator(BaseTableOperator):
     def increment_stat(self, word_id: int, stat_field: str, increment: int = 1) -> int:
         """
         原子操作增加统计计数（支持新增的correct_count/wrong_count）
+        单词记录不存在时自动创建
         """
-        valid_fields = {
-            'translate_count', 'use_count', 'listen_count', 
-            'see_count', 'correct_count', 'wrong_count'
-        }
-        if stat_field not in valid_fields:
-            raise ValueError(f"无效统计字段: {stat_field}")
-
-        update_data = {stat_field: increment}
-        return self.update(
-            where_clause="word_id=?",
-            where_params=(word_id,),
-            update_data=update_data,
-            incremental=True
+        self._validate_field(stat_field)
+        return self.upsert(
+            {'word_id': word_id, 'word': '', stat_field: increment},
+            conflict_columns=('word_id',),
+            set_clause=f"{stat_field} = {stat_field} + excluded.{stat_field}"
         )
 
     def get_word_stats(self, word_id: int) -> dict:
@@ -65,44 +81,50 @@ class StatsOperator(BaseTableOperator):
         插入或更新单词记录（原子操作）
         返回操作后的rowid
         """
-        data = {
-            'word_id': word_id,
-            'word': word
-        }
-        try:
-            return self.insert(data)
-        except sqlite3.IntegrityError:
-            # 已存在则更新word字段
-            self.update(
-                where_clause="word_id=?",
-                where_params=(word_id,),
-                update_data={'word': word}
-            )
-            return word_id
-        # ================= 批量操作方法 =================
+        row = self.upsert(
+            {'word_id': word_id, 'word': word},
+            conflict_columns=('word_id',),
+            set_clause="word = excluded.word",
+            returning=True
+        )
+        return row['id']
+
+    # ================= 批量操作方法 =================
     
-    def bulk_increment_stats(self, increments: List[Tuple[int, str, int]]) -> int:
+    def bulk_increment_stats(
+        self,
+        increments: List[Tuple[int, str, int]],
+        words: Optional[Dict[int, str]] = None
+    ) -> int:
         """
         批量增加统计计数（高性能版本）
+        同一单词的多个增量先在内存中合并,再通过一条覆盖全部计数字段的
+        INSERT ... ON CONFLICT(word_id) DO UPDATE 语句executemany写入,
+        不提交事务,由调用方(如 db.write_dao)决定提交时机
         参数格式：[(word_id, stat_field, increment), ...]
+        words: 可选的 word_id -> 单词文本,用于新建记录
         返回成功更新的记录数
         """
-        # 按字段分组处理
-        field_groups = defaultdict(list)
+        totals: Dict[int, List[int]] = {}
         for word_id, field, inc in increments:
-            if field in {'correct_count', 'wrong_count'}:
-                field_groups[field].append((word_id, inc))
-
-        total = 0
-        for field, data in field_groups.items():
-            sql = f"""
-                UPDATE {self.table_name} 
-                SET {field} = {field} + ?
-                WHERE word_id = ?
-            """
-            params = [(inc, wid) for wid, inc in data]
-            total += self._execute_many(sql, params)
-        return total
+            index = self._validate_field(field)
+            deltas = totals.get(word_id)
+            if deltas is None:
+                deltas = totals[word_id] = [0] * len(STAT_FIELDS)
+            deltas[index] += inc
+        return self._write_totals(totals, words or {})
+
+    def buffer(self, max_pending: int = 4096, flush_interval: float = 5.0) -> 'WordStatsBuffer':
+        """创建写入此表的内存聚合缓冲区
+
+        缓冲区的每次写入在本连接上单独提交;连接只属于当前线程,
+        因此不启动定时写入,需要定时写入时使用 WordStatsBuffer.for_database
+        """
+        def write(totals: Dict[int, List[int]], words: Dict[int, str]) -> int:
+            with self._conn:
+                return self._write_totals(totals, words)
+        return WordStatsBuffer(write, max_pending, flush_interval)
+
     # ================= 辅助方法 =================
     
     def _default_stats(self) -> dict:
@@ -116,13 +138,147 @@ class StatsOperator(BaseTableOperator):
             'wrong_count': 0
         }
 
-    def _execute_many(self, sql: str, params_list: list) -> int:
-        """执行批量SQL"""
+    def _validate_field(self, stat_field: str) -> int:
+        """校验统计字段并返回其在STAT_FIELDS中的位置"""
+        return stat_field_index(stat_field)
+
+    def _write_totals(self, totals: Dict[int, List[int]], words: Dict[int, str]) -> int:
+        """将聚合后的 word_id -> 各字段增量 一次性写入,事务由调用方管理"""
+        if not totals:
+            return 0
+        rows = []
+        for word_id, deltas in totals.items():
+            row = {'word_id': word_id, 'word': words.get(word_id, '')}
+            row.update(zip(STAT_FIELDS, deltas))
+            rows.append(row)
+        return self.batch_upsert(
+            rows,
+            conflict_columns=('word_id',),
+            set_clause=self.BULK_SET_CLAUSE
+        )
+
+class WordStatsBuffer:
+    """单词统计的内存聚合缓冲区
+
+    在内存中累加 (word_id, 字段) -> 增量,待聚合的单词数达到max_pending
+    或距上次写入超过flush_interval秒时,在调用record的线程上一次性写入数据库。
+    start()启动后台定时写入,没有新事件时也每隔flush_interval秒写入一次,
+    此时writer会在后台线程调用,必须可以跨线程使用(见 for_database)。
+
+    Example:
+        >>> buffer = dao.word_stats.buffer()
+        >>> buffer.record(word_id, 'correct_count')
+        >>> buffer.flush()
+
+        >>> buffer = WordStatsBuffer.for_database(db)  # 已启动定时写入
+        >>> buffer.record(word_id, 'correct_count')
+        >>> buffer.close()
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[Dict[int, List[int]], Dict[int, str]], int],
+        max_pending: int = 4096,
+        flush_interval: float = 5.0
+    ):
+        self._writer = writer
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._totals: Dict[int, List[int]] = {}
+        self._words: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.flushed_events = 0
+        self._pending_events = 0
+        self._stop = threading.Event()
+        self._timer: Optional[threading.Thread] = None
+
+    @classmethod
+    def for_database(
+        cls,
+        db,
+        max_pending: int = 4096,
+        flush_interval: float = 5.0
+    ) -> 'WordStatsBuffer':
+        """创建经DB串行化写连接写入的缓冲区,并启动定时写入
+
+        Args:
+            db: core.database.DB实例
+        """
+        def write(totals: Dict[int, List[int]], words: Dict[int, str]) -> int:
+            with db.write_dao('word_stats') as dao:
+                return dao.word_stats._write_totals(totals, words)
+        buffer = cls(write, max_pending, flush_interval)
+        buffer.start()
+        return buffer
+
+    def start(self):
+        """启动后台定时写入"""
+        if self._timer is not None:
+            return
+        self._stop.clear()
+        self._timer = threading.Thread(target=self._run_timer, name="WordStatsBuffer", daemon=True)
+        self._timer.start()
+
+    def _run_timer(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                # 增量已合并回缓冲区,下个周期重试
+                logger.exception("单词统计写入失败")
+
+    def close(self):
+        """停止定时写入并写入剩余的增量"""
+        timer, self._timer = self._timer, None
+        if timer is not None:
+            self._stop.set()
+            timer.join()
+        self.flush()
+
+    def record(self, word_id: int, stat_field: str, increment: int = 1, word: Optional[str] = None):
+        """记录一次单词事件,必要时触发写入"""
+        index = stat_field_index(stat_field)
+        with self._lock:
+            deltas = self._totals.get(word_id)
+            if deltas is None:
+                deltas = self._totals[word_id] = [0] * len(STAT_FIELDS)
+            deltas[index] += increment
+            if word:
+                self._words[word_id] = word
+            self._pending_events += 1
+            due = (len(self._totals) >= self.max_pending or
+                   time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """立即写入所有待聚合的增量,返回写入的单词记录数"""
+        with self._lock:
+            totals, words = self._totals, self._words
+            events = self._pending_events
+            self._totals, self._words = {}, {}
+            self._pending_events = 0
+            self._last_flush = time.monotonic()
+        if not totals:
+            return 0
         try:
-            cursor = self.conn.cursor()
-            cursor.executemany(sql, params_list)
-            return cursor.rowcount
-        except sqlite3.Error as e:
-            self.conn.rollback()
-            raise RuntimeError(f"批量操作失败: {str(e)}")
-        
\ No newline at end of file
+            written = self._writer(totals, words)
+        except Exception:
+            # 写入失败时把增量合并回缓冲区,等待下次写入
+            with self._lock:
+                for word_id, deltas in totals.items():
+                    current = self._totals.setdefault(word_id, [0] * len(STAT_FIELDS))
+                    for index, delta in enumerate(deltas):
+                        current[index] += delta
+                for word_id, word in words.items():
+                    self._words.setdefault(word_id, word)
+                self._pending_events += events
+            raise
+        self.flushed_events += events
+        return written
+
+    @property
+    def pending(self) -> int:
+        """待写入的单词数"""
+        return len(self._totals)
@@ -0,0 +1,3 @@
+from .scheduler import Rating, ReviewScheduler, ReviewSession, ReviewState
+
+__all__=["Rating","ReviewScheduler","ReviewSession","ReviewState"]
@@ -0,0 +1,262 @@
+"""
+间隔重复调度
+按FSRS(Free Spaced Repetition Scheduler)的记忆模型,为每个单词维护 稳定性(stability,
+回忆概率降到90%所需的天数) 与 难度(difficulty,1~10),根据每次回答的评分计算下次复习时间。
+背诵过程中待复习的单词放在内存中的最小堆里,按到期时间依次取出,答错的单词在短时间后重新出现。
+"""
+import heapq
+import math
+import time
+from enum import IntEnum
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+DAY = 86400
+
+# FSRS-4.5 默认参数
+DEFAULT_WEIGHTS = (
+    0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+    0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755
+)
+# 遗忘曲线 R(t) = (1 + FACTOR * t / S) ^ DECAY, t = S 时 R = 0.9
+DECAY = -0.5
+FACTOR = 19 / 81
+
+class Rating(IntEnum):
+    """回答评分"""
+    AGAIN = 1  # 没有想起
+    HARD = 2   # 勉强想起
+    GOOD = 3   # 想起
+    EASY = 4   # 轻松想起
+
+class ReviewState(NamedTuple):
+    """单词的复习状态,字段顺序与 word_schedule 表的列一致
+
+    Attributes:
+        word_id: 单词ID
+        due: 下次复习时间(Unix时间戳,秒)
+        stability: 记忆稳定性(天)
+        difficulty: 难度,1~10
+        reps: 复习次数
+        lapses: 遗忘次数
+        last_review: 上次复习时间(Unix时间戳,秒)
+    """
+    word_id: int
+    due: int
+    stability: float
+    difficulty: float
+    reps: int = 0
+    lapses: int = 0
+    last_review: int = 0
+
+class ReviewScheduler:
+    """根据评分计算单词的下一个复习状态"""
+
+    def __init__(
+        self,
+        retention: float = 0.9,
+        weights: Sequence[float] = DEFAULT_WEIGHTS,
+        relearn_delay: int = 600,
+        maximum_interval: int = 36500
+    ):
+        """
+        Args:
+            retention: 期望的回忆概率,越高复习越频繁
+            weights: FSRS模型参数
+            relearn_delay: 答错后重新学习的间隔(秒)
+            maximum_interval: 最长复习间隔(天)
+        """
+        if not 0 < retention < 1:
+            raise ValueError("retention 必须在0与1之间")
+        if len(weights) != len(DEFAULT_WEIGHTS):
+            raise ValueError(f"weights 需要 {len(DEFAULT_WEIGHTS)} 个参数")
+        self.retention = retention
+        self.weights = tuple(weights)
+        self.relearn_delay = relearn_delay
+        self.maximum_interval = maximum_interval
+        # 稳定性为1天时对应的复习间隔(天)
+        self._interval_factor = (retention ** (1 / DECAY) - 1) / FACTOR
+
+    def review(
+        self,
+        word_id: int,
+        rating: Rating,
+        state: Optional[ReviewState] = None,
+        now: Optional[float] = None
+    ) -> ReviewState:
+        """根据评分计算新的复习状态
+
+        Args:
+            word_id: 单词ID
+            rating: 本次回答的评分
+            state: 当前状态,None表示第一次学习
+            now: 回答时间,默认当前时间
+        """
+        rating = Rating(rating)
+        now = int(time.time() if now is None else now)
+        w = self.weights
+
+        if state is None or state.reps == 0:
+            stability = w[rating - 1]
+            difficulty = self._initial_difficulty(rating)
+            lapses = 0
+        else:
+            elapsed = max(0.0, (now - state.last_review) / DAY)
+            retrievability = self.retrievability(state, now)
+            difficulty = self._next_difficulty(state.difficulty, rating)
+            if rating == Rating.AGAIN:
+                stability = min(state.stability, self._forget_stability(state, retrievability))
+                lapses = state.lapses + 1
+            elif elapsed < 1:
+                # 同一天内的再次复习(如答错后重新学习)不改变稳定性
+                stability = state.stability
+                lapses = state.lapses
+            else:
+                stability = self._recall_stability(state, difficulty, retrievability, rating)
+                lapses = state.lapses
+
+        if rating == Rating.AGAIN:
+            due = now + self.relearn_delay
+        else:
+            due = now + self.interval(stability) * DAY
+        reps = (state.reps if state is not None else 0) + 1
+        return ReviewState(word_id, due, stability, difficulty, reps, lapses, now)
+
+    def retrievability(self, state: ReviewState, now: Optional[float] = None) -> float:
+        """当前时刻的回忆概率"""
+        now = time.time() if now is None else now
+        elapsed = max(0.0, (now - state.last_review) / DAY)
+        return (1 + FACTOR * elapsed / state.stability) ** DECAY
+
+    def interval(self, stability: float) -> int:
+        """稳定性对应的复习间隔(天)"""
+        return max(1, min(self.maximum_interval, round(stability * self._interval_factor)))
+
+    def _initial_difficulty(self, rating: int) -> float:
+        w = self.weights
+        return _clamp(w[4] - w[5] * (rating - 3))
+
+    def _next_difficulty(self, difficulty: float, rating: int) -> float:
+        w = self.weights
+        difficulty = difficulty - w[6] * (rating - 3)
+        # 向"想起"评分的初始难度回归,避免难度只升不降
+        return _clamp(w[7] * self._initial_difficulty(Rating.GOOD) + (1 - w[7]) * difficulty)
+
+    def _recall_stability(self, state: ReviewState, difficulty: float, retrievability: float, rating: int) -> float:
+        w = self.weights
+        hard_penalty = w[15] if rating == Rating.HARD else 1
+        easy_bonus = w[16] if rating == Rating.EASY else 1
+        return state.stability * (
+            1 + math.exp(w[8]) * (11 - difficulty) * state.stability ** -w[9]
+            * (math.exp(w[10] * (1 - retrievability)) - 1) * hard_penalty * easy_bonus
+        )
+
+    def _forget_stability(self, state: ReviewState, retrievability: float) -> float:
+        w = self.weights
+        return (
+            w[11] * state.difficulty ** -w[12] * ((state.stability + 1) ** w[13] - 1)
+            * math.exp(w[14] * (1 - retrievability))
+        )
+
+def _clamp(difficulty: float) -> float:
+    return min(10.0, max(1.0, difficulty))
+
+class ReviewSession:
+    """一次背诵中的复习队列
+
+    待复习的单词按 (到期时间, 单词ID) 放在最小堆中。单词重新入队时旧的堆项不删除,
+    取出时与当前到期时间不一致的堆项直接丢弃(惰性删除)。
+
+    Example:
+        >>> session = ReviewSession(scheduler, dao.word_schedule.get_due(plan_id, now))
+        >>> session.add_new(new_word_ids)
+        >>> word_id = session.pop()
+        >>> session.answer(word_id, Rating.GOOD)
+        >>> dao.word_schedule.save_states(plan_id, session.changes())
+    """
+
+    def __init__(
+        self,
+        scheduler: ReviewScheduler,
+        states: Iterable[ReviewState] = (),
+        learn_ahead: int = 1200
+    ):
+        """
+        Args:
+            scheduler: 计算复习状态的调度器
+            states: 到期的复习状态,通常来自 WordScheduleOperator.get_due
+            learn_ahead: 可以提前取出的时间(秒),队列中没有已到期的单词时,答错后等待重新学习的单词可以提前出现
+        """
+        self.scheduler = scheduler
+        self.learn_ahead = learn_ahead
+        self._states: Dict[int, Optional[ReviewState]] = {}
+        self._queued: Dict[int, int] = {}
+        self._changed: Dict[int, ReviewState] = {}
+        self._heap: List[Tuple[int, int]] = []
+        for state in states:
+            self._states[state.word_id] = state
+            self._queued[state.word_id] = state.due
+            self._heap.append((state.due, state.word_id))
+        heapq.heapify(self._heap)
+
+    def add_new(self, word_ids: Iterable[int], now: Optional[float] = None):
+        """加入新单词,立即到期"""
+        now = int(time.time() if now is None else now)
+        for word_id in word_ids:
+            if word_id in self._states:
+                continue
+            self._states[word_id] = None
+            self._push(word_id, now)
+
+    def _push(self, word_id: int, due: int):
+        self._queued[word_id] = due
+        heapq.heappush(self._heap, (due, word_id))
+
+    def pop(self, now: Optional[float] = None) -> Optional[int]:
+        """取出最早到期的单词,没有在 now + learn_ahead 之前到期的单词时返回None"""
+        now = time.time() if now is None else now
+        heap = self._heap
+        while heap:
+            due, word_id = heap[0]
+            if self._queued.get(word_id) != due:
+                heapq.heappop(heap)
+                continue
+            if due > now + self.learn_ahead:
+                return None
+            heapq.heappop(heap)
+            del self._queued[word_id]
+            return word_id
+        return None
+
+    def answer(self, word_id: int, rating: Rating, now: Optional[float] = None) -> ReviewState:
+        """记录单词的回答,计算新的复习状态;答错的单词在重新学习间隔后回到队列"""
+        now = time.time() if now is None else now
+        state = self.scheduler.review(word_id, rating, self._states.get(word_id), now)
+        self._states[word_id] = state
+        self._changed[word_id] = state
+        if rating == Rating.AGAIN:
+            self._push(word_id, state.due)
+        else:
+            self._queued.pop(word_id, None)
+        return state
+
+    def requeue(self, word_id: int, due: float):
+        """把单词放回队列,在due时到期,不改变复习状态
+
+        用于同一单词在本次背诵中还有未完成的卡片,如新单词依次出现的多种卡片
+        """
+        self._push(word_id, int(due))
+
+    def state(self, word_id: int) -> Optional[ReviewState]:
+        return self._states.get(word_id)
+
+    def changes(self) -> List[ReviewState]:
+        """本次背诵中状态发生变化的单词"""
+        return list(self._changed.values())
+
+    def commit(self):
+        """变化已写入存储后清除记录"""
+        self._changed.clear()
+
+    def __len__(self) -> int:
+        """仍在队列中的单词数"""
+        return len(self._queued)
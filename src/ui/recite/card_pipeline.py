@@ -0,0 +1,161 @@
+"""
+背诵卡片的预取流水线与控件池
+滑动卡片时原先要在回调中同步查询干扰项并构建控件,每次滑动都会卡顿。
+CardPipeline 在后台线程中提前准备队列前若干张卡片的数据(干扰项查询、选项与正确答案),
+CardPool 按卡片类型回收滑出的控件,取用时只需重新绑定数据。
+两者都不依赖Kivy,控件需要提供 recycle(**params) 方法。
+"""
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+class CardPipeline:
+    """按队列顺序预取卡片数据
+
+    接口与原先的卡片队列(deque)一致: append/extend 加入卡片配置,
+    popleft 取出下一张卡片准备好的数据,队列前 lookahead 张卡片始终在后台准备
+
+    Attributes:
+        lookahead: 提前准备的卡片数量
+    """
+
+    def __init__(self, prepare: Callable[[Dict[str, Any]], Dict[str, Any]], lookahead: int = 4):
+        """
+        Args:
+            prepare: 在后台线程中把卡片配置转换为卡片数据的函数
+            lookahead: 提前准备的卡片数量
+        """
+        if lookahead < 1:
+            raise ValueError("lookahead 必须大于0")
+        self.lookahead = lookahead
+        self._prepare = prepare
+        self._waiting: Deque[Dict[str, Any]] = deque()
+        self._prefetched: Deque[Future] = deque()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        # 统计
+        self._taken = 0
+        self._ready = 0
+
+    def _submit(self, config: Dict[str, Any]) -> Future:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="CardPipeline")
+        return self._executor.submit(self._prepare, config)
+
+    def _fill(self):
+        """补足预取的卡片,调用方持有锁"""
+        while len(self._prefetched) < self.lookahead and self._waiting:
+            self._prefetched.append(self._submit(self._waiting.popleft()))
+
+    def append(self, config: Dict[str, Any]):
+        """在队尾加入卡片配置"""
+        with self._lock:
+            self._waiting.append(config)
+            self._fill()
+
+    def extend(self, configs: Iterable[Dict[str, Any]]):
+        """在队尾加入多张卡片配置"""
+        with self._lock:
+            self._waiting.extend(configs)
+            self._fill()
+
+    def popleft(self, refill: bool = True) -> Dict[str, Any]:
+        """取出下一张卡片的数据,尚未准备好时等待后台线程完成
+
+        Args:
+            refill: 是否立即向后台线程提交下一张卡片。提交会唤醒后台线程,
+                它与调用方争用GIL,使这次调用的耗时出现毫秒级的尾部;
+                在滑动回调中可以传False,之后(如下一帧)再调用refill()
+
+        Raises:
+            IndexError: 队列为空
+        """
+        with self._lock:
+            if not self._prefetched:
+                raise IndexError("卡片队列为空")
+            future = self._prefetched.popleft()
+            if refill or not self._prefetched:
+                # 预取的卡片已取完时必须立即提交,否则下一次取卡会一直等待
+                self._fill()
+            self._taken += 1
+            if future.done():
+                self._ready += 1
+        return future.result()
+
+    def refill(self):
+        """补足预取的卡片,与popleft(refill=False)配合使用"""
+        with self._lock:
+            self._fill()
+
+    def clear(self):
+        """清空队列,已提交但未开始的准备任务会被取消"""
+        with self._lock:
+            for future in self._prefetched:
+                future.cancel()
+            self._prefetched.clear()
+            self._waiting.clear()
+
+    def close(self):
+        """清空队列并结束后台线程"""
+        self.clear()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._prefetched) + len(self._waiting)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def stats(self) -> Dict[str, int]:
+        """返回统计: taken 取出的卡片数, ready 取出时已准备好的卡片数"""
+        with self._lock:
+            return {"taken": self._taken, "ready": self._ready}
+
+class CardPool:
+    """按卡片类型回收卡片控件
+
+    Attributes:
+        capacity: 每种卡片类型最多保留的空闲控件数
+    """
+
+    def __init__(self, capacity: int = 2):
+        self.capacity = capacity
+        self._idle: Dict[type, List[Any]] = {}
+
+        # 统计
+        self._created = 0
+        self._reused = 0
+
+    def acquire(self, card_type: type, **params) -> Any:
+        """取得绑定了params的卡片,有空闲控件时复用"""
+        idle = self._idle.get(card_type)
+        if idle:
+            card = idle.pop()
+            card.recycle(**params)
+            self._reused += 1
+            return card
+        self._created += 1
+        return card_type(**params)
+
+    def release(self, card: Any):
+        """回收卡片控件,卡片需已从父控件中移除"""
+        idle = self._idle.setdefault(type(card), [])
+        if len(idle) < self.capacity and card not in idle:
+            idle.append(card)
+
+    def clear(self):
+        self._idle.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """返回统计: idle 空闲控件数, created 新建次数, reused 复用次数"""
+        return {
+            "idle": sum(len(cards) for cards in self._idle.values()),
+            "created": self._created,
+            "reused": self._reused,
+        }
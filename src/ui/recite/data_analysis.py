@@ -1,7 +1,12 @@
+import random
 import sqlite3
+import threading
+from array import array
 from dataclasses import dataclass,fields
-from typing import List, Optional, Dict
+from typing import Iterable, List, Optional, Dict
 from datetime import datetime
+from ...core.database.pool import ConnectionPool
+from .distractor import DEFAULT_NEIGHBOURS, build_neighbours, pack, unpack
 
 @dataclass(frozen=True)
 class Word:
@@ -52,11 +57,31 @@ class WordDatabase:
         初始化数据库连接
         :param db_path: 数据库文件路径
         """
-        self.conn = sqlite3.connect(db_path)
-        self.conn.row_factory = sqlite3.Row  # 使查询结果支持字典访问
-        self.cursor = self.conn.cursor()
+        # 背诵时卡片数据在后台线程中准备,随机抽取与干扰项查询会在其他线程中调用;
+        # 每个线程使用独立的连接与游标,界面线程与预取线程互不共享。
+        # 单词库以读为主且可能随程序分发,保持默认的DELETE日志模式,不生成-wal/-shm文件
+        self._pool = ConnectionPool(db_path, journal_mode="DELETE", synchronous="FULL")
+        self._local = threading.local()
         self.tables = ['zk','gk','cet4','cet4lx','cet6lx', 'cet6', 'toefl', 'gre']
         self._valid_fields = ['id', 'word', 'pronunciation', 'translation']
+        # 各单词表的id数组,随机抽取时在内存中选id,避免 ORDER BY RANDOM() 全表排序
+        self._id_cache: Dict[str, array] = {}
+        self._random = random.Random()
+        self._sample_lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """当前线程专属的连接,查询结果支持字典访问"""
+        return self._pool.reader
+
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        """当前线程专属连接上的游标"""
+        conn = self.conn
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None or cursor.connection is not conn:
+            cursor = self._local.cursor = conn.cursor()
+        return cursor
 
     def _init_tables(self):
         """初始化数据库表结构"""
@@ -69,6 +94,7 @@ class WordDatabase:
                     translation TEXT
                 )
             """)
+        self._create_distractor_table()
         # 创建统计表
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS wordlist_stats (
@@ -135,20 +161,153 @@ class WordDatabase:
         self.cursor.execute(query, (start_id, count))
         return [Word.from_row(row) for row in self.cursor.fetchall()]
 
+    def get_words(self, table_name: str, word_ids: Iterable[int]) -> List[Word]:
+        """按id批量查询完整单词数据,按word_ids的顺序返回,不存在的id被忽略"""
+        self._validate_table(table_name)
+        word_ids = list(word_ids)
+        if not word_ids:
+            return []
+        placeholders = ",".join("?" * len(word_ids))
+        rows = self.conn.execute(
+            f"SELECT * FROM {table_name} WHERE id IN ({placeholders})",
+            word_ids
+        ).fetchall()
+        rows = {row['id']: row for row in rows}
+        return [Word.from_row(rows[word_id]) for word_id in word_ids if word_id in rows]
+
     def random_query(
         self,
         table_name: str,
-        count: int = 10
+        count: int = 10,
+        exclude_ids: Iterable[int] = ()
     ) -> List[Word]:
-        """随机查询完整单词数据"""
+        """随机查询完整单词数据
+
+        在缓存的id数组中抽取id后按主键一次取回,耗时只与count有关,与表的大小无关
+        :param exclude_ids: 不参与抽取的单词id,如生成干扰项时排除正确答案
+        """
         self._validate_table(table_name)
-        query = f"""
-            SELECT * FROM {table_name}
-            ORDER BY RANDOM()
-            LIMIT ?
+        excluded = set(exclude_ids)
+        ids = self._table_ids(table_name)
+        picked = self._sample_ids(ids, count, excluded)
+        if not picked:
+            return []
+
+        placeholders = ",".join("?" * len(picked))
+        rows = self.conn.execute(
+            f"SELECT * FROM {table_name} WHERE id IN ({placeholders})",
+            picked
+        ).fetchall()
+        rows = {row['id']: row for row in rows}
+        if len(rows) < len(picked):
+            # 缓存的id已被删除,重新加载id数组后再抽取
+            self.refresh_ids(table_name)
+            return self.random_query(table_name, count, excluded)
+        # 按抽取顺序返回,保持结果的随机顺序
+        return [Word.from_row(rows[word_id]) for word_id in picked]
+
+    def _table_ids(self, table_name: str) -> array:
+        """取得单词表的id数组,首次访问时从数据库加载"""
+        with self._sample_lock:
+            ids = self._id_cache.get(table_name)
+            if ids is None:
+                rows = self.conn.execute(f"SELECT id FROM {table_name} ORDER BY id").fetchall()
+                ids = array('q', (row[0] for row in rows))
+                self._id_cache[table_name] = ids
+            return ids
+
+    def _sample_ids(self, ids: array, count: int, excluded: set) -> List[int]:
+        """从id数组中不重复地抽取count个不在excluded中的id
+
+        抽取数量远小于表大小时逐个随机取下标,遇到重复或被排除的id重新抽取,期望O(count);
+        否则先过滤再抽样,此时表很小,开销可以忽略
         """
-        self.cursor.execute(query, (count,))
-        return [Word.from_row(row) for row in self.cursor.fetchall()]
+        if count <= 0 or not ids:
+            return []
+        if (count + len(excluded)) * 2 > len(ids):
+            candidates = [word_id for word_id in ids if word_id not in excluded]
+            return self._random.sample(candidates, min(count, len(candidates)))
+
+        picked = []
+        seen = set(excluded)
+        size = len(ids)
+        randrange = self._random.randrange
+        while len(picked) < count:
+            word_id = ids[randrange(size)]
+            if word_id in seen:
+                continue
+            seen.add(word_id)
+            picked.append(word_id)
+        return picked
+
+    def refresh_ids(self, table_name: Optional[str] = None):
+        """清除id数组缓存,单词表增删单词后调用,不传表名时清除全部"""
+        with self._sample_lock:
+            if table_name is None:
+                self._id_cache.clear()
+            else:
+                self._id_cache.pop(table_name, None)
+
+    def _create_distractor_table(self):
+        """创建干扰项索引表,每个单词一行,近邻id以int32数组保存为BLOB"""
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS distractor_index (
+                table_name TEXT NOT NULL,
+                word_id INTEGER NOT NULL,
+                neighbours BLOB NOT NULL,
+                PRIMARY KEY (table_name, word_id)
+            ) WITHOUT ROWID
+        """)
+
+    def build_distractor_index(self, table_name: str, neighbours: int = DEFAULT_NEIGHBOURS) -> int:
+        """为单词表离线构建相似干扰项索引,已有的索引会被替换
+
+        :param neighbours: 每个单词保存的近邻数量
+        :return: 写入索引的单词数
+        """
+        self._validate_table(table_name)
+        self.cursor.execute(f"SELECT id, word, translation FROM {table_name}")
+        words = [tuple(row) for row in self.cursor.fetchall()]
+        index = build_neighbours(words, neighbours)
+
+        self._create_distractor_table()
+        self.cursor.execute("DELETE FROM distractor_index WHERE table_name=?", (table_name,))
+        self.cursor.executemany(
+            "INSERT INTO distractor_index (table_name, word_id, neighbours) VALUES (?, ?, ?)",
+            ((table_name, word_id, pack(ids)) for word_id, ids in index.items())
+        )
+        self.conn.commit()
+        return len(index)
+
+    def distractors(self, table_name: str, word_id: int, count: int = 3) -> List[Word]:
+        """取得单词的干扰项
+
+        从干扰项索引中该单词的近邻里随机选count个,近邻不足(或单词表尚未构建索引)时用随机单词补足
+        """
+        self._validate_table(table_name)
+        try:
+            row = self.conn.execute(
+                "SELECT neighbours FROM distractor_index WHERE table_name=? AND word_id=?",
+                (table_name, word_id)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            # 数据库中还没有干扰项索引表
+            row = None
+        neighbours = unpack(row[0]) if row else ()
+
+        picked = self._sample_ids(neighbours, count, {word_id})
+        words = []
+        if picked:
+            placeholders = ",".join("?" * len(picked))
+            rows = self.conn.execute(
+                f"SELECT * FROM {table_name} WHERE id IN ({placeholders})",
+                picked
+            ).fetchall()
+            words = [Word.from_row(row) for row in rows]
+        if len(words) < count:
+            exclude = {word_id}.union(w.id for w in words)
+            words += self.random_query(table_name, count - len(words), exclude_ids=exclude)
+        return words
 
     def _validate_table(self, table_name: str):
         """验证表名有效性"""
@@ -162,16 +321,17 @@ class WordDatabase:
         return self.cursor.fetchone()[0]
 
     def close(self):
-        """关闭数据库连接"""
-        self.conn.close()
+        """关闭所有线程的数据库连接"""
+        self._pool.close()
+        self._local = threading.local()
 
     def _validate_table(self, table_name: str):
         """验证表是否存在"""
-        self.cursor.execute(
+        exists = self.conn.execute(
             "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
             (table_name,)
-        )
-        if not self.cursor.fetchone():
+        ).fetchone()
+        if not exists:
             raise ValueError(f"表 {table_name} 不存在")
         
 
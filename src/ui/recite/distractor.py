@@ -0,0 +1,168 @@
+"""
+相似干扰项索引
+为单词表中的每个单词预先计算若干个"容易混淆"的近邻单词,作为选择卡与听写卡的干扰项。
+近邻按 编辑距离 - 共同前缀长度×PREFIX_WEIGHT + 词性不同×POS_PENALTY 从小到大排序。
+
+全表两两比较是O(n²),1万词的单词表需要5000万次编辑距离计算;
+这里先把单词分别按正序与逆序拼写排序,共享前缀/后缀的单词在排序后相邻,
+每个单词只与两种顺序下前后若干个单词比较,整体为O(n·window)。
+候选对的生成、编辑距离与排序都用numpy按整批候选对向量化计算,
+编辑距离的动态规划只在单词长度上循环,不在候选对上循环。
+"""
+import re
+from array import array
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 每个单词保存的近邻数量
+DEFAULT_NEIGHBOURS = 8
+# 排序后向前、向后各取的候选数量
+DEFAULT_WINDOW = 8
+# 共同前缀每个字母抵消的编辑距离
+PREFIX_WEIGHT = 0.5
+# 词性不同时增加的距离
+POS_PENALTY = 1.5
+# 每批计算编辑距离的候选对数量,限制动态规划矩阵的内存
+PAIR_CHUNK = 1 << 16
+
+_POS_PATTERN = re.compile(r"^\s*([a-z]+)\.", re.IGNORECASE)
+
+def pos_tag(translation: Optional[str]) -> str:
+    """取释义开头的词性标记,如 'n. 苹果' -> 'n',没有时返回空字符串"""
+    if not translation:
+        return ""
+    match = _POS_PATTERN.match(translation)
+    return match.group(1).lower() if match else ""
+
+def encode(spellings: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """把单词编码为按最长单词补0的码点矩阵
+
+    Returns:
+        tuple: (码点矩阵 shape=(n, 最大长度), 各单词长度)
+    """
+    # 定长unicode数组每个字符占4字节,按uint32查看即为补0的码点矩阵
+    codes = np.array(list(spellings) + [""], dtype=np.str_)[:len(spellings)]
+    width = codes.dtype.itemsize // 4
+    return codes.view(np.uint32).reshape(len(codes), width), np.char.str_len(codes).astype(np.int32)
+
+def common_prefixes(a: np.ndarray, a_len: np.ndarray, b: np.ndarray, b_len: np.ndarray) -> np.ndarray:
+    """逐对计算共同前缀长度,a/b为encode得到的码点矩阵的对应行"""
+    same = np.cumprod(a == b, axis=1, dtype=np.int32).sum(axis=1, dtype=np.int32)
+    return np.minimum(same, np.minimum(a_len, b_len))
+
+def edit_distances(a: np.ndarray, a_len: np.ndarray, b: np.ndarray, b_len: np.ndarray) -> np.ndarray:
+    """逐对计算Levenshtein编辑距离
+
+    动态规划按a的字母逐行推进,每行对全部候选对同时计算:
+    替换与删除是上一行的逐元素运算,插入 cur[j] = min(cur[j-1] + 1, ...) 等价于
+    j + 前缀最小值(x[k] - k),用np.minimum.accumulate一次求出。
+    补0的位置只影响超出单词长度的格子,结果取第a_len行第b_len列。
+    """
+    count, width = a.shape
+    steps = np.arange(width + 1, dtype=np.int32)
+    previous = np.broadcast_to(steps, (count, width + 1))
+    rows = np.arange(count)
+    # a为空串时距离为b的长度
+    result = b_len.astype(np.int32)
+    for i in range(1, int(a_len.max(initial=0)) + 1):
+        cost = (a[:, i - 1, None] != b).astype(np.int32)
+        current = np.empty((count, width + 1), dtype=np.int32)
+        current[:, 0] = i
+        np.minimum(previous[:, :-1] + cost, previous[:, 1:] + 1, out=current[:, 1:])
+        current = np.minimum.accumulate(current - steps, axis=1) + steps
+        done = a_len == i
+        result[done] = current[rows[done], b_len[done]]
+        previous = current
+    return result
+
+def common_prefix(a: str, b: str) -> int:
+    """共同前缀长度"""
+    codes, lengths = encode((a, b))
+    return int(common_prefixes(codes[:1], lengths[:1], codes[1:], lengths[1:])[0])
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein编辑距离"""
+    codes, lengths = encode((a, b))
+    return int(edit_distances(codes[:1], lengths[:1], codes[1:], lengths[1:])[0])
+
+def _factorize(values: Sequence[str]) -> np.ndarray:
+    """字符串映射为整数编号,相同字符串编号相同"""
+    codes: Dict[str, int] = {}
+    return np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.int64, count=len(values))
+
+def build_neighbours(
+    words: Sequence[Tuple[int, str, Optional[str]]],
+    neighbours: int = DEFAULT_NEIGHBOURS,
+    window: int = DEFAULT_WINDOW
+) -> Dict[int, array]:
+    """计算每个单词的近邻
+
+    Args:
+        words: (id, 单词, 释义) 列表
+        neighbours: 每个单词保留的近邻数量
+        window: 排序后前后各比较的候选数量
+
+    Returns:
+        dict: 单词id -> 近邻id数组,按相似度从高到低排列
+    """
+    count = len(words)
+    ids = np.fromiter((word_id for word_id, _, _ in words), dtype=np.int64, count=count)
+    spellings = [word.lower() for _, word, _ in words]
+    tags = _factorize([pos_tag(translation) for _, _, translation in words])
+    translations = _factorize([translation or "" for _, _, translation in words])
+    spelling_codes = _factorize(spellings)
+    codes, lengths = encode(spellings)
+
+    # 正序与逆序拼写下的排名,相邻的单词共享前缀或后缀;候选关系对称,每对单词只保留一次
+    orders = (
+        np.array(sorted(range(count), key=spellings.__getitem__), dtype=np.int64),
+        np.array(sorted(range(count), key=lambda i: spellings[i][::-1]), dtype=np.int64),
+    )
+    keys = [np.empty(0, dtype=np.int64)]
+    for order in orders:
+        for offset in range(1, min(window, count - 1) + 1):
+            left, right = order[:-offset], order[offset:]
+            keys.append(np.minimum(left, right) * count + np.maximum(left, right))
+    pairs = np.unique(np.concatenate(keys))
+    first, second = pairs // count, pairs % count
+
+    # 释义相同的单词作为干扰项会产生两个正确答案
+    keep = (translations[first] != translations[second]) & (spelling_codes[first] != spelling_codes[second])
+    first, second = first[keep], second[keep]
+
+    distances = np.empty(len(first), dtype=np.float64)
+    for start in range(0, len(first), PAIR_CHUNK):
+        i, j = first[start:start + PAIR_CHUNK], second[start:start + PAIR_CHUNK]
+        distances[start:start + PAIR_CHUNK] = (
+            edit_distances(codes[i], lengths[i], codes[j], lengths[j])
+            - common_prefixes(codes[i], lengths[i], codes[j], lengths[j]) * PREFIX_WEIGHT
+        )
+    distances += (tags[first] != tags[second]) * POS_PENALTY
+
+    # 展开为双向的(单词, 候选),按 单词, 距离, 候选id 排序后每个单词取前neighbours个
+    source = np.concatenate((first, second))
+    target = np.concatenate((second, first))
+    scores = np.concatenate((distances, distances))
+    order = np.lexsort((ids[target], scores, source))
+    source, target = source[order], target[order]
+    starts = np.searchsorted(source, np.arange(count))
+    rank = np.arange(len(source)) - starts[source]
+    top = rank < neighbours
+    source, target = source[top], ids[target[top]]
+    bounds = np.searchsorted(source, np.arange(count + 1))
+
+    return {
+        int(ids[i]): array('i', target[bounds[i]:bounds[i + 1]].tolist())
+        for i in range(count)
+    }
+
+def pack(ids: Iterable[int]) -> bytes:
+    """近邻id数组序列化为BLOB"""
+    return array('i', ids).tobytes()
+
+def unpack(blob: bytes) -> array:
+    """从BLOB恢复近邻id数组"""
+    ids = array('i')
+    ids.frombytes(blob)
+    return ids
@@ -0,0 +1,106 @@
+"""
+背诵卡片的出题顺序
+每个单词依次出现若干种卡片(先是单词卡,其余卡片类型随机排列),
+下一张卡片取自 ReviewSession.pop() 给出的最早到期的单词:
+答对后单词在 learning_step 秒后再出下一张卡片,答错时立即调用 ReviewSession.answer(AGAIN),
+单词在重新学习间隔后按到期时间回到队列,重做答错的那张卡片,而不是排到队尾。
+单词的全部卡片完成时按本次答错的次数记录评分。不依赖Kivy,卡片类型由调用方提供。
+"""
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Sequence, Set
+
+from ...core.review import Rating, ReviewSession
+
+class ReviewDeck:
+    """由复习队列驱动的卡片顺序
+
+    每个单词同一时间最多只有一张卡片在外(已取出但尚未完成),
+    取出时单词离开复习队列,完成或答错后才重新入队
+
+    Attributes:
+        session: 复习队列,结束时由调用方保存 session.changes()
+        learning_step: 答对后同一单词下一张卡片的间隔(秒)
+    """
+
+    def __init__(
+        self,
+        session: ReviewSession,
+        words: Iterable[Any],
+        card_types: Sequence[Any],
+        learning_step: int = 60,
+        now: Optional[float] = None,
+        rng: Optional[random.Random] = None
+    ):
+        """
+        Args:
+            session: 复习队列,已包含到期复习单词的状态;其余单词作为新单词加入
+            words: 单词数据,需提供 get('id')
+            card_types: 每个单词要出的卡片类型,第一种固定最先出现,其余随机排列
+            learning_step: 答对后同一单词下一张卡片的间隔(秒)
+            now: 当前时间,默认time.time()
+            rng: 随机数生成器
+        """
+        self.session = session
+        self.learning_step = learning_step
+        rng = rng or random.Random()
+        self._words: Dict[int, Any] = {}
+        self._pending: Dict[int, Deque[Any]] = {}
+        for word in words:
+            word_id = word.get('id')
+            if word_id in self._words:
+                continue
+            rest = list(card_types[1:])
+            rng.shuffle(rest)
+            self._words[word_id] = word
+            self._pending[word_id] = deque([card_types[0], *rest])
+        # 每个单词本次答错的次数
+        self._wrong: Dict[int, int] = dict.fromkeys(self._words, 0)
+        # 在外的卡片中已答错的单词,完成时不再入队
+        self._failed: Set[int] = set()
+        self.session.add_new(self._words, now)
+
+    def pop(self, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """取出下一张卡片的配置 {'type', 'data'},没有可出的卡片时返回None"""
+        now = time.time() if now is None else now
+        while True:
+            word_id = self.session.pop(now)
+            if word_id is None:
+                return None
+            pending = self._pending.get(word_id)
+            # 复习队列中不在本次单词列表里(如单词已被删除)的单词跳过
+            if pending:
+                return {'type': pending.popleft(), 'data': self._words[word_id]}
+
+    def wrong(self, word_id: int, card_type: Any, now: Optional[float] = None):
+        """记录答错: 立即评分AGAIN,单词在重新学习间隔后回到队列重做这张卡片"""
+        if word_id not in self._pending or word_id in self._failed:
+            return
+        self._wrong[word_id] += 1
+        self._failed.add(word_id)
+        self._pending[word_id].appendleft(card_type)
+        self.session.answer(word_id, Rating.AGAIN, now)
+
+    def done(self, word_id: int, now: Optional[float] = None):
+        """卡片完成(滑出): 还有卡片时单词在learning_step秒后重新入队,全部完成时记录评分"""
+        if word_id not in self._pending:
+            return
+        if word_id in self._failed:
+            # 答错时已重新入队
+            self._failed.discard(word_id)
+            return
+        now = time.time() if now is None else now
+        if self._pending[word_id]:
+            self.session.requeue(word_id, now + self.learning_step)
+        else:
+            self.session.answer(word_id, self.rating(self._wrong[word_id]), now)
+
+    @staticmethod
+    def rating(wrong: int) -> Rating:
+        """单词全部卡片完成时的评分,答错时已记录过AGAIN"""
+        return Rating.GOOD if wrong == 0 else Rating.HARD
+
+    def __len__(self) -> int:
+        """尚未出的卡片数(不含在外的卡片)"""
+        return sum(len(pending) for pending in self._pending.values())
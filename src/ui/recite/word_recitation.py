@@ -4,15 +4,18 @@
 """
 from kivymd.uix.floatlayout import MDFloatLayout
 import random
-from collections import deque
 import time
 from ...components.custom.card.dictationcard import DictationCard
 from ...components.custom.card.wordcard import WordCard
 from ...components.custom.card.selectcard import QuizCard
 from ...components.custom.card.spellingcard import WordInputCard
 from kivy.animation import Animation
+from kivy.clock import Clock
 from kivymd.uix.boxlayout import MDBoxLayout
 from global_instance import word_db
+from .card_pipeline import CardPipeline, CardPool
+from .review_deck import ReviewDeck
+from ...core.review import ReviewScheduler, ReviewSession
 from kivy.properties import ListProperty, ObjectProperty, DictProperty,StringProperty
 from kivy.lang import Builder
 
@@ -141,13 +144,18 @@ class CardManager(MDFloatLayout):
         self.base_word_list=[]
         self.raw_word_list = []#这个列表用于生成卡片，因此不能作为结算数据列表使用
         self.stats = {}
-        self.card_queue = deque()
+        # 卡片队列: 后台线程提前准备队列前几张卡片的数据,滑动时直接取用
+        self.card_queue = CardPipeline(self._prepare_card, lookahead=4)
+        # 滑出的卡片控件按类型回收,生成新卡片时只重新绑定数据
+        self.card_pool = CardPool(capacity=2)
         self._init_default_callbacks()
         self.start_time =time.time()  # 记录开始时间
         self.rate=0
         self.count=0
         self.review_count=0 #自动将前几天错误的单词追加进入列表
         self.new_word_count=0 #新单词数量
+        self.review_session=None #本次背诵的复习调度,结束时写回各单词的复习状态
+        self.deck=None #出题顺序,下一张卡片取自复习调度中最早到期的单词
 
     def _init_default_callbacks(self):
         # 统一回调处理
@@ -156,48 +164,57 @@ class CardManager(MDFloatLayout):
         self.answer_correctly = self._handle_correct_answer
         self.answer_wrong = self._handle_wrong_answer
 
-    def load_words(self, word_list):
-        """热加载新单词列表"""
+    def load_words(self, word_list, review_words=(), review_session=None):
+        """热加载新单词列表
+
+        params:
+            word_list:新单词
+            review_words:到期的复习单词,排在新单词之前
+            review_session:复习单词所属的复习调度,不传时新建
+        """
         self.reset()
-        if len(word_list) == 0:
+        review_words = list(review_words)
+        if len(word_list) == 0 and len(review_words) == 0:
             self.error()
             return
-        self.raw_word_list = word_list
-        self.count=len(word_list)*4
+        self.raw_word_list = review_words + list(word_list)
+        self.count=len(self.raw_word_list)*4
         self.new_word_count=len(word_list)
-        self._init_stats(word_list)
+        self.review_count=len(review_words)
+        self.review_session = review_session or ReviewSession(ReviewScheduler())
+        self._init_stats(self.raw_word_list)
         self._init_card_queue()
         self._generate_initial_cards()
+        self._feed_card_queue()
         self.set_parent_rate()
 
     def _init_card_queue(self):
-        # 初始化卡片生成队列
-        temp_queue = []
-        
-        # 第一阶段：所有单词生成WordCard
-        for word_data in self.raw_word_list:
-            temp_queue.append({
-                'type': WordCard,
-                'data': word_data
-            })
-        
-        # 第二阶段：为每个单词生成其他卡片类型
-        for word_data in self.raw_word_list:
-            temp_queue.extend([
-                {'type': WordInputCard, 'data': word_data},
-                {'type': QuizCard, 'data': word_data},
-                {'type': DictationCard, 'data': word_data}
-            ])
-        
-        # 随机打乱顺序但保持WordCard在前
-        word_cards = [c for c in temp_queue if c['type'] == WordCard]
-        other_cards = [c for c in temp_queue if c['type'] != WordCard]
-        random.shuffle(other_cards)
-        self.card_queue = deque(word_cards + other_cards)
+        # 每个单词先出单词卡,其余卡片随机排列;出题顺序由复习调度决定
+        self.deck = ReviewDeck(
+            self.review_session,
+            self.raw_word_list,
+            (WordCard, WordInputCard, QuizCard, DictationCard)
+        )
+        self.card_queue.clear()
+
+    def _feed_card_queue(self):
+        """从出题顺序中取卡片补足预取队列"""
+        configs = []
+        while len(self.card_queue) + len(configs) < self.card_queue.lookahead:
+            config = self.deck.pop() if self.deck is not None else None
+            if config is None:
+                break
+            configs.append(config)
+        if configs:
+            self.card_queue.extend(configs)
+        else:
+            self.card_queue.refill()
 
     def _generate_initial_cards(self):
         # 生成前两张卡片
         for _ in range(2):
+            if not self.card_queue:
+                self._feed_card_queue()
             if self.card_queue:
                 config = self.card_queue.popleft()
                 self._create_card(config)
@@ -211,56 +228,57 @@ class CardManager(MDFloatLayout):
             for word in word_list
         }
 
-    def _create_card(self, config):
-        """改进后的卡片创建方法"""
+    def _prepare_card(self, config):
+        """准备卡片数据,在卡片队列的后台线程中执行,不能访问控件
+
+        查询干扰项并生成选项
+        """
         card_type = config['type']
         word_data = config['data']
-        
-        # 生成卡片参数
-        base_params = {
+        params = {
             'id': word_data.get('id', ''),
             'word': word_data.get('word', ''),
             'pronunciation': word_data.get('pronunciation', ''),
             'translation': word_data.get('translation', ''),
-            'swipe_horizontal_callback': self.swipe_horizontal_callback,
-            'swipe_vertical_callback': self.swipe_vertical_callback,
-            'answer_correctly': self.answer_correctly,
-            'answer_wrong': self.answer_wrong,
-            'center': self.center,
-            'pos': (self.center_x, self.center_y+3000),#避免闪烁，简单好用
         }
 
         # 特殊卡片处理
         if card_type==QuizCard:
-            # 获取3个随机错误选项
-            wrong_words = self.word_db.random_query('cet4lx', 3)
-            #print(f"Wrong words: {wrong_words}")
+            # 获取3个相似的错误选项
+            wrong_words = self.word_db.distractors('cet4lx', word_data.get('id'), 3)
             options = [word_data.get('translation', '')] + [
                 w.translation for w in wrong_words
             ]
             random.shuffle(options)
-            correct_index = options.index(word_data.get('translation', ''))
-            
-            base_params.update({
+            params.update({
                 'options': options,
-                'correct_index': correct_index
+                'correct_index': options.index(word_data.get('translation', ''))
             })
         elif card_type==DictationCard:
-            # 获取3个随机错误选项
-            wrong_words = self.word_db.random_query('cet4lx', 3)
-            #print(f"Wrong words: {wrong_words}")
+            # 获取3个相似的错误选项
+            wrong_words = self.word_db.distractors('cet4lx', word_data.get('id'), 3)
             options = [word_data.get('word', '')] + [
                 w.get('word', '') for w in wrong_words
             ]
             random.shuffle(options)
-            correct_index = options.index(word_data.get('word', ''))
-            
-            base_params.update({
+            params.update({
                 'options': options,
-                'correct_index': correct_index
+                'correct_index': options.index(word_data.get('word', ''))
             })
-        # 创建卡片实例
-        card = card_type(**base_params)
+        return {'type': card_type, 'data': word_data, 'params': params}
+
+    def _create_card(self, prepared):
+        """用准备好的卡片数据生成卡片,优先复用回收的控件"""
+        params = dict(prepared['params'])
+        params.update({
+            'swipe_horizontal_callback': self.swipe_horizontal_callback,
+            'swipe_vertical_callback': self.swipe_vertical_callback,
+            'answer_correctly': self.answer_correctly,
+            'answer_wrong': self.answer_wrong,
+            'center': self.center,
+            'pos': (self.center_x, self.center_y+3000),#避免闪烁，简单好用
+        })
+        card = self.card_pool.acquire(prepared['type'], **params)
         #先禁用
         card.disabled=True
         # 调整层级
@@ -277,16 +295,21 @@ class CardManager(MDFloatLayout):
         # 处理卡片划出
         self.current_cards.remove(instance)
         self.remove_widget(instance)
+        self.card_pool.release(instance)
+        # 卡片完成,单词按到期时间重新入队
+        if self.deck is not None:
+            self.deck.done(instance.id)
         
-        # 生成新卡片
-        if len(self.card_queue)>0:
-            config = self.card_queue.popleft()
-            self._create_card(config)
-        
-        # 保持两张卡片
-        while len(self.current_cards) < 2 and self.card_queue:
-            config = self.card_queue.popleft()
+        # 保持两张卡片;预取队列为空时(如只剩刚完成的单词)立即从出题顺序中取卡
+        # 其余卡片在下一帧才提交给后台线程,避免滑动回调中与其争用GIL
+        while len(self.current_cards) < 2:
+            if not self.card_queue:
+                self._feed_card_queue()
+            if not self.card_queue:
+                break
+            config = self.card_queue.popleft(refill=False)
             self._create_card(config)
+        Clock.schedule_once(lambda dt: self._feed_card_queue())
 
         if len(self.current_cards) == 0:
             self.end_of_quiz()
@@ -312,13 +335,9 @@ class CardManager(MDFloatLayout):
         word = word_data.get('id', '')
         print(word)
         self.stats[word]['wrong'] += 1
-        # 重新加入队列
-        self.card_queue.append({
-            'type': card_type,
-            'data': word_data
-        })
-        # 追加到原始列表
-        self.raw_word_list.append(word_data)
+        # 立即评分,单词在重新学习间隔后按到期时间回到队列重做这张卡片
+        if self.deck is not None:
+            self.deck.wrong(word, card_type)
         #总数量+1
         self.count+=1
         self.set_parent_rate()
@@ -345,11 +364,15 @@ class CardManager(MDFloatLayout):
         result_label.reset_callback = self.reset  # 设置重置回调
         self.add_widget(result_label, index=0)
         #保存数据
-        dao=db_manager.get_module_dao(['daily_study','study_plan'])
+        dao=db_manager.get_module_dao(['daily_study','study_plan','word_schedule'])
         with dao.transaction():
             study_plan_date=dao.study_plan.get_current_plan()
             if study_plan_date:
                 id=study_plan_date.get('id')
+                #答题时已记录各单词的复习状态,这里写回
+                if self.review_session is not None:
+                    dao.word_schedule.save_states(id, self.review_session.changes())
+                    self.review_session.commit()
                 dao.daily_study.increment_today_stats(
                     study_plan_id=id,
                     question_count=self.count,
@@ -395,8 +418,11 @@ class CardManager(MDFloatLayout):
     def reset(self):
         """重置状态"""
         self.clear_widgets()
+        for card in self.current_cards:
+            self.card_pool.release(card)
         self.current_cards.clear()
         self.card_queue.clear()
+        self.deck = None
         self.stats.clear()
 
     def set_parent_rate(self):
@@ -476,7 +502,21 @@ class RecitationInterface(MDBoxLayout):
         # print(self.ids.card_box.size,self.ids.card_box.pos,self.ids.card_box.center)
         #当前父级组件的大小不符合我的需求，导致以父级为准的card出现了问题
         word_list = word_db.batch_query(table_name, index,count)
-        self.manager.load_words(word_list)
+        review_words, review_session = self._load_due_words(table_name, count)
+        self.manager.load_words(word_list, review_words, review_session)
+
+    def _load_due_words(self, table_name, limit):
+        """
+        取出当前学习计划中到期的复习单词,按到期时间排列
+        到期的复习状态通过按到期时间的索引一次范围扫描取出。
+        出题顺序由卡片队列决定,复习调度只保存这些单词的状态,
+        背诵结束时按答题情况计算并写回新的复习状态
+        """
+        dao = db_manager.get_module_dao(['study_plan','word_schedule'])
+        plan = dao.study_plan.get_current_plan()
+        due = dao.word_schedule.get_due(plan.get('id'), int(time.time()), limit) if plan else []
+        review_session = ReviewSession(ReviewScheduler(), due)
+        return word_db.get_words(table_name, [state.word_id for state in due]), review_session
     
     def end(self):
         """